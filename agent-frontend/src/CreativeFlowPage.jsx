@@ -3,6 +3,7 @@ import {
     Box, Button, Typography, Paper, Grid, CircularProgress,
     Card, CardMedia, Alert, CardContent, Divider
 } from '@mui/material';
+import { postEventStream } from './sse';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000';
 
@@ -48,17 +49,17 @@ function CreativeFlowPage({ brandContext, selectedApproach, onBackToStrategy })
 
         try {
             const payload = { ...brandContext, selectedStrategy: selectedApproach };
-            const response = await fetch(`${API_BASE_URL}/generate-social-copy`, {
-                 method: 'POST',
+            // Each post is shown as soon as the copywriter finishes writing it.
+            await postEventStream(`${API_BASE_URL}/generate-social-copy/stream`, {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
+            }, (event, data) => {
+                if (event === 'post') {
+                    setGeneratedCopy((prev) => [...prev, data]);
+                } else if (event === 'done') {
+                    setGeneratedCopy(data.posts || []);
+                }
             });
-             if (!response.ok) {
-                const err = await response.json();
-                throw new Error(err.detail || "Failed to generate copy.");
-            }
-            const data = await response.json();
-            setGeneratedCopy(data.posts || []);
         } catch(err) {
             setCopyError(err.message);
         } finally {
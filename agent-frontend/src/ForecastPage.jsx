@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { Box, Button, Typography, Paper, Grid, TextField, CircularProgress, Link, Chip, List, ListItem, ListItemIcon, ListItemText, Table, TableBody, TableCell, TableContainer, TableHead, TableRow, ToggleButtonGroup, ToggleButton } from '@mui/material';
+import { Box, Button, Typography, Paper, Grid, TextField, CircularProgress, Link, Chip, List, ListItem, ListItemIcon, ListItemText, Table, TableBody, TableCell, TableContainer, TableHead, TableRow, TablePagination, Autocomplete, FormControlLabel, Switch, ToggleButtonGroup, ToggleButton } from '@mui/material';
 import CheckCircleIcon from '@mui/icons-material/CheckCircle';
 import QuestionAnswerIcon from '@mui/icons-material/QuestionAnswer';
 import ReactMarkdown from 'react-markdown';
@@ -33,6 +33,47 @@ const AnalysisReport = ({ result }) => {
         </Box>
       )}
 
+      {result.modelComparison && (
+        <Box sx={{ my: 3 }}>
+          <Typography variant="h6" gutterBottom>Model Comparison</Typography>
+          <Typography variant="body2" color="text.secondary" gutterBottom>
+            Chosen: {result.modelComparison.winner} (lowest error forecasting the last {result.modelComparison.holdoutWeeks} weeks; near-ties go to the best ELPD-LOO).
+          </Typography>
+          <TableContainer component={Paper} variant="outlined" sx={{ backgroundColor: '#0d1117' }}>
+            <Table size="small">
+              <TableHead>
+                <TableRow>{['Specification', 'Holdout sMAPE', 'Holdout MAPE', 'Holdout RMSE', 'ELPD-LOO', 'WAIC'].map(col => <TableCell key={col} sx={{ fontWeight: 'bold' }}>{col}</TableCell>)}</TableRow>
+              </TableHead>
+              <TableBody>
+                {result.modelComparison.candidates.map(c => (
+                  <TableRow key={c.model} selected={c.model === result.modelComparison.winner}>
+                    <TableCell>{c.model}</TableCell>
+                    <TableCell>{(c.holdoutSmape * 100).toFixed(2)}%</TableCell>
+                    <TableCell>{c.holdoutMape == null ? 'n/a' : `${(c.holdoutMape * 100).toFixed(2)}%`}</TableCell>
+                    <TableCell>{c.holdoutRmse.toLocaleString(undefined, { maximumFractionDigits: 0 })}</TableCell>
+                    <TableCell>{c.elpdLoo == null ? 'n/a' : c.elpdLoo.toFixed(1)}</TableCell>
+                    <TableCell>{c.waic == null ? 'n/a' : c.waic.toFixed(1)}</TableCell>
+                  </TableRow>
+                ))}
+              </TableBody>
+            </Table>
+          </TableContainer>
+        </Box>
+      )}
+
+      {result.table && (
+        <TableContainer component={Paper} variant="outlined" sx={{ my: 3, maxHeight: 400, backgroundColor: '#0d1117' }}>
+          <Table size="small" stickyHeader>
+            <TableHead>
+              <TableRow>{result.table.columns.map(col => <TableCell key={col} sx={{ fontWeight: 'bold' }}>{col}</TableCell>)}</TableRow>
+            </TableHead>
+            <TableBody>
+              {result.table.data.map((row, rowIndex) => (<TableRow key={rowIndex}>{row.map((cell, cellIndex) => <TableCell key={cellIndex}>{typeof cell === 'number' ? cell.toLocaleString(undefined, { maximumFractionDigits: 4 }) : cell}</TableCell>)}</TableRow>))}
+            </TableBody>
+          </Table>
+        </TableContainer>
+      )}
+
       <Box sx={{ my: 3 }}>
         <Typography variant="h6" gutterBottom>Summary</Typography>
         <Typography variant="body1" color="text.secondary">{result.summary}</Typography>
@@ -51,19 +92,41 @@ const AnalysisReport = ({ result }) => {
 };
 
 // --- A component to render a preview of the data ---
-const DataPreview = ({ data }) => {
+// Pages through the dataset on the server (/preview takes offset, limit and columns),
+// so large uploads preview as quickly as small ones.
+const DataPreview = ({ data, page, rowsPerPage, selectedColumns, onPageChange, onRowsPerPageChange, onColumnsChange }) => {
   if (!data || !data.columns || !data.data) return <Box sx={{display: 'flex', justifyContent: 'center', my:2}}><CircularProgress size={24} /></Box>;
   return (
-    <TableContainer component={Paper} variant="outlined" sx={{ mt: 2, backgroundColor: '#0d1117' }}>
-      <Table size="small">
-        <TableHead>
-          <TableRow>{data.columns.map(col => <TableCell key={col} sx={{ fontWeight: 'bold' }}>{col}</TableCell>)}</TableRow>
-        </TableHead>
-        <TableBody>
-          {data.data.map((row, rowIndex) => (<TableRow key={rowIndex}>{row.map((cell, cellIndex) => <TableCell key={cellIndex}>{cell}</TableCell>)}</TableRow>))}
-        </TableBody>
-      </Table>
-    </TableContainer>
+    <>
+      <Autocomplete
+        multiple
+        size="small"
+        sx={{ mt: 2 }}
+        options={data.allColumns || data.columns}
+        value={selectedColumns}
+        onChange={(event, value) => onColumnsChange(value)}
+        renderInput={(params) => <TextField {...params} label="Columns" placeholder={selectedColumns.length ? '' : 'All columns'} />}
+      />
+      <TableContainer component={Paper} variant="outlined" sx={{ mt: 2, backgroundColor: '#0d1117' }}>
+        <Table size="small">
+          <TableHead>
+            <TableRow>{data.columns.map(col => <TableCell key={col} sx={{ fontWeight: 'bold' }}>{col}</TableCell>)}</TableRow>
+          </TableHead>
+          <TableBody>
+            {data.data.map((row, rowIndex) => (<TableRow key={data.index[rowIndex]}>{row.map((cell, cellIndex) => <TableCell key={cellIndex}>{cell}</TableCell>)}</TableRow>))}
+          </TableBody>
+        </Table>
+      </TableContainer>
+      <TablePagination
+        component="div"
+        count={data.totalRows ?? data.data.length}
+        page={page}
+        rowsPerPage={rowsPerPage}
+        rowsPerPageOptions={[10, 25, 100]}
+        onPageChange={(event, newPage) => onPageChange(newPage)}
+        onRowsPerPageChange={(event) => onRowsPerPageChange(parseInt(event.target.value, 10))}
+      />
+    </>
   );
 };
 
@@ -77,10 +140,14 @@ const datasets = [
 function ForecastPage() {
   const [selectedDataset, setSelectedDataset] = useState(null);
   const [dataPreview, setDataPreview] = useState(null);
+  const [previewPage, setPreviewPage] = useState(0);
+  const [previewRowsPerPage, setPreviewRowsPerPage] = useState(10);
+  const [previewColumns, setPreviewColumns] = useState([]);
   const [prompt, setPrompt] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [analysisResult, setAnalysisResult] = useState(null);
   const [revenueTarget, setRevenueTarget] = useState('3000000');
+  const [compareSpecifications, setCompareSpecifications] = useState(false);
   
   const [followUpInput, setFollowUpInput] = useState('');
   const [followUpHistory, setFollowUpHistory] = useState([]);
@@ -95,16 +162,20 @@ function ForecastPage() {
 
   useEffect(() => {
     if (selectedDataset) {
-      setDataPreview(null);
-      fetch(`${API_BASE_URL}/preview/${selectedDataset.filename}`)
+      const params = new URLSearchParams({ offset: previewPage * previewRowsPerPage, limit: previewRowsPerPage });
+      if (previewColumns.length) params.set('columns', previewColumns.join(','));
+      fetch(`${API_BASE_URL}/preview/${selectedDataset.filename}?${params}`)
         .then(res => res.json())
         .then(data => setDataPreview(data))
         .catch(err => console.error("Failed to fetch data preview:", err));
     }
-  }, [selectedDataset]);
+  }, [selectedDataset, previewPage, previewRowsPerPage, previewColumns]);
 
   const handleDatasetSelect = (dataset) => {
     setSelectedDataset(dataset);
+    setDataPreview(null);
+    setPreviewPage(0);
+    setPreviewColumns([]);
     setAnalysisResult(null);
     setFollowUpHistory([]);
     setPrompt(dataset.samplePrompt || ''); // Set prompt if it exists
@@ -126,6 +197,7 @@ function ForecastPage() {
     
     if (isMMM) {
       formData.append('revenue_target', revenueTarget || '0');
+      formData.append('mmm_specification', compareSpecifications ? 'compare' : 'carryover');
       // For MMM, we can use a default prompt since the agent is specialized
       formData.append('prompt', 'Run a full Bayesian MMM analysis.');
     } else {
@@ -165,14 +237,25 @@ function ForecastPage() {
           <>
             <Paper sx={{ mt: 4, p: 2, backgroundColor: '#2a2a2a', border: '1px solid rgba(255,255,255,0.23)' }}>
               <Typography variant="subtitle1" fontWeight="bold">Dataset Details: {selectedDataset.title}</Typography>
-              <DataPreview data={dataPreview} />
+              <DataPreview
+                data={dataPreview}
+                page={previewPage}
+                rowsPerPage={previewRowsPerPage}
+                selectedColumns={previewColumns}
+                onPageChange={setPreviewPage}
+                onRowsPerPageChange={(rows) => { setPreviewRowsPerPage(rows); setPreviewPage(0); }}
+                onColumnsChange={setPreviewColumns}
+              />
             </Paper>
 
             <Box sx={{ mt: 4 }}>
               <Typography variant="h6" component="h2" gutterBottom>2. Ask a Question</Typography>
               
               {selectedDataset.filename.includes('mmm_advanced') ? (
-                  <TextField label="Next Quarter's Revenue Target ($)" type="number" variant="outlined" fullWidth margin="normal" value={revenueTarget} onChange={(e) => setRevenueTarget(e.target.value)} />
+                  <>
+                    <TextField label="Next Quarter's Revenue Target ($)" type="number" variant="outlined" fullWidth margin="normal" value={revenueTarget} onChange={(e) => setRevenueTarget(e.target.value)} />
+                    <FormControlLabel sx={{ mb: 1 }} control={<Switch checked={compareSpecifications} onChange={(e) => setCompareSpecifications(e.target.checked)} disabled={isLoading} />} label="Compare carryover, adstock and Hill-adstock models and use the best fit" />
+                  </>
               ) : (
                   <TextField label="What would you like to know about this data?" variant="outlined" fullWidth multiline rows={4} margin="normal" value={prompt} onChange={(e) => setPrompt(e.target.value)} disabled={isLoading} />
               )}
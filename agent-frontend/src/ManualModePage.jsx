@@ -22,40 +22,39 @@ const PromptSelect = ({ label, value, onChange, options }) => (
     </FormControl>
 );
 
-// Helper function to resize images
+// Helper function to resize images. The result is a binary JPEG Blob (sent as a multipart
+// file part, a third smaller than a base64 data URL); the server does the final normalization.
 const resizeImage = (file, callback) => {
     const MAX_WIDTH = 1024;
     const MAX_HEIGHT = 1024;
-    const reader = new FileReader();
-    reader.onload = (event) => {
-        const img = new Image();
-        img.onload = () => {
-            let width = img.width;
-            let height = img.height;
-
-            if (width > height) {
-                if (width > MAX_WIDTH) {
-                    height *= MAX_WIDTH / width;
-                    width = MAX_WIDTH;
-                }
-            } else {
-                if (height > MAX_HEIGHT) {
-                    width *= MAX_HEIGHT / height;
-                    height = MAX_HEIGHT;
-                }
+    const url = URL.createObjectURL(file);
+    const img = new Image();
+    img.onload = () => {
+        URL.revokeObjectURL(url);
+        let width = img.width;
+        let height = img.height;
+
+        if (width > height) {
+            if (width > MAX_WIDTH) {
+                height *= MAX_WIDTH / width;
+                width = MAX_WIDTH;
             }
+        } else {
+            if (height > MAX_HEIGHT) {
+                width *= MAX_HEIGHT / height;
+                height = MAX_HEIGHT;
+            }
+        }
 
-            const canvas = document.createElement('canvas');
-            canvas.width = width;
-            canvas.height = height;
-            const ctx = canvas.getContext('2d');
-            ctx.drawImage(img, 0, 0, width, height);
-            
-            callback(canvas.toDataURL('image/jpeg', 0.9));
-        };
-        img.src = event.target.result;
+        const canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const ctx = canvas.getContext('2d');
+        ctx.drawImage(img, 0, 0, width, height);
+
+        canvas.toBlob((blob) => callback({ blob, url: URL.createObjectURL(blob) }), 'image/jpeg', 0.85);
     };
-    reader.readAsDataURL(file);
+    img.src = url;
 };
 
 
@@ -64,9 +63,7 @@ const ImageUpload = ({ title, image, setImage }) => {
     const handleFileChange = (event) => {
         const file = event.target.files[0];
         if (file) {
-            resizeImage(file, (resizedDataUrl) => {
-                setImage(resizedDataUrl);
-            });
+            resizeImage(file, setImage);
         }
     };
 
@@ -85,7 +82,7 @@ const ImageUpload = ({ title, image, setImage }) => {
                     justifyContent: 'center',
                     flexDirection: 'column',
                     position: 'relative',
-                    backgroundImage: image ? `url(${image})` : 'none',
+                    backgroundImage: image ? `url(${image.url})` : 'none',
                     backgroundSize: 'contain',
                     backgroundPosition: 'center',
                     backgroundRepeat: 'no-repeat'
@@ -99,7 +96,7 @@ const ImageUpload = ({ title, image, setImage }) => {
                 )}
                 {image && (
                     <IconButton
-                        onClick={() => setImage(null)}
+                        onClick={() => { URL.revokeObjectURL(image.url); setImage(null); }}
                         sx={{ position: 'absolute', top: 8, right: 8, backgroundColor: 'rgba(0,0,0,0.5)' }}
                     >
                         <ClearIcon />
@@ -126,6 +123,7 @@ function CreativePage() {
     const [platform, setPlatform] = useState('meta');
     const [isLoading, setIsLoading] = useState(false);
     const [imageUrls, setImageUrls] = useState([]);
+    // Each image is { blob, url, id }; `id` is set once the server has cached it.
     const [subjectImage, setSubjectImage] = useState(null);
     const [sceneImage, setSceneImage] = useState(null);
 
@@ -133,33 +131,51 @@ function CreativePage() {
         setPromptOptions(prev => ({ ...prev, [key]: event.target.value }));
     };
 
-    const handleGenerate = async () => {
-        setIsLoading(true);
-        setImageUrls([]);
+    const postCreative = async (reuseIds) => {
         const formData = new FormData();
-        
+
         for (const [key, value] of Object.entries(promptOptions)) {
             formData.append(key, value);
         }
         formData.append('customSubject', customSubject);
         formData.append('sceneDescription', sceneDescription);
         formData.append('platform', platform);
-        
-        if (subjectImage) formData.append('subjectImage', subjectImage);
-        if (sceneImage) formData.append('sceneImage', sceneImage);
+
+        // Images the server already has are sent by id instead of being uploaded again.
+        // The scene image is only used as a backdrop when there is no subject image.
+        const images = [['subjectImage', subjectImage], ['sceneImage', subjectImage ? null : sceneImage]];
+        for (const [field, image] of images) {
+            if (!image) continue;
+            if (reuseIds && image.id) formData.append(`${field}Id`, image.id);
+            else formData.append(field, image.blob, `${field}.jpg`);
+        }
+
+        return fetch(`${API_BASE_URL}/generate-creative`, {
+            method: 'POST',
+            body: formData,
+        });
+    };
+
+    const handleGenerate = async () => {
+        setIsLoading(true);
+        setImageUrls([]);
 
         try {
-            // UPDATED THE FETCH URL to use the environment variable and correct endpoint
-            const response = await fetch(`${API_BASE_URL}/generate-creative`, {
-                method: 'POST',
-                body: formData,
-            });
+            let response = await postCreative(true);
+            if (response.status === 404) {
+                // The server evicted a cached image; upload the files again.
+                response = await postCreative(false);
+            }
             if (!response.ok) {
                 const err = await response.json();
                 throw new Error(err.detail || 'Failed to generate creative.');
             }
             const data = await response.json();
             setImageUrls(data.image_urls);
+            // Skip the update if the user swapped the image while the request was running.
+            const remember = (sent, id) => (prev) => (prev && id && prev.blob === sent?.blob ? { ...prev, id } : prev);
+            setSubjectImage(remember(subjectImage, data.subjectImageId));
+            setSceneImage(remember(sceneImage, data.sceneImageId));
         } catch (error) {
             alert(error.message);
         } finally {
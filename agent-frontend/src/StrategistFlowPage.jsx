@@ -3,6 +3,7 @@ import {
     Box, Button, Typography, Paper, Grid, TextField, CircularProgress,
     Card, CardContent, Alert, CardActions
 } from '@mui/material';
+import { postEventStream } from './sse';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000';
 
@@ -30,25 +31,22 @@ function StrategistFlowPage({ onStrategySelected }) {
         formData.append('userBrief', userBrief);
 
         try {
-            const response = await fetch(`${API_BASE_URL}/analyze-brand`, {
-                method: 'POST',
-                body: formData,
+            // Each approach is shown as soon as the strategist finishes writing it.
+            await postEventStream(`${API_BASE_URL}/analyze-brand/stream`, { body: formData }, (event, data) => {
+                if (event === 'approach') {
+                    setAnalysisResult((prev) => ({ approaches: [...(prev?.approaches || []), data] }));
+                } else if (event === 'done') {
+                    try {
+                        const parsedLlmResponse = JSON.parse(data.llm_response);
+                        setAnalysisResult({
+                            approaches: parsedLlmResponse.approaches || [],
+                        });
+                    } catch (e) {
+                        setRawResponseForDebug(data.llm_response);
+                        throw new Error("Failed to parse the JSON response from the LLM. See raw output for details.");
+                    }
+                }
             });
-            const data = await response.json();
-
-            if (!response.ok) {
-                throw new Error(data.detail || 'An error occurred on the backend.');
-            }
-            
-            try {
-                const parsedLlmResponse = JSON.parse(data.llm_response);
-                setAnalysisResult({
-                    approaches: parsedLlmResponse.approaches || [],
-                });
-            } catch (e) {
-                setRawResponseForDebug(data.llm_response);
-                throw new Error("Failed to parse the JSON response from the LLM. See raw output for details.");
-            }
 
         } catch (err) {
             setError(err.message);
@@ -0,0 +1,39 @@
+// Reads a Server-Sent Events response from a POST request.
+// EventSource only supports GET, so this parses the text/event-stream body by hand
+// and calls onEvent(eventName, data) for every event as soon as it arrives.
+export async function postEventStream(url, options, onEvent) {
+    const response = await fetch(url, { method: 'POST', ...options });
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.detail || 'An error occurred on the backend.');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const dispatch = (block) => {
+        let eventName = 'message';
+        const dataLines = [];
+        for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) eventName = line.slice(6).trim();
+            else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+        }
+        if (dataLines.length === 0) return;
+        const data = JSON.parse(dataLines.join('\n'));
+        if (eventName === 'error') throw new Error(data.detail || 'The stream failed.');
+        onEvent(eventName, data);
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            dispatch(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+        }
+    }
+    if (buffer.trim()) dispatch(buffer);
+}
@@ -0,0 +1,241 @@
+import asyncio
+import time
+import uuid
+from itertools import groupby
+from . import brand_strategist_agent, cache, copywriter_agent
+from .fetch_profiles import FETCH_PROFILES
+
+# --- Batch Jobs ---
+# Agency users submit copy or strategy requests for dozens of brands at once. A batch is
+# accepted immediately, runs in the background, and stores each item's result as soon as it
+# finishes, so GET /batches/{id} shows progress and partial results while the rest run.
+#
+# - Social copy items that share a brand and brief are grouped into a single LLM call
+#   (up to COPY_GROUP_SIZE strategies per call); the groups then run concurrently.
+# - Brand analyses need their own page fetches and screenshots, so they can't share a prompt.
+#   They run concurrently instead, and identical page fetches and prompts are still coalesced.
+# - BATCH_CONCURRENCY caps the LLM calls a single batch has in flight, so one large batch
+#   can't use up the provider quota for everyone else.
+#
+# A batch runs in the worker that accepted it, but its state lives in the shared cache
+# (cache.py): the batch itself under "batches" and each item under "batch_items", so an item
+# update writes just that item. Writes run in a worker thread. With the sqlite or redis backend,
+# any worker or instance can answer GET /batches/{id}. With the default memory backend, each
+# worker only sees its own batches, so run a single worker or polls may 404. Entries expire
+# BATCH_TTL after their last update; the memory backend also keeps at most MAX_STORED_BATCHES.
+
+MAX_BATCH_ITEMS = 200
+COPY_GROUP_SIZE = 5
+BATCH_CONCURRENCY = 8
+MAX_STORED_BATCHES = 500
+BATCH_TTL = 24 * 3600
+
+BATCH_KINDS = ("social-copy", "brand-analysis")
+
+_tasks = set()  # keeps the background tasks of this worker's running batches alive
+
+
+class BatchJob:
+    """One submitted batch: its items, their status and their results."""
+
+    def __init__(self, kind: str, items: list):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.created_at = time.time()
+        self.completed_at = None
+        self.items = [
+            {"index": index, "status": "queued", "input": item, "result": None, "error": None}
+            for index, item in enumerate(items)
+        ]
+
+    def _count(self, status: str) -> int:
+        return sum(1 for item in self.items if item["status"] == status)
+
+    @property
+    def status(self) -> str:
+        if self.completed_at is None:
+            return "running"
+        return "completed_with_errors" if self._count("error") else "completed"
+
+    def __getstate__(self):
+        # Items are stored on their own (see save_items()), so saving the batch stays cheap.
+        return {**self.__dict__, "items": None, "total": len(self.items)}
+
+    def __setstate__(self, state):
+        total = state.pop("total")
+        self.__dict__.update(state)
+        self.items = [None] * total
+
+    def save(self):
+        """Saves the batch without its items. Blocking."""
+        _batches().set(self.id, self)
+
+    def save_items(self, indexes):
+        """Saves the given items. Blocking."""
+        items = _batch_items()
+        for index in indexes:
+            items.set((self.id, index), self.items[index])
+
+    def load_items(self):
+        """Fills in the items of a batch read back from a shared backend. Blocking."""
+        items = _batch_items()
+        for index, item in enumerate(self.items):
+            if item is None:
+                self.items[index] = items.get((self.id, index)) or {
+                    "index": index, "status": "expired", "input": None, "result": None, "error": None,
+                }
+
+    async def mark_running(self, index: int):
+        self.items[index]["status"] = "running"
+        await asyncio.to_thread(self.save_items, [index])
+
+    async def store_result(self, index: int, result: dict):
+        self.items[index].update(status="done", result=result)
+        await asyncio.to_thread(self.save_items, [index])
+
+    async def store_error(self, index: int, error: str):
+        self.items[index].update(status="error", error=error)
+        await asyncio.to_thread(self.save_items, [index])
+
+    def to_dict(self, include_results: bool = True) -> dict:
+        items = [
+            {key: value for key, value in item.items() if include_results or key not in ("result", "input")}
+            for item in self.items
+        ]
+        return {
+            "batchId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": len(self.items),
+            "done": self._count("done"),
+            "failed": self._count("error"),
+            "createdAt": self.created_at,
+            "completedAt": self.completed_at,
+            "items": items,
+        }
+
+
+def validate_items(kind: str, items) -> str | None:
+    """Returns an error message for an invalid batch, or None."""
+    if kind not in BATCH_KINDS:
+        return f"Unknown batch kind '{kind}'. Expected one of: {', '.join(BATCH_KINDS)}."
+    if not isinstance(items, list) or not items:
+        return "A batch needs a non-empty 'items' list."
+    if len(items) > MAX_BATCH_ITEMS:
+        return f"A batch can contain at most {MAX_BATCH_ITEMS} items."
+    required = ("brandName", "userBrief", "selectedStrategy") if kind == "social-copy" else ("brandName", "websiteUrl", "userBrief")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not all(item.get(key) for key in required):
+            return f"Item {index} is missing one of: {', '.join(required)}."
+        if kind == "social-copy" and not isinstance(item["selectedStrategy"], dict):
+            return f"Item {index}: 'selectedStrategy' must be an object."
+        for field in ("websiteProfile", "adLibraryProfile"):
+            if kind == "brand-analysis" and item.get(field) and item[field] not in FETCH_PROFILES:
+                return f"Item {index}: unknown {field} '{item[field]}'. Choose one of: {', '.join(FETCH_PROFILES)}."
+    return None
+
+
+async def submit_batch(kind: str, items: list, project_id: str, location: str) -> BatchJob:
+    """Registers a batch and starts it in the background. Call validate_items() first."""
+    batch = BatchJob(kind, items)
+    await asyncio.to_thread(_save_new_batch, batch)
+    runner = _run_social_copy_batch if kind == "social-copy" else _run_brand_analysis_batch
+    task = asyncio.create_task(_run_batch(batch, runner, project_id, location))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return batch
+
+
+def get_batch(batch_id: str) -> BatchJob | None:
+    """Returns a batch's latest saved state, or None if it is unknown or has expired. Blocking."""
+    batch = _batches().get(batch_id)
+    if batch is not None:
+        batch.load_items()
+    return batch
+
+
+def _save_new_batch(batch: BatchJob):
+    batch.save_items(range(len(batch.items)))
+    batch.save()
+
+
+def _batches() -> cache.CacheBackend:
+    return cache.get_cache("batches", max_entries=MAX_STORED_BATCHES, ttl=BATCH_TTL)
+
+
+def _batch_items() -> cache.CacheBackend:
+    return cache.get_cache("batch_items", max_entries=MAX_STORED_BATCHES * MAX_BATCH_ITEMS, ttl=BATCH_TTL)
+
+
+async def _run_batch(batch: BatchJob, runner, project_id: str, location: str):
+    start = time.perf_counter()
+    try:
+        await runner(batch, project_id, location, asyncio.Semaphore(BATCH_CONCURRENCY))
+    except Exception as e:
+        print(f"Batch {batch.id} failed: {e}")
+        for item in batch.items:
+            if item["status"] in ("queued", "running"):
+                await batch.store_error(item["index"], str(e))
+    finally:
+        batch.completed_at = time.time()
+        await asyncio.to_thread(batch.save)
+        print(f"Batch {batch.id} ({batch.kind}) finished {len(batch.items)} items in {time.perf_counter() - start:.1f}s")
+
+
+async def _run_social_copy_batch(batch: BatchJob, project_id: str, location: str, semaphore: asyncio.Semaphore):
+    def group_key(item):
+        return (item["input"]["brandName"], item["input"]["userBrief"])
+
+    groups = []
+    for _, same_brief in groupby(sorted(batch.items, key=group_key), key=group_key):
+        same_brief = list(same_brief)
+        groups.extend(same_brief[i:i + COPY_GROUP_SIZE] for i in range(0, len(same_brief), COPY_GROUP_SIZE))
+
+    async def run_group(group):
+        async with semaphore:
+            for item in group:
+                await batch.mark_running(item["index"])
+            first = group[0]["input"]
+            try:
+                results = await copywriter_agent.generate_social_posts_grouped(
+                    project_id=project_id,
+                    location=location,
+                    brand_name=first["brandName"],
+                    user_brief=first["userBrief"],
+                    strategies=[item["input"]["selectedStrategy"] for item in group],
+                )
+            except Exception as e:
+                print(f"Batch {batch.id}: copy group failed: {e}")
+                for item in group:
+                    await batch.store_error(item["index"], str(e))
+                return
+            for item, result in zip(group, results):
+                await batch.store_result(item["index"], result)
+
+    await asyncio.gather(*(run_group(group) for group in groups))
+
+
+async def _run_brand_analysis_batch(batch: BatchJob, project_id: str, location: str, semaphore: asyncio.Semaphore):
+    async def run_item(item):
+        async with semaphore:
+            await batch.mark_running(item["index"])
+            data = item["input"]
+            try:
+                result = await brand_strategist_agent.analyze_brand_with_llm(
+                    project_id=project_id,
+                    location=location,
+                    brand_name=data["brandName"],
+                    website_url=data["websiteUrl"],
+                    ad_library_url=data.get("adLibraryUrl"),
+                    user_brief=data["userBrief"],
+                    website_profile=data.get("websiteProfile") or "screenshot",
+                    ad_library_profile=data.get("adLibraryProfile") or "text-only",
+                )
+            except Exception as e:
+                result = {"error": str(e)}
+            if result.get("error"):
+                await batch.store_error(item["index"], result["error"])
+            else:
+                await batch.store_result(item["index"], result)
+
+    await asyncio.gather(*(run_item(item) for item in batch.items))
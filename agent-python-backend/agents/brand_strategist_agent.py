@@ -1,45 +1,25 @@
 import vertexai
-from vertexai.generative_models import GenerativeModel, Part
+from vertexai.generative_models import Part
 import re
 import json
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from .fetch_profiles import fetch_page, get_fetch_profile
+from .metrics import stage
+from . import llm, rate_limit
+from .json_stream import IncrementalArrayParser, extract_json_object
 import base64
 
-async def analyze_url_with_playwright(url: str) -> dict:
+async def analyze_url_with_playwright(url: str, profile: str = "screenshot") -> dict:
     """
-    Uses Playwright to fetch text content AND take a screenshot of a URL.
-    This version is optimized for speed.
+    Uses Playwright to fetch text content AND (depending on the profile) a screenshot of a URL.
+    See fetch_profiles.FETCH_PROFILES for the available profiles; an unknown one raises ValueError.
     """
+    get_fetch_profile(profile)
     text_content = f"Could not fetch text content from {url}"
     screenshot_b64 = None
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            
-            # --- THIS IS THE OPTIMIZATION ---
-            # 1. Increased timeout to 20 seconds to handle slow pages.
-            # 2. Changed 'wait_until' to 'domcontentloaded' which is much faster 
-            #    than 'networkidle' as it doesn't wait for tracking scripts.
-            await page.goto(url, timeout=20000, wait_until='domcontentloaded')
-            
-            # Take a screenshot after the DOM is loaded
-            screenshot_bytes = await page.screenshot(full_page=True)
-            screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-
-            # Get the page content
-            html_content = await page.content()
-            await browser.close()
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            for script_or_style in soup(["script", "style"]):
-                script_or_style.decompose()
-            raw_text = soup.get_text()
-            lines = (line.strip() for line in raw_text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text_content = '\n'.join(chunk for chunk in chunks if chunk)
-            
+        page_data = await fetch_page(url, profile=profile)
+        text_content = page_data["text"]
+        screenshot_b64 = page_data["screenshot"]
     except Exception as e:
         error_message = f"Playwright failed to fetch {url}: {e}"
         print(error_message)
@@ -48,28 +28,45 @@ async def analyze_url_with_playwright(url: str) -> dict:
     return {"text": text_content, "screenshot": screenshot_b64}
 
 
-async def analyze_brand_with_llm(
-    project_id: str,
-    location: str,
+APPROACHES_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "approaches": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "Title": {"type": "STRING"},
+                    "Core Idea": {"type": "STRING"},
+                    "Description": {"type": "STRING"},
+                },
+                "required": ["Title", "Core Idea", "Description"],
+            },
+        },
+    },
+    "required": ["approaches"],
+}
+
+
+async def build_strategy_prompt(
     brand_name: str,
     website_url: str,
     ad_library_url: str,
-    user_brief: str
-) -> dict:
+    user_brief: str,
+    website_profile: str = "screenshot",
+    ad_library_profile: str = "text-only"
+) -> list:
     """
-    Performs multimodal analysis if possible, with a graceful fallback to text-only.
+    Fetches the website (and ad library) and assembles the multimodal strategist prompt,
+    with a graceful fallback to text-only when no screenshot is available.
     """
-    print(f"Starting analysis for brand: {brand_name}")
-    vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.5-pro") 
-
-    website_analysis = await analyze_url_with_playwright(website_url)
+    website_analysis = await analyze_url_with_playwright(website_url, profile=website_profile)
     website_content = website_analysis["text"]
     website_screenshot_b64 = website_analysis["screenshot"]
 
     ad_library_content = "No Ad Library URL provided."
     if ad_library_url:
-        ad_library_analysis = await analyze_url_with_playwright(ad_library_url)
+        ad_library_analysis = await analyze_url_with_playwright(ad_library_url, profile=ad_library_profile)
         ad_library_content = ad_library_analysis["text"]
 
     prompt_content = [
@@ -95,20 +92,72 @@ async def analyze_brand_with_llm(
     prompt_content.append("\n\n**CREATIVE TASK:**" \
                           "\nNow, generate three creative strategy approaches that align with the brand. For each approach, provide a Title, a Core Idea, and a Description." \
                           "\nFormat your response as a valid JSON object with a single key \"approaches\". Do not include your analysis, only the final JSON.")
+    return prompt_content
+
+
+async def analyze_brand_with_llm(
+    project_id: str,
+    location: str,
+    brand_name: str,
+    website_url: str,
+    ad_library_url: str,
+    user_brief: str,
+    website_profile: str = "screenshot",
+    ad_library_profile: str = "text-only"
+) -> dict:
+    """
+    Performs multimodal analysis if possible, with a graceful fallback to text-only.
+    The fetch profiles choose how much of each page is loaded; only the website
+    screenshot is used, so the ad library defaults to the cheaper text-only profile.
+    """
+    print(f"Starting analysis for brand: {brand_name}")
+    vertexai.init(project=project_id, location=location)
+    prompt_content = await build_strategy_prompt(brand_name, website_url, ad_library_url, user_brief, website_profile, ad_library_profile)
 
     try:
         print("Sending prompt to the Gemini LLM...")
-        response = model.generate_content(prompt_content) 
-        raw_llm_text = response.text
+        raw_llm_text = await llm.generate_text("gemini-2.5-pro", prompt_content, "brand_strategist.llm_call")
         
-        json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
-        if not json_match:
-            raise ValueError(f"LLM did not return valid JSON. Raw response: {raw_llm_text}")
-        
-        json_string = json_match.group(0)
-        json.loads(json_string)
+        with stage("brand_strategist.json_parse"):
+            json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
+            if not json_match:
+                raise ValueError(f"LLM did not return valid JSON. Raw response: {raw_llm_text}")
+            
+            json_string = json_match.group(0)
+            json.loads(json_string)
         
         return { "llm_response": json_string }
+    except rate_limit.RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"LLM generation or parsing failed: {e}")
-        return {"error": f"LLM generation failed: {e}"}
\ No newline at end of file
+        return {"error": f"LLM generation failed: {e}"}
+
+
+async def stream_brand_strategies(
+    project_id: str,
+    location: str,
+    brand_name: str,
+    website_url: str,
+    ad_library_url: str,
+    user_brief: str,
+    website_profile: str = "screenshot",
+    ad_library_profile: str = "text-only"
+):
+    """
+    Streaming version of analyze_brand_with_llm. Yields {"event": "approach", "data": {...}}
+    as soon as each strategy is complete, then {"event": "done", "data": {"llm_response": ...}}.
+    """
+    print(f"Starting streaming analysis for brand: {brand_name}")
+    vertexai.init(project=project_id, location=location)
+    prompt_content = await build_strategy_prompt(brand_name, website_url, ad_library_url, user_brief, website_profile, ad_library_profile)
+
+    parser = IncrementalArrayParser("approaches")
+    async for chunk in llm.stream_text("gemini-2.5-pro", prompt_content, "brand_strategist.llm_stream", APPROACHES_SCHEMA):
+        for approach in parser.feed(chunk):
+            yield {"event": "approach", "data": approach}
+
+    with stage("brand_strategist.json_parse"):
+        json_string = extract_json_object(parser.text)
+        json.loads(json_string)
+    yield {"event": "done", "data": {"llm_response": json_string}}
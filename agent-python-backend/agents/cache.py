@@ -0,0 +1,440 @@
+import hashlib
+import os
+import pickle
+import socket
+import sqlite3
+import ssl
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+from . import metrics
+
+# --- Shared Caches ---
+# Agents keep derived state (rollup cubes and their answers, normalized images, posterior
+# exports) behind one interface, so it can live outside the worker process. get_cache(namespace)
+# returns a CacheBackend chosen by the CACHE_BACKEND environment variable:
+#
+# - "memory" (default): an in-process LRU per namespace, bounded by entries and/or bytes.
+#   Values are stored as-is, so hits are free, but every uvicorn worker has its own copy.
+# - "sqlite": one SQLite file (CACHE_SQLITE_PATH) shared by every worker on the host. Each
+#   namespace keeps its entry and byte bounds, and the file as a whole is capped at
+#   CACHE_SQLITE_MAX_BYTES; both are trimmed least-recently-used first.
+# - "redis": any Redis-protocol server at REDIS_URL (redis://[:password@]host:port/db, or
+#   rediss:// for TLS), shared by every instance. Per-namespace bounds can't be enforced there,
+#   so entries rely on their namespace's TTL and then on the server's maxmemory policy.
+#
+# Every namespace has a default TTL (get_cache's `ttl`), which set() applies unless given one.
+#
+# The shared backends serialize with pickle protocol 5 and out-of-band buffers: numpy arrays
+# and the blocks of a DataFrame are written straight from their memory (no intermediate pickle
+# copy) and, on the way back, become read-only views into the one buffer the value was read
+# into. Only put values this service produced in a shared cache; the store has to be trusted.
+#
+# Cache failures never fail a request: a backend error is logged and counts as a miss.
+
+BACKENDS = ("memory", "sqlite", "redis")
+BUFFER_ALIGNMENT = 64  # offsets within an entry, so decoded arrays stay aligned for their dtype
+SMALL_PART_BYTES = 64 * 1024
+SQLITE_MAX_BYTES = int(os.environ.get("CACHE_SQLITE_MAX_BYTES", 2 * 1024 ** 3))
+SOCKET_TIMEOUT = 5.0
+_MAGIC = b"BRC1"
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _key_string(key) -> str:
+    """Strings are used as-is; anything else (tuples of path, mtime, size, ...) by the hash of its repr."""
+    return key if isinstance(key, str) else hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+# --- Zero-Copy Serialization ---
+def _padding(offset: int) -> int:
+    return -offset % BUFFER_ALIGNMENT
+
+
+def encode(value) -> list:
+    """
+    Serializes a value into a list of buffers to be written back to back. Large array data is
+    referenced, not copied: the list holds memoryviews of the arrays themselves.
+    Layout: magic, buffer count, payload and buffer sizes, pickle payload, then each
+    out-of-band buffer starting on a BUFFER_ALIGNMENT boundary.
+    """
+    buffers = []
+    payload = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    header = struct.pack(f"<4sI{len(raws) + 1}Q", _MAGIC, len(raws), len(payload), *(raw.nbytes for raw in raws))
+    parts, offset = [header, payload], len(header) + len(payload)
+    for raw in raws:
+        if _padding(offset):
+            parts.append(bytes(_padding(offset)))
+            offset += _padding(offset)
+        parts.append(raw)
+        offset += raw.nbytes
+    return parts
+
+
+def decode(data):
+    """Inverse of encode() for the concatenated bytes; arrays come back as views into `data`."""
+    view = memoryview(data)
+    magic, count = struct.unpack_from("<4sI", view)
+    if magic != _MAGIC:
+        raise ValueError("Not a cache entry.")
+    sizes = struct.unpack_from(f"<{count + 1}Q", view, 8)
+    offset = 8 + 8 * (count + 1)
+    payload = view[offset:offset + sizes[0]]
+    offset += sizes[0]
+    buffers = []
+    for size in sizes[1:]:
+        offset += _padding(offset)
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _nbytes(parts: list) -> int:
+    return sum(memoryview(part).nbytes for part in parts)
+
+
+def _sizeof(value) -> int:
+    """Approximate memory held by a cached value, for byte-bounded memory caches."""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=False).sum())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+# --- Backends ---
+class CacheBackend:
+    """
+    What every cache store implements. Keys are strings or any value with a stable repr;
+    values are any picklable object. `ttl` is in seconds; None uses the namespace's default
+    TTL, and a namespace without one keeps entries until they are evicted.
+    """
+
+    kind = "base"
+
+    def __init__(self, namespace: str, ttl: float | None = None):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        try:
+            value = self._get(_key_string(key))
+        except Exception as e:
+            print(f"Cache {self.kind}/{self.namespace} read failed: {e}")
+            value, result = None, "error"
+        else:
+            result = "miss" if value is None else "hit"
+        metrics.increment("braidai_cache_requests_total", (("namespace", self.namespace), ("backend", self.kind), ("result", result)))
+        return default if value is None else value
+
+    def set(self, key, value, ttl: float | None = None):
+        try:
+            self._set(_key_string(key), value, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            print(f"Cache {self.kind}/{self.namespace} write failed: {e}")
+
+    def delete(self, key):
+        try:
+            self._delete(_key_string(key))
+        except Exception as e:
+            print(f"Cache {self.kind}/{self.namespace} delete failed: {e}")
+
+    def _get(self, key: str):
+        raise NotImplementedError
+
+    def _set(self, key: str, value, ttl: float | None):
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU. Stores values as-is (callers must not mutate what they get back)."""
+
+    kind = "memory"
+
+    def __init__(self, namespace: str, max_entries: int | None = None, max_bytes: int | None = None, ttl: float | None = None):
+        super().__init__(namespace, ttl)
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key: str, value, ttl: float | None):
+        size = _sizeof(value) if self.max_bytes else 0
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            while len(self._entries) > 1 and (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Entries in one SQLite table on local disk, shared by every process on the host. Values are
+    written into a preallocated blob part by part, so encoding never joins them into one copy.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, namespace: str, path: str, max_entries: int | None = None, max_bytes: int | None = None,
+                 ttl: float | None = None, total_bytes: int = SQLITE_MAX_BYTES):
+        super().__init__(namespace, ttl)
+        self.path, self.total_bytes = path, total_bytes
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=SOCKET_TIMEOUT, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT UNIQUE NOT NULL, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, expires REAL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key: str):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT rowid, value FROM entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (f"{self.namespace}:{key}", time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE entries SET accessed = ? WHERE rowid = ?", (time.time(), row[0]))
+        return decode(row[1])
+
+    def _set(self, key: str, value, ttl: float | None):
+        parts = encode(value)
+        size = _nbytes(parts)
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, zeroblob(?), ?, ?, ?)",
+                (f"{self.namespace}:{key}", size, size, now + ttl if ttl else None, now),
+            )
+            with connection.blobopen("entries", "value", cursor.lastrowid) as blob:
+                for part in parts:
+                    blob.write(part)
+            self._trim(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _trim(self, connection: sqlite3.Connection):
+        connection.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        # This namespace's keys are the range ["namespace:", "namespace;"), which the key index serves.
+        namespace = (f"{self.namespace}:", f"{self.namespace};")
+        if self.max_entries:
+            connection.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries WHERE key >= ? AND key < ?"
+                " ORDER BY accessed DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (*namespace, self.max_entries),
+            )
+        if self.max_bytes:
+            # Keeps the most recently used entries that fit (the newest one always stays).
+            connection.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM (SELECT rowid, size, SUM(size) OVER"
+                " (ORDER BY accessed DESC, rowid DESC) AS running FROM entries WHERE key >= ? AND key < ?)"
+                " WHERE running > ? AND running > size)",
+                (*namespace, self.max_bytes),
+            )
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.total_bytes:
+            return
+        # Delete least recently used entries until the excess is gone (the newest entry stays).
+        connection.execute(
+            "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM (SELECT rowid, SUM(size) OVER"
+            " (ORDER BY accessed, rowid) - size AS before FROM entries) WHERE before < ?)"
+            " AND rowid != (SELECT rowid FROM entries ORDER BY accessed DESC, rowid DESC LIMIT 1)",
+            (total - self.total_bytes,),
+        )
+
+    def _delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (f"{self.namespace}:{key}",))
+
+
+class RedisError(Exception):
+    """An error reply from the Redis server."""
+
+
+class _RedisConnection:
+    """One blocking RESP2 connection; commands are written from the caller's buffers without joining them."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        host, port = parts.hostname or "localhost", parts.port or 6379
+        sock = socket.create_connection((host, port), timeout=SOCKET_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if parts.scheme == "rediss":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        if parts.password:
+            self.call("AUTH", *([unquote(parts.username)] if parts.username else []), unquote(parts.password))
+        database = parts.path.strip("/")
+        if database and database != "0":
+            self.call("SELECT", database)
+
+    def call(self, *args):
+        """Sends one command. An argument may be a list of buffers, sent as one bulk string."""
+        pending = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            pieces = arg if isinstance(arg, list) else [arg.encode("utf-8") if isinstance(arg, str) else arg]
+            pending.append(b"$%d\r\n" % _nbytes(pieces))
+            pending.extend(pieces)
+            pending.append(b"\r\n")
+        small = []
+        for piece in pending:
+            if memoryview(piece).nbytes < SMALL_PART_BYTES:
+                small.append(piece)
+                continue
+            if small:
+                self.sock.sendall(b"".join(small))
+                small = []
+            self.sock.sendall(piece)
+        if small:
+            self.sock.sendall(b"".join(small))
+        return self._reply()
+
+    def _reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the Redis server.")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            # Read the value straight into one buffer that decode() then slices without copying.
+            value = bytearray(size)
+            view, filled = memoryview(value), 0
+            while filled < size:
+                read = self.reader.readinto(view[filled:])
+                if not read:
+                    raise ConnectionError("Connection closed by the Redis server.")
+                filled += read
+            self.reader.read(2)
+            return value
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [self._reply() for _ in range(count)]
+        raise ConnectionError(f"Unexpected reply from the Redis server: {line[:40]!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisCache(CacheBackend):
+    """Entries in a Redis-protocol server, one connection per thread, shared by every instance."""
+
+    kind = "redis"
+
+    def __init__(self, namespace: str, url: str, ttl: float | None = None):
+        super().__init__(namespace, ttl)
+        self.url = url
+        self._local = threading.local()
+
+    def _call(self, *args):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = _RedisConnection(self.url)
+        try:
+            return connection.call(*args)
+        except RedisError:
+            raise
+        except Exception:
+            # The connection is in an unknown state; the next call reconnects.
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def _get(self, key: str):
+        data = self._call("GET", f"braidai:{self.namespace}:{key}")
+        # The reply was read into a bytearray; a read-only view keeps the decoded arrays read-only.
+        return None if data is None else decode(memoryview(data).toreadonly())
+
+    def _set(self, key: str, value, ttl: float | None):
+        expiry = ("PX", str(max(1, int(ttl * 1000)))) if ttl else ()
+        self._call("SET", f"braidai:{self.namespace}:{key}", encode(value), *expiry)
+
+    def _delete(self, key: str):
+        self._call("DEL", f"braidai:{self.namespace}:{key}")
+
+
+def get_cache(namespace: str, max_entries: int | None = None, max_bytes: int | None = None,
+              ttl: float | None = None) -> CacheBackend:
+    """
+    Returns the cache for a namespace, on the backend named by CACHE_BACKEND. `max_entries` and
+    `max_bytes` bound the namespace (except on redis); `ttl` is its default entry lifetime in seconds.
+    The first call for a namespace fixes its settings.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is not None:
+            return cache
+        backend = os.environ.get("CACHE_BACKEND", "memory").strip().lower()
+        if backend == "sqlite":
+            path = os.environ.get("CACHE_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "braidai-cache.sqlite3")
+            cache = SQLiteCache(namespace, path, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        elif backend == "redis":
+            cache = RedisCache(namespace, os.environ.get("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+        elif backend == "memory":
+            cache = MemoryCache(namespace, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        else:
+            raise ValueError(f"CACHE_BACKEND must be one of: {', '.join(BACKENDS)}.")
+        _caches[namespace] = cache
+        return cache
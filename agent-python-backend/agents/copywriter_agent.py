@@ -1,9 +1,55 @@
+import asyncio
 import vertexai
-from vertexai.generative_models import GenerativeModel
 import re
 import json
+from .metrics import stage
+from . import llm
+from .json_stream import IncrementalArrayParser, extract_json_object
 
-def generate_social_posts(
+POSTS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "posts": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "Hook": {"type": "STRING"},
+                    "Body": {"type": "STRING"},
+                    "CTA": {"type": "STRING"},
+                    "Hashtags": {"type": "ARRAY", "items": {"type": "STRING"}},
+                },
+                "required": ["Hook", "Body", "CTA", "Hashtags"],
+            },
+        },
+    },
+    "required": ["posts"],
+}
+
+def build_copywriter_prompt(brand_name: str, user_brief: str, selected_strategy: dict) -> str:
+    return f"""
+    You are an expert social media copywriter for a direct-to-consumer brand called "{brand_name}".
+    You have been given a creative strategy for a new campaign. Your task is to write three distinct social media posts that bring this strategy to life.
+
+    **CONTEXT:**
+    - **Original User Brief:** "{user_brief}"
+    - **Selected Strategic Direction:**
+        - Title: "{selected_strategy.get('Title')}"
+        - Core Idea: "{selected_strategy.get('Core Idea')}"
+        - Description: "{selected_strategy.get('Description')}"
+
+    **YOUR TASK:**
+    Write three distinct pieces of copy for a social media post (e.g., for Instagram or Facebook). For each one, provide:
+    1.  A compelling **Hook** (the first line to grab attention).
+    2.  A short **Body** paragraph that explains the concept.
+    3.  A strong **Call to Action (CTA)**.
+    4.  A list of 3-5 relevant **Hashtags**.
+
+    Format your response as a valid JSON object with a single key "posts", which is an array of the three post options.
+    Each post must use the keys "Hook", "Body", "CTA" and "Hashtags".
+    """
+
+async def generate_social_posts(
     project_id: str,
     location: str,
     brand_name: str,
@@ -15,36 +61,122 @@ def generate_social_posts(
     """
     print("Copywriter Agent: Starting process...")
     vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.5-pro")
+    copywriter_prompt = build_copywriter_prompt(brand_name, user_brief, selected_strategy)
+
+    print("Copywriter Agent: Briefing LLM to generate social media posts...")
+    raw_llm_text = await llm.generate_text("gemini-2.5-pro", copywriter_prompt, "copywriter.llm_call")
+    
+    with stage("copywriter.json_parse"):
+        json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
+        if not json_match:
+            raise ValueError("Copywriter LLM did not return valid JSON.")
+        
+        parsed_response = json.loads(json_match.group(0))
+    return parsed_response
+
+async def stream_social_posts(
+    project_id: str,
+    location: str,
+    brand_name: str,
+    user_brief: str,
+    selected_strategy: dict
+):
+    """
+    Streaming version of generate_social_posts. Yields {"event": "post", "data": {...}} as
+    soon as each post is complete, then {"event": "done", "data": <full response>}.
+    """
+    print("Copywriter Agent: Starting streaming process...")
+    vertexai.init(project=project_id, location=location)
+    copywriter_prompt = build_copywriter_prompt(brand_name, user_brief, selected_strategy)
+
+    parser = IncrementalArrayParser("posts")
+    async for chunk in llm.stream_text("gemini-2.5-pro", copywriter_prompt, "copywriter.llm_stream", POSTS_SCHEMA):
+        for post in parser.feed(chunk):
+            yield {"event": "post", "data": post}
+
+    with stage("copywriter.json_parse"):
+        parsed_response = json.loads(extract_json_object(parser.text))
+    yield {"event": "done", "data": parsed_response}
+
+
+# --- Grouped Generation (batch jobs) ---
+# Strategies that share a brand and a brief are written in one LLM call. Each strategy's
+# posts come back under its index; any strategy missing from the grouped answer is retried
+# on its own, so a partial grouped response never loses items.
 
-    copywriter_prompt = f"""
+def build_grouped_copywriter_prompt(brand_name: str, user_brief: str, strategies: list) -> str:
+    strategy_blocks = "\n".join(
+        f"""
+    ### Strategy {index}
+        - Title: "{strategy.get('Title')}"
+        - Core Idea: "{strategy.get('Core Idea')}"
+        - Description: "{strategy.get('Description')}"
+    """
+        for index, strategy in enumerate(strategies)
+    )
+    return f"""
     You are an expert social media copywriter for a direct-to-consumer brand called "{brand_name}".
-    You have been given a creative strategy for a new campaign. Your task is to write three distinct social media posts that bring this strategy to life.
+    You have been given {len(strategies)} creative strategies for new campaigns. For EACH strategy, write three distinct social media posts that bring it to life.
 
     **CONTEXT:**
     - **Original User Brief:** "{user_brief}"
-    - **Selected Strategic Direction:**
-        - Title: "{selected_strategy.get('Title')}"
-        - Core Idea: "{selected_strategy.get('Core Idea')}"
-        - Description: "{selected_strategy.get('Description')}"
+    - **Strategic Directions:**
+    {strategy_blocks}
 
     **YOUR TASK:**
-    Write three distinct pieces of copy for a social media post (e.g., for Instagram or Facebook). For each one, provide:
+    For each strategy, write three distinct pieces of copy for a social media post (e.g., for Instagram or Facebook). For each one, provide:
     1.  A compelling **Hook** (the first line to grab attention).
     2.  A short **Body** paragraph that explains the concept.
     3.  A strong **Call to Action (CTA)**.
     4.  A list of 3-5 relevant **Hashtags**.
 
-    Format your response as a valid JSON object with a single key "posts", which is an array of the three post options.
+    Format your response as a valid JSON object with a single key "results", which is an array with one entry per strategy.
+    Each entry has the key "strategy" (the strategy number above) and the key "posts", an array of the three post options.
+    Each post must use the keys "Hook", "Body", "CTA" and "Hashtags".
     """
 
-    print("Copywriter Agent: Briefing LLM to generate social media posts...")
-    response = model.generate_content(copywriter_prompt)
-    raw_llm_text = response.text
-    
-    json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
-    if not json_match:
-        raise ValueError("Copywriter LLM did not return valid JSON.")
-    
-    parsed_response = json.loads(json_match.group(0))
-    return parsed_response
\ No newline at end of file
+async def generate_social_posts_grouped(
+    project_id: str,
+    location: str,
+    brand_name: str,
+    user_brief: str,
+    strategies: list
+) -> list:
+    """
+    Generates social copy for several strategies of the same brand and brief in one LLM call.
+    Returns one {"posts": [...]} dict per strategy, in input order.
+    """
+    if len(strategies) == 1:
+        return [await generate_social_posts(project_id, location, brand_name, user_brief, strategies[0])]
+
+    print(f"Copywriter Agent: Writing posts for {len(strategies)} strategies in one call...")
+    vertexai.init(project=project_id, location=location)
+    prompt = build_grouped_copywriter_prompt(brand_name, user_brief, strategies)
+    raw_llm_text = await llm.generate_text("gemini-2.5-pro", prompt, "copywriter.grouped_llm_call")
+
+    results = [None] * len(strategies)
+    try:
+        with stage("copywriter.json_parse"):
+            parsed_response = json.loads(extract_json_object(raw_llm_text))
+        entries = parsed_response.get("results") if isinstance(parsed_response, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("expected an object with a 'results' list")
+        # Malformed entries are skipped; their strategies go through the individual retry below.
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index, posts = entry.get("strategy"), entry.get("posts")
+            if type(index) is int and 0 <= index < len(strategies) and isinstance(posts, list) and posts:
+                results[index] = {"posts": posts}
+    except ValueError as e:
+        print(f"Copywriter Agent: Grouped response could not be parsed, retrying individually: {e}")
+
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        retried = await asyncio.gather(*(
+            generate_social_posts(project_id, location, brand_name, user_brief, strategies[index])
+            for index in missing
+        ))
+        for index, result in zip(missing, retried):
+            results[index] = result
+    return results
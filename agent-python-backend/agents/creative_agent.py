@@ -1,6 +1,10 @@
 import vertexai
 from vertexai.preview.vision_models import ImageGenerationModel, Image
 import base64
+from .metrics import stage
+from . import rate_limit
+
+IMAGEN_MODEL = "imagen-4.0-ultra-generate-preview-06-06"
 
 PROMPT_ENHANCEMENTS = {
     "style": {
@@ -39,24 +43,30 @@ PROMPT_ENHANCEMENTS = {
     }
 }
 
-def _base64_to_image(base64_string: str) -> Image:
-    """Converts a base64 data URL to a Vertex AI Image object."""
-    image_data = base64.b64decode(base64_string.split(',')[1])
-    return Image(image_data)
+def _style_details(prompt_components: dict) -> str:
+    return ", ".join(filter(None, [
+        PROMPT_ENHANCEMENTS[key].get(prompt_components.get(key))
+        for key in ('style', 'camera', 'lighting', 'composition', 'modifiers')
+    ]))
 
 def generate_ad_creative(
     project_id: str,
     location: str,
     platform: str,
     prompt_components: dict,
-    subject_image_b64: str | None = None,
-    scene_image_b64: str | None = None
+    subject_image: bytes | None = None,
+    scene_image: bytes | None = None
 ) -> dict | None:
-    """Generates ad creative using Imagen from text and optional images."""
+    """
+    Generates ad creative using Imagen from text and optional images. The images are
+    normalized JPEG/PNG bytes (see image_inputs). A subject image is composited into the
+    described scene; without one, a scene image becomes the backdrop the subject is added to.
+    """
     vertexai.init(project=project_id, location=location)
-    model = ImageGenerationModel.from_pretrained("imagen-4.0-ultra-generate-preview-06-06")
+    model = ImageGenerationModel.from_pretrained(IMAGEN_MODEL)
 
-    subject_image = _base64_to_image(subject_image_b64) if subject_image_b64 else None
+    subject_image = Image(subject_image) if subject_image else None
+    scene_image = Image(scene_image) if scene_image and not subject_image else None
     negative_prompt = prompt_components.get('negativePrompt', '')
     
     try:
@@ -69,17 +79,19 @@ def generate_ad_creative(
 
             if subject_image:
                 scene_details = f"A new background scene described as: {prompt_components.get('sceneDescription', 'a clean studio background')}."
-                style_details = ", ".join(filter(None, [
-                    PROMPT_ENHANCEMENTS["style"].get(prompt_components.get('style')),
-                    PROMPT_ENHANCEMENTS["camera"].get(prompt_components.get('camera')),
-                    PROMPT_ENHANCEMENTS["lighting"].get(prompt_components.get('lighting')),
-                    PROMPT_ENHANCEMENTS["composition"].get(prompt_components.get('composition')),
-                    PROMPT_ENHANCEMENTS["modifiers"].get(prompt_components.get('modifiers'))
-                ]))
+                style_details = _style_details(prompt_components)
                 final_prompt = f"Task: Image Composition. Isolate the subject from the base image and place it in a new scene: \"{scene_details}\". The final composite must have this style: {style_details}. The final image should be a {prompt_components.get('imageType', 'product photo')}."
                 generation_params["prompt"] = final_prompt
                 generation_params["base_image"] = subject_image
-                response = model.edit_image(**generation_params)
+                with stage("creative.imagen_edit"):
+                    response = rate_limit.call_sync(IMAGEN_MODEL, lambda: model.edit_image(**generation_params))
+            elif scene_image:
+                subject = prompt_components.get('customSubject', 'a product')
+                final_prompt = f"Task: Image Composition. Keep the scene in the base image and add {subject} into it as the hero of the shot. The final composite must have this style: {_style_details(prompt_components)}. The final image should be a {prompt_components.get('imageType', 'product photo')}."
+                generation_params["prompt"] = final_prompt
+                generation_params["base_image"] = scene_image
+                with stage("creative.imagen_edit"):
+                    response = rate_limit.call_sync(IMAGEN_MODEL, lambda: model.edit_image(**generation_params))
             else:
                 prompt_parts = [
                     prompt_components.get('imageType', 'Product Photo'), "of",
@@ -93,7 +105,8 @@ def generate_ad_creative(
                 final_prompt = ", ".join(prompt_parts)
                 generation_params["prompt"] = final_prompt
                 generation_params["aspect_ratio"] = "1:1" if platform.lower() == 'meta' else "9:16"
-                response = model.generate_images(**generation_params)
+                with stage("creative.imagen_generate"):
+                    response = rate_limit.call_sync(IMAGEN_MODEL, lambda: model.generate_images(**generation_params))
             
             if response.images:
                 for image in response.images:
@@ -105,7 +118,10 @@ def generate_ad_creative(
             return {"image_urls": image_urls}
             
         return None
-        
+
+    except rate_limit.RateLimitExceeded:
+        # Let the API answer 429 with Retry-After instead of a generic failure.
+        raise
     except Exception as e:
         print(f"An error occurred during image generation: {str(e)}")
         return None
\ No newline at end of file
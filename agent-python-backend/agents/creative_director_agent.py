@@ -1,27 +1,17 @@
+import asyncio
 import vertexai
-from vertexai.generative_models import GenerativeModel
 import re
 import json
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 from . import creative_agent # We need to call our existing creative agent
+from .fetch_profiles import fetch_page, DEFAULT_PROFILE
+from .metrics import stage
+from . import llm, rate_limit
 
-async def get_text_from_url_playwright(url: str) -> str:
-    """Uses Playwright to fetch and parse text content from a URL."""
+async def get_text_from_url_playwright(url: str, profile: str = DEFAULT_PROFILE) -> str:
+    """Uses Playwright to fetch and parse text content from a URL (text-only profile by default)."""
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, timeout=60000)
-            html_content = await page.content()
-            await browser.close()
-            soup = BeautifulSoup(html_content, 'html.parser')
-            for script_or_style in soup(["script", "style"]):
-                script_or_style.decompose()
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            return '\n'.join(chunk for chunk in chunks if chunk)
+        page_data = await fetch_page(url, profile=profile)
+        return page_data["text"]
     except Exception as e:
         print(f"Playwright failed to fetch {url}: {e}")
         return f"An error occurred while fetching the content: {e}"
@@ -41,7 +31,6 @@ async def brief_to_prompts_and_assets(
     """
     print("Creative Director Agent: Starting process...")
     vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.5-pro")
 
     # --- Step 1: Fetch content again for deep analysis ---
     website_content = await get_text_from_url_playwright(website_url)
@@ -79,14 +68,14 @@ async def brief_to_prompts_and_assets(
     """
 
     print("Creative Director Agent: Briefing LLM to generate prompts...")
-    response = model.generate_content(creative_director_prompt)
-    raw_llm_text = response.text
+    raw_llm_text = await llm.generate_text("gemini-2.5-pro", creative_director_prompt, "creative_director.llm_call")
     
-    json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
-    if not json_match:
-        raise ValueError("Creative Director LLM did not return valid JSON for prompts.")
-    
-    parsed_response = json.loads(json_match.group(0))
+    with stage("creative_director.json_parse"):
+        json_match = re.search(r'\{.*\}', raw_llm_text, re.DOTALL)
+        if not json_match:
+            raise ValueError("Creative Director LLM did not return valid JSON for prompts.")
+        
+        parsed_response = json.loads(json_match.group(0))
     generated_prompts = parsed_response.get("prompts", [])
     
     if not generated_prompts:
@@ -95,11 +84,11 @@ async def brief_to_prompts_and_assets(
     print(f"Creative Director Agent: Generated {len(generated_prompts)} prompts. Now creating assets...")
 
     # --- Step 3: Call the Creative Agent for each generated prompt ---
-    # We will generate one image for each of the four prompts.
-    image_urls = []
-    for prompt in generated_prompts:
+    # We will generate one image for each of the four prompts. The Imagen calls block, so they
+    # run in worker threads; the Imagen quota limiter decides how many actually run at once.
+    def prompt_components_for(prompt: str) -> dict:
         # We re-use the components from the Manual Mode for consistency
-        prompt_components = {
+        return {
             "customSubject": brand_name,
             "sceneDescription": prompt, # The LLM's output is the scene description
             "imageType": 'Product Photo',
@@ -110,16 +99,23 @@ async def brief_to_prompts_and_assets(
             "modifiers": 'Ultra detailed',
             "negativePrompt": 'Low quality, blurry, watermark'
         }
-        
-        # Call the original creative agent
-        asset_data = creative_agent.generate_ad_creative(
+
+    # Call the original creative agent
+    asset_results = await asyncio.gather(*(
+        rate_limit.run_blocking(
+            creative_agent.generate_ad_creative,
             project_id=project_id,
             location=location,
             platform="meta", # Default to meta for now
-            prompt_components=prompt_components,
+            prompt_components=prompt_components_for(prompt),
         )
+        for prompt in generated_prompts
+    ))
+
+    image_urls = []
+    for asset_data in asset_results:
         if asset_data and asset_data.get("image_urls"):
             # generate_ad_creative returns a list, we just want the first one here
             image_urls.append(asset_data["image_urls"][0])
 
-    return {"image_urls": image_urls}
\ No newline at end of file
+    return {"image_urls": image_urls}
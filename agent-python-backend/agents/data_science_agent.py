@@ -4,29 +4,206 @@ import base64
 import re
 import json
 import os
+import threading
 import vertexai
 from vertexai.generative_models import GenerativeModel
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
-from lightweight_mmm.lightweight_mmm import LightweightMMM
-from lightweight_mmm import plot
-from lightweight_mmm import preprocessing
-from lightweight_mmm import optimize_media
+from .metrics import stage
+from . import cache, metrics, mmm_fitting, posterior_export, rate_limit, rollups
+
+MAX_CHART_GROUPS = 40
+MAX_CACHED_ANSWERS = 1024
+
+# pyplot's current figure and rcParams (which plt.style.context() swaps) are process-global,
+# and agents run in concurrent worker threads, so every render that touches them holds this.
+_PYPLOT_LOCK = threading.Lock()
 
 def get_df_schema(df: pd.DataFrame) -> str:
-    # This function is correct and remains unchanged.
-    pass
+    """Describes a DataFrame for a prompt: its size, and each column's dtype and sample values."""
+    sample = df.head(1000)
+    lines = [f"{len(df)} rows, {len(df.columns)} columns:"]
+    for column in df.columns:
+        examples = ", ".join(str(value) for value in sample[column].dropna().unique()[:3])
+        lines.append(f"- {column} ({df[column].dtype}), e.g. {examples}")
+    return "\n".join(lines)
+
+
+def _format_value(value, aggregation: str) -> str:
+    if pd.isna(value):
+        return "n/a"
+    if aggregation == "rate":
+        return f"{value:.1%}"
+    return f"{value:,.0f}" if float(value).is_integer() or abs(value) >= 1000 else f"{value:,.2f}"
+
+
+def _render_bar_chart(table: pd.DataFrame, title: str) -> str:
+    # A standalone Figure rather than pyplot's current one; only the style swap needs the lock.
+    with _PYPLOT_LOCK, plt.style.context('dark_background'):
+        fig = Figure(figsize=(10, 5))
+        ax = fig.subplots()
+        table.plot.bar(ax=ax, legend=len(table.columns) > 1, rot=45 if len(table) > 6 else 0)
+        ax.set_title(title)
+        ax.set_xlabel(" / ".join(str(name) for name in table.index.names if name))
+        image_buffer = io.BytesIO()
+        fig.savefig(image_buffer, format='PNG', bbox_inches='tight', transparent=True)
+    return f"data:image/png;base64,{base64.b64encode(image_buffer.getvalue()).decode()}"
 
-def run_standard_agent(dataframe: pd.DataFrame, user_prompt: str, project_id: str, location: str, model_name: str) -> dict:
-    # This function is correct and remains unchanged.
-    pass
 
-def run_bayesian_mmm_agent(dataframe: pd.DataFrame, project_id: str, location: str, model_name: str, revenue_target: float) -> dict:
+def _render_generated_plot(generated_code: str, dataframe: pd.DataFrame, stage_name: str, style: str | None = None) -> str:
+    """Runs model-written pyplot code against `df` and returns the plot as a PNG data URL."""
+    image_buffer = io.BytesIO()
+    local_vars = {'df': dataframe, 'plt': plt, 'np': np, 'pd': pd}
+    with _PYPLOT_LOCK, plt.style.context(style or {}):
+        try:
+            plt.figure()
+            with stage(stage_name):
+                exec(generated_code, globals(), local_vars)
+            plt.savefig(image_buffer, format='PNG', bbox_inches='tight', transparent=True)
+        finally:
+            plt.close('all')
+    return f"data:image/png;base64,{base64.b64encode(image_buffer.getvalue()).decode()}"
+
+
+def answer_from_rollups(cube: rollups.RollupCube, user_prompt: str) -> dict | None:
     """
-    Runs a reproducible Bayesian MMM and generates a standardized dashboard.
+    The fast path: answers a plain aggregate question ("profit by Category") from the rollup
+    cube, with no LLM call and no pass over the raw rows. Returns None if the question isn't one.
     """
+    with stage("standard.rollup_query"):
+        query = rollups.parse_question(cube, user_prompt)
+        if query is None:
+            return None
+        # Answers are deterministic, so the ones already rendered for a cached cube are kept.
+        answers = cache.get_cache("rollup_answers", max_entries=MAX_CACHED_ANSWERS, ttl=rollups.CUBE_TTL)
+        key = (cube.key, json.dumps(query, sort_keys=True)) if cube.key is not None else None
+        report = answers.get(key) if key else None
+        if report is not None:
+            return report
+        table = cube.query(query["dimensions"], query["measures"], query["aggregation"])
+    table.index = table.index.map(lambda label: " / ".join(map(str, label)) if isinstance(label, tuple) else str(label))
+    table.index.names = [" / ".join(query["dimensions"]) or None]
+    label = {"sum": "Total", "mean": "Average", "min": "Minimum", "max": "Maximum", "count": "Number of", "rate": "Rate of"}
+    names = [f"{label[query['aggregation']]} {measure}" for measure in query["measures"]] or ["Rows"]
+    table.columns = names
+    if query["ascending"] is not None:
+        table = table.sort_values(names[0], ascending=query["ascending"])
+        table = table.head(query["limit"]) if query["limit"] else table
+
+    title = f"{' and '.join(names)}" + (f" by {' and '.join(query['dimensions'])}" if query["dimensions"] else "")
+    insights, sentences = [], []
+    for name in names:
+        column = table[name].dropna()
+        if column.empty:
+            continue
+        if not query["dimensions"]:
+            insights.append({"insight": name, "metric": _format_value(column.iloc[0], query["aggregation"])})
+            continue
+        top, bottom = column.idxmax(), column.idxmin()
+        insights.append({"insight": f"Highest {name}: {top}", "metric": _format_value(column[top], query["aggregation"])})
+        if len(column) > 1:
+            insights.append({"insight": f"Lowest {name}: {bottom}", "metric": _format_value(column[bottom], query["aggregation"])})
+            sentences.append(
+                f"{name} ranges from {_format_value(column[bottom], query['aggregation'])} ({bottom}) "
+                f"to {_format_value(column[top], query['aggregation'])} ({top}) across {len(column)} groups."
+            )
+    summary = " ".join(sentences) or f"{title} across all {cube.rows:,} rows."
+    report = {
+        "reportTitle": title,
+        "keyInsights": insights,
+        "summary": summary,
+        "table": json.loads(table.reset_index(drop=not query["dimensions"]).to_json(orient="split", index=False)),
+        "source": "rollup",
+    }
+    if query["dimensions"] and 1 < len(table) <= MAX_CHART_GROUPS:
+        with stage("standard.rollup_chart"):
+            report["visualization"] = _render_bar_chart(table, title)
+    if key:
+        answers.set(key, report)
+    return report
+
+
+def answer_from_cached_cube(dataset_key, user_prompt: str) -> dict | None:
+    """
+    The fast path for a dataset whose cube is already cached: answers without loading the
+    dataset at all. Returns None if there is no cached cube or the question isn't a plain aggregate.
+    """
+    cube = rollups.cached_cube(dataset_key)
+    report = answer_from_rollups(cube, user_prompt) if cube is not None else None
+    if report is not None:
+        metrics.increment("braidai_standard_fast_path_total", (("result", "hit"),))
+    return report
+
+
+def run_standard_agent(dataframe: pd.DataFrame, user_prompt: str, project_id: str, location: str, model_name: str, dataset_key=None) -> dict:
+    """
+    Answers a question about a dataset. Plain aggregates are answered from the dataset's rollup
+    cube (cached under `dataset_key` when given); everything else goes to Gemini, which writes
+    the report and the plotting code, with the cube's small rollups as exact numbers to narrate.
+    """
+    try:
+        with stage("standard.rollup_build"):
+            cube = rollups.get_cube(dataset_key, dataframe) if dataset_key is not None else rollups.RollupCube(dataframe)
+    except Exception as e:
+        # Some datasets have nothing to roll up (no measures, or no dimensions); Gemini still answers.
+        print(f"Could not build a rollup cube, answering without one: {e}")
+        cube = None
+    report = answer_from_rollups(cube, user_prompt) if cube is not None else None
+    metrics.increment("braidai_standard_fast_path_total", (("result", "hit" if report else "miss"),))
+    if report is not None:
+        return report
+    aggregates = f"""
+    Exact pre-computed aggregates you can quote:
+    {cube.describe()}""" if cube is not None else ""
+
+    vertexai.init(project=project_id, location=location)
+    generative_model = GenerativeModel(model_name)
+    prompt = f"""
+    You are a world-class data analytics consultant.
+    A pandas DataFrame `df` with this schema is available:
+    {get_df_schema(dataframe)}{aggregates}
+    The user's request is: "{user_prompt}"
+    Structure your output as a JSON object:
+    {{
+      "reportTitle": "A short title for the analysis.",
+      "keyInsights": [{{"insight": "A key finding.", "metric": "The number that supports it."}}],
+      "summary": "A text-based answer to the request.",
+      "visualizationCode": "Python code that draws one matplotlib plot from `df` (no plt.show()). Return '' if none.",
+      "recommendations": ["An actionable recommendation."]
+    }}
+    Ensure the final output is ONLY the JSON object.
+    """
+    try:
+        with stage("standard.llm_call"):
+            response = rate_limit.call_sync(model_name, lambda: generative_model.generate_content(prompt), rate_limit.estimate_tokens(prompt))
+            raw_text = response.text.strip()
+        with stage("standard.json_parse"):
+            json_str_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+            if not json_str_match: raise ValueError("Model did not return valid JSON.")
+            report_data = json.loads(json_str_match.group(0))
+        generated_code = report_data.pop("visualizationCode", "").strip()
+        if generated_code:
+            report_data["visualization"] = _render_generated_plot(generated_code, dataframe, "standard.exec_visualization", 'dark_background')
+        return report_data
+    except rate_limit.RateLimitExceeded:
+        raise
+    except Exception as e:
+        return {"error": f"An error occurred during analysis: {str(e)}"}
+
+def run_bayesian_mmm_agent(dataframe: pd.DataFrame, project_id: str, location: str, model_name: str, revenue_target: float,
+                           specification: str = "carryover", fit_id: str | None = None) -> dict:
+    """
+    Runs a reproducible Bayesian MMM and generates a standardized dashboard. `specification`
+    is a lightweight_mmm model name, or "compare" to fit them all in parallel and use the best.
+    With a `fit_id`, the fitted model is registered for posterior export under that id.
+    """
+    # lightweight_mmm drags in JAX and numpyro; only the MMM path should pay for that import.
+    from lightweight_mmm import plot
+    from lightweight_mmm import optimize_media
+
     vertexai.init(project=project_id, location=location)
     generative_model = GenerativeModel(model_name)
 
@@ -38,28 +215,35 @@ def run_bayesian_mmm_agent(dataframe: pd.DataFrame, project_id: str, location: s
         extra_features = data[['Competitor_Spend', 'Inflation_Index']].values
         costs = np.sum(media_spend, axis=0)
 
-        print("Training Bayesian MMM with fixed seed for reproducibility...")
-        mmm = LightweightMMM(model_name="carryover")
-        
-        mmm.fit(media=media_spend,
-                extra_features=extra_features,
-                media_prior=costs,
-                target=target,
-                number_warmup=1000,
-                number_samples=1000,
-                number_chains=1,
-                seed=42)
+        comparison = None
+        if specification == "compare":
+            print(f"Comparing MMM specifications {', '.join(mmm_fitting.MMM_SPECIFICATIONS)} in parallel...")
+            with stage("mmm.compare_fits"):
+                comparison = mmm_fitting.compare_specifications(media_spend, extra_features, target, media_names)
+            mmm = comparison.pop("model")
+        else:
+            print("Training Bayesian MMM with fixed seed for reproducibility...")
+            with stage("mmm.fit"):
+                mmm = mmm_fitting.fit_mmm(specification, media_spend, extra_features, target)
         print("MMM Training Complete.")
+        if fit_id:
+            with stage("mmm.posterior_export"):
+                exported = posterior_export.register_fit(
+                    fit_id, mmm, media_spend, extra_features, target, media_names, dataframe['Date'].astype(str).tolist(),
+                    comparison["winner"] if comparison else specification,
+                )
+            fit_id = fit_id if exported else None
 
         media_contribution, roi_hat = mmm.get_posterior_metrics()
         n_time_periods = 12
         
-        solution = optimize_media.find_optimal_budgets(
-            n_time_periods=n_time_periods,
-            media_mix_model=mmm,
-            budget=np.sum(costs) * (n_time_periods / len(target)),
-            prices=np.mean(media_spend, axis=0)
-        )
+        with stage("mmm.budget_optimization"):
+            solution = optimize_media.find_optimal_budgets(
+                n_time_periods=n_time_periods,
+                media_mix_model=mmm,
+                budget=np.sum(costs) * (n_time_periods / len(target)),
+                prices=np.mean(media_spend, axis=0)
+            )
         
         interpretation_prompt = f"""
         You are a world-class marketing analytics consultant interpreting a standardized MMM dashboard.
@@ -75,82 +259,99 @@ def run_bayesian_mmm_agent(dataframe: pd.DataFrame, project_id: str, location: s
           "recommendations": ["Based on the Optimal Budget Allocation, recommend specific budget shifts."]
         }}
         """
-        response = generative_model.generate_content(interpretation_prompt)
-        raw_text = response.text.strip()
-        json_str_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        if not json_str_match:
-            raise ValueError("The interpretation model did not return valid JSON object.")
-        report_data = json.loads(json_str_match.group(0))
+        if comparison:
+            candidates = "; ".join(
+                f"{c['model']}: holdout sMAPE {c['holdoutSmape']:.1%}, ELPD-LOO {c['elpdLoo'] if c['elpdLoo'] is None else round(c['elpdLoo'], 1)}"
+                for c in comparison["candidates"]
+            )
+            interpretation_prompt += f"""
+        The dashboard uses the "{comparison['winner']}" specification, chosen over the others on
+        out-of-sample error (last {comparison['holdoutWeeks']} weeks held out): {candidates}.
+        Mention in the summary which specification was chosen and how clearly it won.
+        """
+        with stage("mmm.llm_call"):
+            response = rate_limit.call_sync(model_name, lambda: generative_model.generate_content(interpretation_prompt), rate_limit.estimate_tokens(interpretation_prompt))
+            raw_text = response.text.strip()
+        with stage("mmm.json_parse"):
+            json_str_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+            if not json_str_match:
+                raise ValueError("The interpretation model did not return valid JSON object.")
+            report_data = json.loads(json_str_match.group(0))
 
         # --- THIS IS THE ROBUST FIX FOR VISUALIZATION ---
         # Generate each plot individually and save it to an in-memory buffer
         
-        plt.style.use('dark_background')
-
-        # Plot 1: Media Contribution
-        fig1 = plot.plot_media_baseline_contribution_area_plot(media_mix_model=mmm, channel_names=media_names, fig_size=(10, 6))
-        fig1.suptitle("Media & Baseline Contribution")
-        buf1 = io.BytesIO()
-        fig1.savefig(buf1, format='png', bbox_inches='tight')
-        buf1.seek(0)
-        img1 = plt.imread(buf1)
-        plt.close(fig1)
-
-        # Plot 2: ROI
-        fig2 = plot.plot_media_roi_hat(media_mix_model=mmm, total_costs=costs, channel_names=media_names, fig_size=(10, 6))
-        fig2.suptitle("Return on Investment (ROI) by Channel")
-        buf2 = io.BytesIO()
-        fig2.savefig(buf2, format='png', bbox_inches='tight')
-        buf2.seek(0)
-        img2 = plt.imread(buf2)
-        plt.close(fig2)
-
-        # Plot 3: Response Curves
-        fig3 = plot.plot_response_curves(media_mix_model=mmm, prices=np.mean(media_spend, axis=0), channel_names=media_names, fig_size=(10, 6))
-        fig3.suptitle("Response Curves (mROI)")
-        buf3 = io.BytesIO()
-        fig3.savefig(buf3, format='png', bbox_inches='tight')
-        buf3.seek(0)
-        img3 = plt.imread(buf3)
-        plt.close(fig3)
-
-        # Plot 4: Optimal Budget (Manual Plot)
-        fig4, ax4 = plt.subplots(figsize=(10, 6))
-        ax4.bar(media_names, solution.x, color='skyblue')
-        ax4.set_title(f"Optimal Budget Allocation (Next {n_time_periods} Weeks)")
-        ax4.tick_params(axis='x', rotation=45, labelsize=8)
-        fig4.suptitle("Optimal Budget Allocation")
-        buf4 = io.BytesIO()
-        fig4.savefig(buf4, format='png', bbox_inches='tight')
-        buf4.seek(0)
-        img4 = plt.imread(buf4)
-        plt.close(fig4)
-
-        # Combine the four plots into a single figure
-        final_fig, final_axes = plt.subplots(2, 2, figsize=(20, 12))
-        final_fig.suptitle('Standardized MMM Dashboard', fontsize=20)
+        with stage("mmm.dashboard_render"), _PYPLOT_LOCK, plt.style.context('dark_background'):
+            # Plot 1: Media Contribution
+            fig1 = plot.plot_media_baseline_contribution_area_plot(media_mix_model=mmm, channel_names=media_names, fig_size=(10, 6))
+            fig1.suptitle("Media & Baseline Contribution")
+            buf1 = io.BytesIO()
+            fig1.savefig(buf1, format='png', bbox_inches='tight')
+            buf1.seek(0)
+            img1 = plt.imread(buf1)
+            plt.close(fig1)
+
+            # Plot 2: ROI
+            fig2 = plot.plot_media_roi_hat(media_mix_model=mmm, total_costs=costs, channel_names=media_names, fig_size=(10, 6))
+            fig2.suptitle("Return on Investment (ROI) by Channel")
+            buf2 = io.BytesIO()
+            fig2.savefig(buf2, format='png', bbox_inches='tight')
+            buf2.seek(0)
+            img2 = plt.imread(buf2)
+            plt.close(fig2)
+
+            # Plot 3: Response Curves
+            fig3 = plot.plot_response_curves(media_mix_model=mmm, prices=np.mean(media_spend, axis=0), channel_names=media_names, fig_size=(10, 6))
+            fig3.suptitle("Response Curves (mROI)")
+            buf3 = io.BytesIO()
+            fig3.savefig(buf3, format='png', bbox_inches='tight')
+            buf3.seek(0)
+            img3 = plt.imread(buf3)
+            plt.close(fig3)
+
+            # Plot 4: Optimal Budget (Manual Plot)
+            fig4, ax4 = plt.subplots(figsize=(10, 6))
+            ax4.bar(media_names, solution.x, color='skyblue')
+            ax4.set_title(f"Optimal Budget Allocation (Next {n_time_periods} Weeks)")
+            ax4.tick_params(axis='x', rotation=45, labelsize=8)
+            fig4.suptitle("Optimal Budget Allocation")
+            buf4 = io.BytesIO()
+            fig4.savefig(buf4, format='png', bbox_inches='tight')
+            buf4.seek(0)
+            img4 = plt.imread(buf4)
+            plt.close(fig4)
+
+            # Combine the four plots into a single figure
+            final_fig, final_axes = plt.subplots(2, 2, figsize=(20, 12))
+            final_fig.suptitle('Standardized MMM Dashboard', fontsize=20)
         
-        final_axes[0, 0].imshow(img1)
-        final_axes[0, 0].axis('off')
+            final_axes[0, 0].imshow(img1)
+            final_axes[0, 0].axis('off')
         
-        final_axes[0, 1].imshow(img2)
-        final_axes[0, 1].axis('off')
+            final_axes[0, 1].imshow(img2)
+            final_axes[0, 1].axis('off')
 
-        final_axes[1, 0].imshow(img3)
-        final_axes[1, 0].axis('off')
+            final_axes[1, 0].imshow(img3)
+            final_axes[1, 0].axis('off')
 
-        final_axes[1, 1].imshow(img4)
-        final_axes[1, 1].axis('off')
+            final_axes[1, 1].imshow(img4)
+            final_axes[1, 1].axis('off')
 
-        plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-        final_image_buffer = io.BytesIO()
-        final_fig.savefig(final_image_buffer, format='PNG', bbox_inches='tight')
-        plt.close(final_fig)
+            plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+            final_image_buffer = io.BytesIO()
+            final_fig.savefig(final_image_buffer, format='PNG', bbox_inches='tight')
+            plt.close(final_fig)
 
-        image_b64 = base64.b64encode(final_image_buffer.getvalue()).decode()
+            image_b64 = base64.b64encode(final_image_buffer.getvalue()).decode()
         report_data["visualization"] = f"data:image/png;base64,{image_b64}"
+        if comparison:
+            report_data["modelComparison"] = comparison
+        if fit_id:
+            report_data["fitId"] = fit_id
 
         return report_data
+    except rate_limit.RateLimitExceeded:
+        raise
     except Exception as e:
         return {"error": f"An error occurred during MMM analysis: {str(e)}"}
 
@@ -170,20 +371,18 @@ def run_follow_up_agent(dataframe: pd.DataFrame, original_prompt: str, follow_up
     Ensure the final output is ONLY the JSON object.
     """
     try:
-        response = generative_model.generate_content(prompt)
-        raw_text = response.text.strip()
-        json_str_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        if not json_str_match: raise ValueError("Model did not return valid JSON.")
-        report_data = json.loads(json_str_match.group(0))
+        with stage("follow_up.llm_call"):
+            response = rate_limit.call_sync(model_name, lambda: generative_model.generate_content(prompt), rate_limit.estimate_tokens(prompt))
+            raw_text = response.text.strip()
+        with stage("follow_up.json_parse"):
+            json_str_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+            if not json_str_match: raise ValueError("Model did not return valid JSON.")
+            report_data = json.loads(json_str_match.group(0))
         generated_code = report_data.get("visualizationCode", "").strip()
         if generated_code:
-            image_buffer = io.BytesIO()
-            local_vars = {'df': dataframe, 'plt': plt, 'np': np, 'pd': pd}
-            exec(generated_code, globals(), local_vars)
-            plt.savefig(image_buffer, format='PNG', bbox_inches='tight', transparent=True)
-            plt.close()
-            image_b64 = base64.b64encode(image_buffer.getvalue()).decode()
-            report_data["visualization"] = f"data:image/png;base64,{image_b64}"
+            report_data["visualization"] = _render_generated_plot(generated_code, dataframe, "follow_up.exec_visualization")
         return report_data
+    except rate_limit.RateLimitExceeded:
+        raise
     except Exception as e:
         return {"error": str(e)}
\ No newline at end of file
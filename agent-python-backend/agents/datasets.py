@@ -0,0 +1,616 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13 only ships the old module name
+    from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+# --- User Dataset Uploads ---
+# Customers upload their own (multi-GB) CSV exports. Ingest memory is bounded by
+# UPLOAD_CHUNK_BYTES and INGEST_CHUNK_ROWS, never by the file size:
+#
+# 1. stream_upload() feeds the raw request body through a push-style multipart parser and
+#    writes the file part to a temp file in DATA_DIR in ~UPLOAD_CHUNK_BYTES writes, hashing
+#    it on the way.
+# 2. ingest_csv() profiles the CSV in row chunks to pick the smallest safe dtype for every
+#    column (int8..int64, float32 when lossless enough, categories for low-cardinality text,
+#    dates), then converts it in a second chunked pass to a typed Parquet copy.
+# 3. The dataset is registered in DATA_DIR/datasets.json under its SHA-256, together with
+#    its schema and whether it has what the Bayesian MMM path needs. Uploading the same
+#    bytes again returns the existing entry. Every worker process updates the registry
+#    under an exclusive fcntl lock and replaces it atomically, so none of them loses
+#    another's entry.
+#
+# The data-science endpoints then load registered datasets through load_dataset(), which
+# reads the typed Parquet copy instead of re-parsing the CSV.
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 20 * 1024 ** 3))
+INGEST_CHUNK_ROWS = 100_000
+CATEGORY_MAX_UNIQUE = 1000
+FLOAT32_TOLERANCE = 1e-3
+REGISTRY_FILENAME = "datasets.json"
+REGISTRY_LOCK_FILENAME = "datasets.json.lock"
+
+MMM_REQUIRED_COLUMNS = ("Date", "Sales", "Competitor_Spend", "Inflation_Index")
+
+_registry_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """The upload or its contents were rejected; `status_code` is the HTTP status to return."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# --- Streaming Multipart Upload ---
+def _safe_stem(filename: str) -> str:
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", stem).strip("._")[:80] or "dataset"
+
+
+async def stream_upload(content_type: str, body_chunks, data_dir: str) -> dict:
+    """
+    Writes the `file` part of a multipart/form-data body to a temp file without buffering it.
+    `body_chunks` is an async iterator of raw body bytes (Request.stream()).
+    Returns {"path", "filename", "sha256", "bytes"}.
+    """
+    media_type, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected a multipart/form-data body with a 'file' field.")
+
+    os.makedirs(data_dir, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=data_dir, prefix=".upload-", suffix=".part", delete=False)
+    hasher = hashlib.sha256()
+    state = {"headers": {}, "field": b"", "value": b"", "in_file": False, "filename": None, "found": False, "bytes": 0}
+    pending, pending_bytes = [], 0
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["in_file"] = disposition.get(b"name") == b"file" and not state["found"]
+        if state["in_file"]:
+            state["found"] = True
+            state["filename"] = (disposition.get(b"filename") or b"upload.csv").decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        nonlocal pending_bytes
+        if state["in_file"]:
+            pending.append(bytes(data[start:end]))
+            pending_bytes += end - start
+            state["bytes"] += end - start
+
+    def on_part_end():
+        state["in_file"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    def write_pieces(pieces: list):
+        for piece in pieces:
+            handle.write(piece)
+            hasher.update(piece)
+
+    async def flush():
+        nonlocal pending, pending_bytes
+        pieces, pending, pending_bytes = pending, [], 0
+        await asyncio.to_thread(write_pieces, pieces)
+
+    try:
+        async for chunk in body_chunks:
+            parser.write(chunk)
+            if state["bytes"] > MAX_UPLOAD_BYTES:
+                raise UploadError(f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes.", status_code=413)
+            if pending_bytes >= UPLOAD_CHUNK_BYTES:
+                await flush()
+        parser.finalize()
+        await flush()
+        handle.close()
+        if not state["found"]:
+            raise UploadError("No 'file' field found in the upload.")
+        if not state["filename"].lower().endswith(".csv"):
+            raise UploadError("Only .csv uploads are supported.")
+        if state["bytes"] == 0:
+            raise UploadError("The uploaded file is empty.")
+    except MultipartParseError as e:
+        handle.close()
+        os.remove(handle.name)
+        raise UploadError(f"Malformed multipart body: {e}")
+    except BaseException:
+        handle.close()
+        os.remove(handle.name)
+        raise
+
+    return {"path": handle.name, "filename": state["filename"], "sha256": hasher.hexdigest(), "bytes": state["bytes"]}
+
+
+# --- Chunked Dtype Inference ---
+class _ColumnProfile:
+    """What one column's values look like across every chunk seen so far."""
+
+    def __init__(self):
+        self.kind = None           # "numeric", "datetime" or "text"
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.integral = True
+        self.float32_ok = True
+        self.categories = set()    # emptied and disabled once it exceeds CATEGORY_MAX_UNIQUE
+        self.category_ok = True
+
+    def add(self, name: str, values: pd.Series):
+        self.nulls += int(values.isna().sum())
+        present = values.dropna()
+        if present.empty:
+            return
+        if pd.api.types.is_bool_dtype(present) or pd.api.types.is_numeric_dtype(present):
+            if self.kind is None:
+                self.kind = "numeric"
+            if self.kind == "numeric":
+                self._add_numbers(present.astype("float64").to_numpy())
+                return
+        elif self.kind in (None, "datetime") and _looks_like_dates(name, present) and _parse_dates(present, strict=False).notna().all():
+            # Every value in the chunk must parse, not just the sample, or the column is text.
+            self.kind = "datetime"
+            return
+        # Mixed or text content: keep the column as text from here on. Categories are only
+        # collected from raw text chunks, so a column that was ever parsed as numbers or
+        # dates falls back to plain strings rather than risk an incomplete category list.
+        if self.kind not in (None, "text") or values.dtype != object:
+            self.category_ok = False
+        self.kind = "text"
+        if self.category_ok:
+            self.categories.update(present.astype(str).unique())
+            if len(self.categories) > CATEGORY_MAX_UNIQUE:
+                self.categories, self.category_ok = set(), False
+
+    def _add_numbers(self, numbers: np.ndarray):
+        low, high = numbers.min(), numbers.max()
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.integral:
+            self.integral = bool(np.all(np.mod(numbers, 1) == 0))
+        if self.float32_ok:
+            error = np.abs(numbers.astype(np.float32).astype(np.float64) - numbers)
+            self.float32_ok = bool(np.nanmax(error) <= FLOAT32_TOLERANCE) if len(error) else True
+
+    def dtype(self, rows: int):
+        if self.kind == "numeric":
+            if self.integral and self.minimum is not None:
+                for bits in (8, 16, 32, 64):
+                    info = np.iinfo(f"{'u' if self.minimum >= 0 else ''}int{bits}")
+                    if info.min <= self.minimum and self.maximum <= info.max:
+                        name = f"{'U' if self.minimum >= 0 else ''}Int{bits}"
+                        return name if self.nulls else name.lower()
+            return "float32" if self.float32_ok else "float64"
+        if self.kind == "datetime":
+            return "datetime64[ns]"
+        if self.kind == "text" and self.category_ok and len(self.categories) <= max(1, rows // 2):
+            return pd.CategoricalDtype(sorted(self.categories))
+        return "string" if self.kind == "text" else "float64"
+
+
+def _looks_like_dates(name: str, values: pd.Series) -> bool:
+    if values.dtype != object:
+        return False
+    sample = values.head(100)
+    if "date" not in name.lower() and not sample.astype(str).str.match(r"^\d{4}-\d{2}-\d{2}").all():
+        return False
+    return pd.to_datetime(sample, errors="coerce", format="mixed").notna().all()
+
+
+def _parse_dates(values: pd.Series, strict: bool = True) -> pd.Series:
+    """Parses date strings (fast ISO 8601 path first). Bad values raise, or become NaT if not strict."""
+    try:
+        return pd.to_datetime(values, format="ISO8601")
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, errors="raise" if strict else "coerce", format="mixed")
+
+
+def _read_chunks(path: str, dtype=None):
+    return pd.read_csv(path, chunksize=INGEST_CHUNK_ROWS, dtype=dtype, low_memory=False)
+
+
+def infer_schema(path: str) -> tuple[dict, dict, int]:
+    """First pass: returns ({column: dtype}, {column: profile}, row count) for a CSV."""
+    profiles, rows = {}, 0
+    for chunk in _read_chunks(path):
+        rows += len(chunk)
+        for column in chunk.columns:
+            profiles.setdefault(column, _ColumnProfile()).add(column, chunk[column])
+    if not profiles:
+        raise UploadError("The CSV has no columns.")
+    return {column: profile.dtype(rows) for column, profile in profiles.items()}, profiles, rows
+
+
+def _convert_chunk(chunk: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    for column, dtype in schema.items():
+        if dtype == "datetime64[ns]":
+            chunk[column] = _parse_dates(chunk[column])
+        elif isinstance(dtype, pd.CategoricalDtype):
+            chunk[column] = chunk[column].astype(str).where(chunk[column].notna()).astype(dtype)
+        else:
+            chunk[column] = chunk[column].astype(dtype)
+    return chunk
+
+
+def write_parquet(csv_path: str, parquet_path: str, schema: dict):
+    """Second pass: converts the CSV to Parquet chunk by chunk with the inferred dtypes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    read_as = {column: str for column, dtype in schema.items() if dtype == "string" or isinstance(dtype, pd.CategoricalDtype)}
+    writer = None
+    try:
+        for chunk in _read_chunks(csv_path, dtype=read_as):
+            table = pa.Table.from_pandas(_convert_chunk(chunk, schema), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, table.schema, compression="snappy")
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# --- MMM Validation ---
+def validate_mmm(schema: dict, profiles: dict) -> list[str]:
+    """Returns the reasons a dataset can't go through the Bayesian MMM path (empty if it can)."""
+    errors = [f"Missing required column '{column}'." for column in MMM_REQUIRED_COLUMNS if column not in schema]
+    media = [column for column in schema if column.endswith("_Spend") and column != "Competitor_Spend"]
+    if not media:
+        errors.append("No media spend columns found (expected columns ending in '_Spend').")
+    if "Date" in schema and schema["Date"] != "datetime64[ns]":
+        errors.append("Column 'Date' must contain dates.")
+    elif "Date" in schema and profiles["Date"].nulls:
+        errors.append(f"Column 'Date' has {profiles['Date'].nulls} missing values.")
+    for column in ["Sales", "Competitor_Spend", "Inflation_Index"] + media:
+        profile = profiles.get(column)
+        if profile is None:
+            continue
+        if profile.kind != "numeric":
+            errors.append(f"Column '{column}' must be numeric.")
+        elif profile.nulls:
+            errors.append(f"Column '{column}' has {profile.nulls} missing values.")
+        elif column.endswith("_Spend") and profile.minimum < 0:
+            errors.append(f"Column '{column}' has negative spend.")
+    return errors
+
+
+# --- Registry ---
+def _registry_path(data_dir: str) -> str:
+    return os.path.join(data_dir, REGISTRY_FILENAME)
+
+
+def read_registry(data_dir: str) -> dict:
+    try:
+        with open(_registry_path(data_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@contextmanager
+def _registry_locked(data_dir: str):
+    """Holds the registry's read-modify-write lock, across threads and worker processes."""
+    with _registry_lock, open(os.path.join(data_dir, REGISTRY_LOCK_FILENAME), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_registry(data_dir: str, registry: dict):
+    """Writes to a unique temp file in DATA_DIR and renames it over the registry, so readers never see a partial file."""
+    fd, temp_path = tempfile.mkstemp(prefix=".datasets-", suffix=".json.tmp", dir=data_dir)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(registry, f, indent=2)
+        os.chmod(temp_path, 0o644)  # mkstemp creates owner-only files
+        os.replace(temp_path, _registry_path(data_dir))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def find_dataset(data_dir: str, filename: str) -> dict | None:
+    return next((entry for entry in read_registry(data_dir).values() if entry["filename"] == filename), None)
+
+
+def ingest_csv(upload: dict, data_dir: str) -> tuple[dict, bool]:
+    """
+    Profiles, converts and registers an uploaded CSV. Blocking; run it in a worker thread.
+    Returns (registry entry, created) where created is False for a duplicate upload.
+    """
+    sha256 = upload["sha256"]
+    existing = read_registry(data_dir).get(sha256)
+    if existing and os.path.exists(os.path.join(data_dir, existing["filename"])):
+        os.remove(upload["path"])
+        return existing, False
+
+    stem = f"{_safe_stem(upload['filename'])}_{sha256[:12]}"
+    csv_filename, parquet_filename = f"{stem}.csv", f"{stem}.parquet"
+    started = time.perf_counter()
+    # Parquet goes to a unique temp file first: a concurrent ingest of the same bytes or a
+    # parse failure halfway through must never leave a partial file under the final name.
+    fd, parquet_temp = tempfile.mkstemp(prefix=".ingest-", suffix=".parquet.tmp", dir=data_dir)
+    os.close(fd)
+    try:
+        schema, profiles, rows = infer_schema(upload["path"])
+        write_parquet(upload["path"], parquet_temp, schema)
+        os.chmod(parquet_temp, 0o644)
+        os.replace(parquet_temp, os.path.join(data_dir, parquet_filename))
+    except BaseException as e:
+        os.remove(parquet_temp)
+        os.remove(upload["path"])
+        if isinstance(e, (ValueError, pd.errors.ParserError, UnicodeDecodeError)):
+            raise UploadError(f"Could not parse the CSV: {e}")
+        raise
+    os.replace(upload["path"], os.path.join(data_dir, csv_filename))
+    os.chmod(os.path.join(data_dir, csv_filename), 0o644)  # temp files are created owner-only
+
+    mmm_errors = validate_mmm(schema, profiles)
+    entry = {
+        "id": sha256[:12],
+        "sha256": sha256,
+        "filename": csv_filename,
+        "parquet": parquet_filename,
+        "originalName": upload["filename"],
+        "bytes": upload["bytes"],
+        "rows": rows,
+        "columns": {column: str(dtype) for column, dtype in schema.items()},
+        "mmm": {"valid": not mmm_errors, "errors": mmm_errors},
+        "uploadedAt": time.time(),
+    }
+    with _registry_locked(data_dir):
+        registry = read_registry(data_dir)
+        registry[sha256] = entry
+        _write_registry(data_dir, registry)
+    print(f"Ingested {upload['filename']} ({rows} rows, {upload['bytes']} bytes) in {time.perf_counter() - started:.1f}s")
+    return entry, True
+
+
+def load_dataset(data_dir: str, filename: str) -> pd.DataFrame:
+    """Loads a dataset by filename, using the typed Parquet copy for registered uploads."""
+    entry = find_dataset(data_dir, filename)
+    if entry and os.path.exists(os.path.join(data_dir, entry["parquet"])):
+        return pd.read_parquet(os.path.join(data_dir, entry["parquet"]))
+    return pd.read_csv(os.path.join(data_dir, filename))
+
+
+# --- Paged Preview ---
+# read_preview() serves any page of a dataset without scanning from the start:
+#
+# - Registered uploads read from the Parquet copy: only the row groups that overlap the
+#   page are decoded, and only the requested columns.
+# - Plain CSVs use a sparse row-offset index: the byte offset of every INDEX_STRIDE-th row,
+#   built once per file in a single vectorized pass (quote-aware, so embedded newlines don't
+#   shift rows) and saved next to the file. Blank and whitespace-only lines aren't rows, just
+#   as read_csv skips them. A page seeks to the nearest indexed row and parses at most
+#   INDEX_STRIDE + limit rows.
+#
+# Indexes are keyed by the file's size and mtime, so a replaced file gets a fresh one.
+
+INDEX_STRIDE = 1000
+INDEX_FORMAT = 2  # bumped whenever what counts as a row changes, so saved indexes are rebuilt
+INDEX_BLOCK_BYTES = 8 * 1024 * 1024
+PREVIEW_DEFAULT_ROWS = 20
+BLANK_BYTES = np.frombuffer(b" \t\r\n", dtype=np.uint8)
+
+_row_indexes = {}  # csv path -> RowIndex
+_index_locks = {}
+_index_locks_guard = threading.Lock()
+
+
+class RowIndex:
+    """Byte offsets of every `stride`-th data row of a CSV, plus its header and row count."""
+
+    def __init__(self, header: list, offsets: np.ndarray, rows: int, stride: int, size: int, mtime_ns: int):
+        self.header = header
+        self.offsets = offsets
+        self.rows = rows
+        self.stride = stride
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return (self.size, self.mtime_ns, self.stride) == (stat.st_size, stat.st_mtime_ns, INDEX_STRIDE)
+
+
+def _index_path(csv_path: str) -> str:
+    directory, filename = os.path.split(csv_path)
+    return os.path.join(directory, f".{filename}.rowidx.npz")
+
+
+def _line_has_text(data: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    For the len(ends) + 1 line pieces of a block (split at `ends`, the last one still open),
+    whether each holds anything but whitespace. Only a piece that starts with whitespace can
+    be blank, so the byte-wise check runs only for blocks that have such pieces.
+    """
+    starts = np.concatenate(([0], ends + 1))
+    nonempty = starts < np.append(ends, len(data))
+    has_text = np.zeros(len(starts), dtype=bool)
+    has_text[nonempty] = data[starts[nonempty]] > ord(" ")
+    if (nonempty & ~has_text).any():
+        text = ~np.isin(data, BLANK_BYTES)
+        # Each non-empty piece reduces up to the next one; what lies between is newlines.
+        has_text[nonempty] = np.logical_or.reduceat(text, starts[nonempty])
+    return has_text
+
+
+def _scan_row_starts(path: str, stride: int) -> tuple[np.ndarray, int]:
+    """Returns (byte offset of every stride-th data row, number of data rows)."""
+    offsets, lines = [], 0  # lines: non-blank lines so far, the header included
+    in_quotes, position = False, 0
+    line_start, line_has_text = 0, False  # the line still open at the end of the last block
+    with open(path, "rb") as f:
+        while block := f.read(INDEX_BLOCK_BYTES):
+            data = np.frombuffer(block, dtype=np.uint8)
+            # A newline ends a row only outside a quoted field, i.e. after an even number of
+            # quote characters ("" escapes count twice, so they keep the parity).
+            # uint8 sums wrap at 256, which keeps the parity and the memory at one byte per byte.
+            parity = (np.cumsum(data == ord('"'), dtype=np.uint8) + in_quotes) & 1
+            ends = np.flatnonzero((data == ord("\n")) & (parity == 0))
+            has_text = _line_has_text(data, ends)
+            has_text[0] |= line_has_text
+            if len(ends):
+                # Blank and whitespace-only lines aren't rows.
+                starts = np.concatenate(([line_start], position + ends[:-1] + 1))
+                row_starts = starts[has_text[:-1]]
+                # Non-blank line 0 is the header, so data row r is non-blank line r + 1.
+                numbers = np.arange(lines, lines + len(row_starts))
+                offsets.append(row_starts[(numbers > 0) & ((numbers - 1) % stride == 0)])
+                lines += len(row_starts)
+                line_start = position + int(ends[-1]) + 1
+            line_has_text = bool(has_text[-1])
+            in_quotes, position = bool(parity[-1]), position + len(block)
+    if line_has_text:  # the last line has no trailing newline
+        if lines > 0 and (lines - 1) % stride == 0:
+            offsets.append(np.array([line_start]))
+        lines += 1
+    rows = max(0, lines - 1)
+    offsets = np.concatenate(offsets).astype(np.int64) if offsets else np.empty(0, dtype=np.int64)
+    return offsets, rows
+
+
+def _csv_header(path: str) -> list:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _build_row_index(path: str, stat: os.stat_result) -> RowIndex:
+    started = time.perf_counter()
+    offsets, rows = _scan_row_starts(path, INDEX_STRIDE)
+    index = RowIndex(_csv_header(path), offsets, rows, INDEX_STRIDE, stat.st_size, stat.st_mtime_ns)
+    print(f"Indexed {os.path.basename(path)} ({rows} rows) in {time.perf_counter() - started:.2f}s")
+    try:
+        with open(_index_path(path), "wb") as f:
+            np.savez(f, offsets=offsets, meta=np.array([rows, INDEX_STRIDE, stat.st_size, stat.st_mtime_ns, INDEX_FORMAT], dtype=np.int64))
+    except OSError as e:
+        print(f"Could not save the row index for {path}: {e}")
+    return index
+
+
+def _load_saved_index(path: str, stat: os.stat_result) -> RowIndex | None:
+    try:
+        with np.load(_index_path(path)) as saved:
+            rows, stride, size, mtime_ns, index_format = (int(value) for value in saved["meta"])
+            if index_format != INDEX_FORMAT:
+                return None
+            index = RowIndex(_csv_header(path), saved["offsets"], rows, stride, size, mtime_ns)
+    except (OSError, KeyError, ValueError):
+        return None
+    return index if index.matches(stat) else None
+
+
+def get_row_index(path: str) -> RowIndex:
+    """Returns the row-offset index for a CSV, loading or building it on first use. Blocking."""
+    stat = os.stat(path)
+    index = _row_indexes.get(path)
+    if index is not None and index.matches(stat):
+        return index
+    with _index_locks_guard:
+        lock = _index_locks.setdefault(path, threading.Lock())
+    with lock:  # concurrent first requests for a file build its index once
+        index = _row_indexes.get(path)
+        if index is None or not index.matches(stat):
+            index = _load_saved_index(path, stat) or _build_row_index(path, stat)
+            _row_indexes[path] = index
+    return index
+
+
+def _read_csv_page(path: str, offset: int, limit: int, columns: list | None) -> tuple[pd.DataFrame, int, list]:
+    index = get_row_index(path)
+    if offset >= index.rows:
+        return pd.DataFrame(columns=columns or index.header), index.rows, index.header
+    anchor = offset // index.stride
+    with open(path, "rb") as f:
+        f.seek(int(index.offsets[anchor]))
+        # skiprows would count blank lines too; nrows counts parsed rows, like the index.
+        skipped = offset - anchor * index.stride
+        page = pd.read_csv(f, header=None, names=index.header, usecols=columns, nrows=skipped + limit)
+    page = page.iloc[skipped:].reset_index(drop=True)
+    return page[columns or index.header], index.rows, index.header
+
+
+def _read_parquet_page(path: str, offset: int, limit: int, columns: list | None) -> tuple[pd.DataFrame, int, list]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    header = parquet.schema_arrow.names
+    # Decode only the row groups that overlap [offset, offset + limit).
+    groups, first_row, start = [], None, 0
+    for group in range(parquet.metadata.num_row_groups):
+        end = start + parquet.metadata.row_group(group).num_rows
+        if end > offset and start < offset + limit:
+            groups.append(group)
+            first_row = start if first_row is None else first_row
+        start = end
+    if not groups:
+        return pd.DataFrame(columns=columns or header), parquet.metadata.num_rows, header
+    table = parquet.read_row_groups(groups, columns=columns or header)
+    page = table.slice(offset - first_row, limit).to_pandas()
+    return page, parquet.metadata.num_rows, header
+
+
+def read_preview(data_dir: str, filename: str, offset: int = 0, limit: int = PREVIEW_DEFAULT_ROWS, columns: list | None = None) -> dict:
+    """
+    Returns one page of a dataset as {"columns", "index", "data", "offset", "limit",
+    "totalRows", "allColumns"}. `columns` selects and orders the returned columns. Blocking.
+    Raises FileNotFoundError for an unknown dataset and ValueError for an unknown column.
+    """
+    entry = find_dataset(data_dir, filename)
+    if entry and os.path.exists(os.path.join(data_dir, entry["parquet"])):
+        path, reader = os.path.join(data_dir, entry["parquet"]), _read_parquet_page
+    else:
+        path, reader = os.path.join(data_dir, filename), _read_csv_page
+    if os.path.basename(filename) != filename or not os.path.isfile(path):
+        raise FileNotFoundError(filename)
+
+    if columns:
+        header = entry["columns"].keys() if entry else _csv_header(path)
+        unknown = [column for column in columns if column not in header]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}.")
+    page, total_rows, header = reader(path, offset, limit, columns)
+    page.index = range(offset, offset + len(page))
+    for column in page.select_dtypes("float32"):
+        # Print float32 values at their own precision (341.42, not 341.4200134277).
+        page[column] = pd.to_numeric(page[column].astype(str))
+    preview = json.loads(page.to_json(orient="split", date_format="iso"))
+    preview.update(offset=offset, limit=limit, totalRows=total_rows, allColumns=list(header))
+    return preview
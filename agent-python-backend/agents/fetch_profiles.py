@@ -0,0 +1,161 @@
+from playwright.async_api import async_playwright
+from bs4 import BeautifulSoup
+import base64
+from urllib.parse import urlsplit
+from .metrics import stage
+from .singleflight import SingleFlight, normalize_url
+
+# --- Fetch Profiles ---
+# Each profile controls which resources the browser is allowed to download,
+# which load event we wait for, and whether a screenshot is captured.
+# "text-only" is the cheapest: it aborts everything that doesn't affect the DOM text.
+FETCH_PROFILES = {
+    "text-only": {
+        "blocked_resource_types": {"image", "media", "font"},
+        "block_trackers": True,
+        "wait_until": "domcontentloaded",
+        "timeout": 20000,
+        "screenshot": False,
+    },
+    "screenshot": {
+        "blocked_resource_types": {"media"},
+        "block_trackers": True,
+        "wait_until": "domcontentloaded",
+        "timeout": 20000,
+        "screenshot": True,
+    },
+    "full": {
+        "blocked_resource_types": set(),
+        "block_trackers": False,
+        "wait_until": "load",
+        "timeout": 60000,
+        "screenshot": True,
+    },
+}
+
+DEFAULT_PROFILE = "text-only"
+
+# Concurrent fetches of the same URL with the same profile share one browser session.
+_page_flights = SingleFlight("page_fetch")
+
+# Hosts of well-known analytics, ad and tag-manager services. Requests to these never
+# contribute visible text or layout, so they are aborted whenever a profile blocks trackers.
+# An entry matches its host and any subdomain of it; an entry with a path ("facebook.com/tr")
+# matches only that path on those hosts.
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "connect.facebook.net",
+    "facebook.com/tr",
+    "analytics.tiktok.com",
+    "bat.bing.com",
+    "static.hotjar.com",
+    "script.hotjar.com",
+    "cdn.segment.com",
+    "api.segment.io",
+    "js.hs-analytics.net",
+    "snap.licdn.com",
+    "static.ads-twitter.com",
+    "cdn.mxpnl.com",
+    "fullstory.com",
+    "clarity.ms",
+    "newrelic.com",
+    "nr-data.net",
+)
+
+
+def get_fetch_profile(profile: str | None) -> dict:
+    """Returns the settings for a named profile, raising on unknown names."""
+    name = profile or DEFAULT_PROFILE
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile '{name}'. Choose one of: {', '.join(FETCH_PROFILES)}")
+    return FETCH_PROFILES[name]
+
+
+def _tracker_rules() -> list:
+    rules = []
+    for entry in TRACKER_HOSTS:
+        host, slash, path = entry.partition("/")
+        rules.append((host, "/" + path if slash else None))
+    return rules
+
+
+_TRACKER_RULES = _tracker_rules()
+
+
+def _is_tracker(url: str) -> bool:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").rstrip(".")
+    for tracker_host, path in _TRACKER_RULES:
+        if host != tracker_host and not host.endswith("." + tracker_host):
+            continue
+        if path is None or parts.path == path or parts.path.startswith(path + "/"):
+            return True
+    return False
+
+
+def html_to_text(html_content: str) -> str:
+    """Strips scripts/styles from HTML and collapses it into clean lines of text."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+    raw_text = soup.get_text()
+    lines = (line.strip() for line in raw_text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+async def _install_route_blocking(page, settings: dict):
+    blocked_types = settings["blocked_resource_types"]
+    block_trackers = settings["block_trackers"]
+    if not blocked_types and not block_trackers:
+        return
+
+    async def handle_route(route):
+        request = route.request
+        if request.resource_type in blocked_types or (block_trackers and _is_tracker(request.url)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle_route)
+
+
+async def fetch_page(url: str, profile: str = DEFAULT_PROFILE) -> dict:
+    """
+    Loads a URL in headless Chromium using the given fetch profile.
+    Returns {"text": ..., "screenshot": base64 PNG or None}.
+    Identical concurrent fetches are coalesced into one browser session.
+    """
+    get_fetch_profile(profile)
+    key = (normalize_url(url), profile or DEFAULT_PROFILE)
+    return await _page_flights.do(key, lambda: _fetch_page_uncoalesced(url, profile))
+
+
+async def _fetch_page_uncoalesced(url: str, profile: str) -> dict:
+    settings = get_fetch_profile(profile)
+    async with async_playwright() as p:
+        with stage("fetch.browser_launch"):
+            browser = await p.chromium.launch()
+        try:
+            page = await browser.new_page()
+            await _install_route_blocking(page, settings)
+            with stage("fetch.page_load"):
+                await page.goto(url, timeout=settings["timeout"], wait_until=settings["wait_until"])
+
+            screenshot_b64 = None
+            if settings["screenshot"]:
+                with stage("fetch.screenshot"):
+                    screenshot_bytes = await page.screenshot(full_page=True)
+                    screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+
+            html_content = await page.content()
+        finally:
+            await browser.close()
+
+    with stage("fetch.html_to_text"):
+        text = html_to_text(html_content)
+    return {"text": text, "screenshot": screenshot_b64}
@@ -0,0 +1,102 @@
+import hashlib
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+from . import cache
+
+# --- Creative Input Images ---
+# /generate-creative takes the subject and scene images as binary multipart parts. Starlette
+# spools every part above 1 MB to a temp file, so a 12 MB phone photo never sits in memory
+# as one bytes object. Before Imagen sees an image, normalize_upload():
+#
+# 1. hashes the spooled file in UPLOAD_CHUNK_BYTES reads. The SHA-256 of the original bytes is
+#    the image's id, and a cache hit skips the decode entirely.
+# 2. decodes it with Image.draft(), which lets libjpeg decode at 1/2, 1/4 or 1/8 scale. A
+#    4000x3000 JPEG then decodes straight to about 1000x750 instead of a 36 MB RGB buffer.
+# 3. applies the EXIF orientation, downscales the long side to IMAGEN_MAX_SIDE (Imagen works
+#    at about 1024 px and resamples anything larger) and re-encodes it: JPEG at JPEG_QUALITY,
+#    or PNG when the image has transparency (cut-out product shots).
+#
+# Normalized images are kept in the shared "images" cache (byte-bounded, for CACHE_TTL) under
+# their id. The response returns the id, so the client can send `subjectImageId` instead of
+# uploading the same product shot again. An evicted id gets a 404, and the client then
+# re-uploads the file.
+
+IMAGEN_MAX_SIDE = 1024
+JPEG_QUALITY = 90
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_IMAGE_UPLOAD_BYTES = int(os.environ.get("MAX_IMAGE_UPLOAD_BYTES", 40 * 1024 ** 2))
+MAX_IMAGE_PIXELS = 100_000_000
+CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 128 * 1024 ** 2))
+CACHE_TTL = 24 * 3600
+
+
+class ImageInputError(Exception):
+    """The image was rejected; `status_code` is the HTTP status to return."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _images() -> cache.CacheBackend:
+    return cache.get_cache("images", max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL)
+
+
+def cached_image(image_id: str) -> bytes:
+    """Returns a previously normalized image by id. Raises ImageInputError (404) once it's evicted."""
+    data = _images().get(image_id)
+    if data is None:
+        raise ImageInputError(f"Image '{image_id}' is no longer cached; upload it again.", status_code=404)
+    return data
+
+
+def _hash_file(fileobj) -> str:
+    hasher = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while chunk := fileobj.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_IMAGE_UPLOAD_BYTES:
+            raise ImageInputError(f"Images are limited to {MAX_IMAGE_UPLOAD_BYTES} bytes.", status_code=413)
+        hasher.update(chunk)
+    if size == 0:
+        raise ImageInputError("The uploaded image is empty.")
+    return hasher.hexdigest()
+
+
+def _normalize(fileobj) -> bytes:
+    fileobj.seek(0)
+    try:
+        with Image.open(fileobj) as source:
+            if source.width * source.height > MAX_IMAGE_PIXELS:
+                raise ImageInputError(f"Images are limited to {MAX_IMAGE_PIXELS} pixels.", status_code=413)
+            # A square box keeps the draft large enough whichever way EXIF rotates it.
+            source.draft("RGB", (IMAGEN_MAX_SIDE, IMAGEN_MAX_SIDE))
+            image = ImageOps.exif_transpose(source)
+            image.thumbnail((IMAGEN_MAX_SIDE, IMAGEN_MAX_SIDE), Image.LANCZOS)
+    except UnidentifiedImageError:
+        raise ImageInputError("The upload is not a supported image format.")
+    except (Image.DecompressionBombError, OSError) as e:
+        raise ImageInputError(f"Could not read the image: {e}")
+
+    output = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image.convert("RGBA").save(output, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def normalize_upload(fileobj) -> tuple[str, bytes]:
+    """
+    Normalizes an uploaded image file (any seekable binary file object) for Imagen.
+    Returns (image id, normalized JPEG/PNG bytes), reusing the cached result for
+    identical uploads. Blocking.
+    """
+    image_id = _hash_file(fileobj)
+    data = _images().get(image_id)
+    if data is None:
+        data = _normalize(fileobj)
+        _images().set(image_id, data)
+    return image_id, data
@@ -0,0 +1,103 @@
+import json
+
+# --- Incremental JSON Parsing ---
+# Streams from the LLM arrive as arbitrary text fragments of one JSON object such as
+# {"approaches": [{...}, {...}, {...}]}. IncrementalArrayParser watches the fragments and
+# hands back each element of the chosen top-level array the moment its closing brace
+# arrives, so callers can forward it before the rest of the response has been generated.
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalArrayParser:
+    """Emits completed elements of `{"<array_key>": [ ... ]}` as text is fed in."""
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._stack = []             # open containers: "{" or "["
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None     # most recent complete string inside the top-level object
+        self._pending_key = None     # key whose value comes next (set on ":")
+        self._array_depth = None     # len(self._stack) while directly inside the target array
+        self._element_start = None
+
+    def feed(self, chunk: str) -> list:
+        """Adds a fragment of the response and returns any elements completed by it."""
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            if self._in_string:
+                self._consume_string_char(char, completed)
+            elif not self._stack:
+                # Skip anything before the JSON object (e.g. a ```json fence).
+                if char == "{":
+                    self._stack.append(char)
+            else:
+                self._consume_structural_char(char, completed)
+            self._pos += 1
+        return completed
+
+    def _at_array_level(self) -> bool:
+        return self._array_depth is not None and len(self._stack) == self._array_depth
+
+    def _consume_string_char(self, char: str, completed: list):
+        if self._escaped:
+            self._escaped = False
+        elif char == "\\":
+            self._escaped = True
+        elif char == '"':
+            self._in_string = False
+            if len(self._stack) == 1:
+                self._last_string = self.text[self._string_start + 1:self._pos]
+            if self._at_array_level() and self._element_start == self._string_start:
+                self._emit(self._pos + 1, completed)
+
+    def _consume_structural_char(self, char: str, completed: list):
+        if self._at_array_level() and self._element_start is None and char not in _WHITESPACE + ",]":
+            self._element_start = self._pos
+
+        if char == '"':
+            self._in_string = True
+            self._string_start = self._pos
+        elif char == ":" and len(self._stack) == 1:
+            self._pending_key = self._last_string
+        elif char in "{[":
+            if char == "[" and len(self._stack) == 1 and self._pending_key == self.array_key and self._array_depth is None:
+                self._stack.append(char)
+                self._array_depth = len(self._stack)
+                return
+            self._stack.append(char)
+        elif char in "}]":
+            if self._at_array_level():
+                if self._element_start is not None:
+                    self._emit(self._pos, completed)
+                self._array_depth = None
+                self.done = True
+            self._stack.pop()
+            if self._at_array_level() and self._element_start is not None:
+                self._emit(self._pos + 1, completed)
+        elif char == "," and self._at_array_level() and self._element_start is not None:
+            self._emit(self._pos, completed)
+        elif char == "," and len(self._stack) == 1:
+            self._pending_key = None
+
+    def _emit(self, end: int, completed: list):
+        raw = self.text[self._element_start:end].strip()
+        self._element_start = None
+        if raw:
+            completed.append(json.loads(raw))
+
+
+def extract_json_object(text: str) -> str:
+    """Returns the outermost {...} span of a response (the non-streaming fallback)."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError(f"LLM did not return valid JSON. Raw response: {text}")
+    return text[start:end + 1]
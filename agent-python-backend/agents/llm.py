@@ -0,0 +1,78 @@
+import hashlib
+import json
+from vertexai.generative_models import GenerationConfig, GenerativeModel
+from . import rate_limit
+from .metrics import stage
+from .singleflight import SingleFlight
+
+# --- Shared Gemini Calls ---
+# Runs blocking generate_content calls on the model-call threads (rate_limit.run_blocking) so they don't stall the event loop,
+# and coalesces identical concurrent prompts (same model, same contents) into one call.
+# stream_text() is the streaming counterpart for callers that forward partial output.
+# Both go through the per-model quota limiter in rate_limit.py.
+# Callers are expected to have run vertexai.init() already.
+
+_llm_flights = SingleFlight("llm")
+
+
+def _digest(contents) -> str:
+    """Stable hash of a prompt, including any multimodal Parts (images are hashed by their bytes)."""
+    hasher = hashlib.sha256()
+    for part in contents if isinstance(contents, (list, tuple)) else [contents]:
+        if isinstance(part, str):
+            hasher.update(part.encode("utf-8"))
+        elif hasattr(part, "to_dict"):
+            hasher.update(json.dumps(part.to_dict(), sort_keys=True, default=str).encode("utf-8"))
+        else:
+            hasher.update(repr(part).encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def _generate_sync(model_name: str, contents, stage_name: str) -> str:
+    model = GenerativeModel(model_name)
+    with stage(stage_name):
+        response = rate_limit.call_sync(model_name, lambda: model.generate_content(contents), rate_limit.estimate_tokens(contents))
+        return response.text
+
+
+async def generate_text(model_name: str, contents, stage_name: str = "llm.call") -> str:
+    """Returns the response text for a prompt, sharing the call with identical in-flight prompts."""
+    key = (model_name, _digest(contents))
+    return await _llm_flights.do(key, lambda: rate_limit.run_blocking(_generate_sync, model_name, contents, stage_name))
+
+
+async def stream_text(model_name: str, contents, stage_name: str = "llm.stream", response_schema: dict | None = None):
+    """
+    Yields response text fragments as Gemini generates them. Output is requested as native
+    JSON (optionally constrained by `response_schema`), so no regex clean-up is needed.
+    Streams are per-caller and are not coalesced.
+    """
+    generation_config = GenerationConfig(response_mime_type="application/json", response_schema=response_schema)
+    model = GenerativeModel(model_name, generation_config=generation_config)
+
+    async def open_stream():
+        # Quota errors surface when the first chunk is requested, so the limiter slot and its
+        # retries cover the call up to there; the rest of the stream is read outside it.
+        responses = (await model.generate_content_async(contents, stream=True)).__aiter__()
+        try:
+            return [await responses.__anext__()], responses
+        except StopAsyncIteration:
+            return [], responses
+
+    with stage(stage_name):
+        first, responses = await rate_limit.call_async(model_name, open_stream, rate_limit.estimate_tokens(contents))
+        for response in first:
+            if text := _chunk_text(response):
+                yield text
+        async for response in responses:
+            if text := _chunk_text(response):
+                yield text
+
+
+def _chunk_text(response) -> str:
+    try:
+        return response.text
+    except ValueError:
+        # Chunks that only carry a finish reason or safety ratings have no text.
+        return ""
@@ -0,0 +1,129 @@
+import bisect
+import contextvars
+import threading
+import time
+
+# --- Stage Timing & Metrics ---
+# Agents wrap each expensive step in `with stage("agent.step"):`. Every stage feeds a
+# process-wide histogram (served as Prometheus text at /metrics) and, when it runs inside
+# an HTTP request, is also recorded for that request's Server-Timing header and timing log.
+# Recording is a perf_counter pair, a lock and a bisect, so it is cheap enough for hot paths.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+_histograms = {}   # (metric name, labels tuple) -> [bucket counts..., +Inf count, sum]
+_counters = {}     # (metric name, labels tuple) -> value
+_gauges = {}       # (metric name, labels tuple) -> value
+_HELP = {
+    "braidai_stage_duration_seconds": ("histogram", "Time spent in each named agent stage."),
+    "braidai_stage_errors_total": ("counter", "Agent stages that raised an exception."),
+    "braidai_http_request_duration_seconds": ("histogram", "End-to-end HTTP request latency."),
+    "braidai_http_requests_total": ("counter", "HTTP requests served, by route and status."),
+    "braidai_rate_limit_wait_seconds": ("histogram", "Time calls spent queued for model quota."),
+    "braidai_rate_limit_retries_total": ("counter", "Model calls retried after a quota or transient error."),
+    "braidai_rate_limit_rejections_total": ("counter", "Model calls abandoned because their deadline passed."),
+    "braidai_rate_limit_concurrency": ("gauge", "Current adaptive concurrency limit per model."),
+    "braidai_standard_fast_path_total": ("counter", "Standard analyses answered from rollups (hit) or sent to the LLM (miss)."),
+    "braidai_cache_requests_total": ("counter", "Cache lookups by namespace, backend and result (hit, miss or error)."),
+}
+
+# Stages recorded for the current request: a list of (name, seconds), or None outside requests.
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def observe(metric: str, labels: tuple, seconds: float):
+    with _lock:
+        series = _histograms.get((metric, labels))
+        if series is None:
+            series = _histograms[(metric, labels)] = [0] * (len(BUCKETS) + 1) + [0.0]
+        series[bisect.bisect_left(BUCKETS, seconds)] += 1
+        series[-1] += seconds
+
+
+def increment(metric: str, labels: tuple, amount: float = 1):
+    with _lock:
+        _counters[(metric, labels)] = _counters.get((metric, labels), 0) + amount
+
+
+def set_gauge(metric: str, labels: tuple, value: float):
+    with _lock:
+        _gauges[(metric, labels)] = value
+
+
+class stage:
+    """Context manager that times a named stage: `with stage("copywriter.llm_call"): ...`"""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe("braidai_stage_duration_seconds", (("stage", self.name),), elapsed)
+        if exc_type is not None:
+            increment("braidai_stage_errors_total", (("stage", self.name),))
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((self.name, elapsed))
+        return False
+
+
+def start_request_timing() -> list:
+    """Begins collecting stages for the current request context and returns the collector."""
+    stages = []
+    _request_stages.set(stages)
+    return stages
+
+
+def server_timing_header(stages: list, total_seconds: float) -> str:
+    """Formats stages as a Server-Timing header value (durations in milliseconds)."""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, le: str | None = None) -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """Renders every histogram, counter and gauge in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    for metric, (metric_type, help_text) in _HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        if metric_type == "histogram":
+            for (name, labels), series in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, series):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(labels, str(bound))} {cumulative}")
+                cumulative += series[len(BUCKETS)]
+                lines.append(f"{metric}_bucket{_format_labels(labels, '+Inf')} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {series[-1]}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+        else:
+            values = counters if metric_type == "counter" else gauges
+            for (name, labels), value in sorted(values.items()):
+                if name == metric:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# --- MMM Specification Comparison ---
+# lightweight_mmm offers three media transforms: "carryover", "adstock" and "hill_adstock".
+# Which one fits a brand's data best changes the ROI estimates, so compare_specifications()
+# fits all of them and picks one on evidence:
+#
+# - Every specification is fitted twice, in parallel: on all weeks (for the information
+#   criteria, ROI and the dashboard) and on all but the last HOLDOUT_FRACTION of weeks (to
+#   forecast the held-out weeks and measure out-of-sample error).
+# - Each fit runs in its own spawned process (JAX is not fork-safe), pinned to its own slice
+#   of the CPUs with XLA's thread pool sized to match, so the fits share the machine evenly
+#   instead of oversubscribing it. With at least one core per fit, the comparison takes
+#   about as long as a single fit; with fewer, fits queue for a core.
+# - The winner has the lowest holdout sMAPE (symmetric MAPE: |actual - forecast| over their
+#   mean, so weeks with zero sales don't divide by zero). Candidates within SMAPE_TOLERANCE
+#   of it are treated as tied and the one with the highest ELPD-LOO (expected log predictive
+#   density, leave-one-out) wins, then the lowest holdout RMSE. Plain MAPE is reported too,
+#   over the weeks with non-zero sales.
+#
+# Fits are seeded, so the same data always produces the same comparison.
+
+MMM_SPECIFICATIONS = ("carryover", "adstock", "hill_adstock")
+NUMBER_WARMUP = 1000
+NUMBER_SAMPLES = 1000
+SEED = 42
+HOLDOUT_FRACTION = 0.1
+MIN_HOLDOUT_WEEKS = 8
+SMAPE_TOLERANCE = 0.005  # 0.5 percentage points
+
+
+def prewarm():
+    """Imports lightweight_mmm (and with it JAX and numpyro) ahead of the first Bayesian request."""
+    from lightweight_mmm import lightweight_mmm, optimize_media, plot  # noqa: F401
+
+
+def fit_mmm(model_name: str, media: np.ndarray, extra_features: np.ndarray, target: np.ndarray, seed: int = SEED):
+    """Fits one lightweight_mmm specification, using total spend per channel as the media prior."""
+    from lightweight_mmm.lightweight_mmm import LightweightMMM
+
+    mmm = LightweightMMM(model_name=model_name)
+    mmm.fit(media=media,
+            extra_features=extra_features,
+            media_prior=np.sum(media, axis=0),
+            target=target,
+            number_warmup=NUMBER_WARMUP,
+            number_samples=NUMBER_SAMPLES,
+            number_chains=1,
+            seed=seed)
+    return mmm
+
+
+def _cpu_slices(tasks: int) -> list[list[int]]:
+    """Splits the CPUs this process may use into `tasks` near-equal, disjoint slices."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if len(cpus) <= tasks:
+        return [[cpu] for cpu in cpus]
+    size, extra = divmod(len(cpus), tasks)
+    slices, start = [], 0
+    for index in range(tasks):
+        end = start + size + (index < extra)
+        slices.append(cpus[start:end])
+        start = end
+    return slices
+
+
+def _claim_cpus(free_slices, lock) -> list[int]:
+    """Takes a free CPU slice for this worker process. Must run before anything imports JAX."""
+    with lock:
+        cpus = list(free_slices.pop(0))
+    threads = str(len(cpus))
+    # XLA reads these when JAX initializes, so they size its thread pools to the slice.
+    os.environ["XLA_FLAGS"] = f"--xla_cpu_multi_thread_eigen={'true' if len(cpus) > 1 else 'false'} intra_op_parallelism_threads={threads}"
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = threads
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    return cpus
+
+
+def _information_criteria(mmm) -> dict:
+    try:
+        import arviz as az
+
+        idata = az.from_numpyro(mmm._mcmc)
+        loo, waic = az.loo(idata), az.waic(idata)
+        return {"elpdLoo": float(loo.elpd_loo), "looSe": float(loo.se), "pLoo": float(loo.p_loo), "waic": float(-2 * waic.elpd_waic)}
+    except Exception as e:  # arviz can't always compute pointwise likelihoods; compare on holdout error alone
+        print(f"Could not compute information criteria for {mmm.model_name}: {e}")
+        return {"elpdLoo": None, "looSe": None, "pLoo": None, "waic": None}
+
+
+def _holdout_errors(actual: np.ndarray, forecast: np.ndarray) -> dict:
+    errors = np.abs(actual - forecast)
+    scale = (np.abs(actual) + np.abs(forecast)) / 2
+    nonzero = actual != 0
+    return {
+        # A week where both are zero was forecast exactly.
+        "holdoutSmape": float(np.mean(np.divide(errors, scale, out=np.zeros_like(errors, dtype=float), where=scale > 0))),
+        "holdoutMape": float(np.mean(errors[nonzero] / np.abs(actual[nonzero]))) if nonzero.any() else None,
+        "holdoutRmse": float(np.sqrt(np.mean(errors ** 2))),
+    }
+
+
+def _fit_candidate(model_name: str, kind: str, media, extra_features, target, holdout_weeks: int) -> dict:
+    """Worker entry point: one full-data or holdout fit of one specification."""
+    started = time.perf_counter()
+    if kind == "holdout":
+        train = len(target) - holdout_weeks
+        mmm = fit_mmm(model_name, media[:train], extra_features[:train], target[:train])
+        # predict() prepends the training media, so lagged effects carry into the holdout weeks.
+        forecast = np.asarray(mmm.predict(media=media[train:], extra_features=extra_features[train:], seed=SEED)).mean(axis=0)
+        actual = target[train:]
+        return {
+            **_holdout_errors(actual, forecast),
+            "holdoutSeconds": time.perf_counter() - started,
+        }
+    mmm = fit_mmm(model_name, media, extra_features, target)
+    _, roi_hat = mmm.get_posterior_metrics()
+    return {
+        "model": mmm,
+        "roi": np.asarray(roi_hat).mean(axis=0).tolist(),
+        "fitSeconds": time.perf_counter() - started,
+        **_information_criteria(mmm),
+    }
+
+
+def _fit_on_cpu_slice(free_slices, lock, *args) -> dict:
+    cpus = _claim_cpus(free_slices, lock)
+    try:
+        return _fit_candidate(*args)
+    finally:
+        with lock:
+            free_slices.append(cpus)
+
+
+def _pick_winner(candidates: list) -> str:
+    best_smape = min(candidate["holdoutSmape"] for candidate in candidates)
+    tied = [candidate for candidate in candidates if candidate["holdoutSmape"] <= best_smape + SMAPE_TOLERANCE]
+    return max(tied, key=lambda candidate: (
+        candidate["elpdLoo"] if candidate["elpdLoo"] is not None else -np.inf, -candidate["holdoutRmse"],
+    ))["model"]
+
+
+def compare_specifications(media: np.ndarray, extra_features: np.ndarray, target: np.ndarray, channel_names: list,
+                           specifications=MMM_SPECIFICATIONS) -> dict:
+    """
+    Fits every specification in parallel worker processes and compares them. Returns
+    {"winner": name, "model": the winner's full-data LightweightMMM, "holdoutWeeks": n,
+    "candidates": [per-specification metrics and ROI, best first]}. Blocking.
+    """
+    holdout_weeks = max(MIN_HOLDOUT_WEEKS, int(len(target) * HOLDOUT_FRACTION))
+    if len(target) - holdout_weeks < 2 * holdout_weeks:
+        raise ValueError(f"Comparing MMM specifications needs at least {3 * holdout_weeks} weeks of data.")
+    tasks = [(model_name, kind) for model_name in specifications for kind in ("full", "holdout")]
+    cpu_slices = _cpu_slices(len(tasks))
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        free_slices, lock = manager.list(cpu_slices), manager.Lock()
+        # One fresh process per fit (max_tasks_per_child=1), since a process's JAX thread pools
+        # are fixed once JAX loads. At most one fit per slice runs at a time; when there are more
+        # fits than slices, the rest wait in the pool's queue for a slice to be handed back.
+        with ProcessPoolExecutor(max_workers=len(cpu_slices), mp_context=context, max_tasks_per_child=1) as pool:
+            futures = {
+                task: pool.submit(_fit_on_cpu_slice, free_slices, lock, task[0], task[1], media, extra_features, target, holdout_weeks)
+                for task in tasks
+            }
+            results = {task: future.result() for task, future in futures.items()}
+    candidates = []
+    for model_name in specifications:
+        full, holdout = results[(model_name, "full")], results[(model_name, "holdout")]
+        candidates.append({
+            "model": model_name,
+            **holdout,
+            **{key: value for key, value in full.items() if key not in ("model", "roi")},
+            "roi": dict(zip(channel_names, full["roi"])),
+        })
+    winner = _pick_winner(candidates)
+    candidates.sort(key=lambda candidate: (candidate["model"] != winner, candidate["holdoutSmape"]))
+    print("MMM comparison: " + ", ".join(f"{c['model']} sMAPE {c['holdoutSmape']:.3f}" for c in candidates) + f" -> {winner}")
+    return {
+        "winner": winner,
+        "model": results[(winner, "full")]["model"],
+        "holdoutWeeks": holdout_weeks,
+        "candidates": candidates,
+    }
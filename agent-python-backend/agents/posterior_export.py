@@ -0,0 +1,138 @@
+import io
+import numpy as np
+from . import cache
+
+# --- Posterior Export ---
+# The MMM dashboard is one rasterized PNG, so the frontend can't zoom, filter channels or
+# redraw response curves without another full fit. Every successful fit is summarized here
+# under its fit id (returned as "fitId" in the /analyze report), and /mmm/{fit_id}/posterior
+# serves a compact export of it:
+#
+# - posterior means and HDI_PROB highest-density bands for the in-sample fit, each channel's
+#   weekly contribution, each channel's ROI and each channel's response curve (incremental
+#   sales over a grid of CURVE_POINTS weekly spend levels, predicted the way lightweight_mmm's
+#   own response-curve plot does);
+# - mode "full" adds MAX_EXPORT_DRAWS evenly thinned ROI draws; mode "quantiles" sends
+#   QUANTILE_LEVELS of the ROI and the response curves instead of any draws.
+#
+# Arrays are float32 in a compressed .npz (np.load(..., allow_pickle=False) reads it; so does
+# any zip + .npy reader). Summaries are computed once per fit, right after it (a few predict
+# calls next to minutes of sampling), and the encoded payload of each mode goes into the shared
+# "posterior_exports" cache. The model itself can't leave the process, so computing the export
+# up front is what lets any worker or instance serve it.
+
+HDI_PROB = 0.9
+QUANTILE_LEVELS = (0.05, 0.25, 0.5, 0.75, 0.95)
+MAX_EXPORT_DRAWS = 200
+CURVE_POINTS = 50
+CURVE_HEADROOM = 0.2  # curves run to 20% past each channel's highest weekly spend
+MAX_CACHED_FITS = 8
+EXPORT_TTL = 24 * 3600
+EXPORT_MODES = ("full", "quantiles")
+SEED = 42
+
+
+def _hdi(draws: np.ndarray, prob: float = HDI_PROB) -> np.ndarray:
+    """Narrowest interval holding `prob` of the draws (axis 0), per element. Returns [low, high]."""
+    ordered = np.sort(draws, axis=0)
+    n = ordered.shape[0]
+    width = min(n, max(1, int(np.ceil(prob * n))))
+    lows, highs = ordered[:n - width + 1], ordered[width - 1:]
+    start = np.argmin(highs - lows, axis=0)[None]
+    return np.concatenate([np.take_along_axis(lows, start, axis=0), np.take_along_axis(highs, start, axis=0)])
+
+
+def _thin(draws: np.ndarray) -> np.ndarray:
+    step = max(1, len(draws) // MAX_EXPORT_DRAWS)
+    return draws[::step][:MAX_EXPORT_DRAWS]
+
+
+def _response_curve_draws(fit: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Incremental sales per draw for each channel over a spend grid, holding the other channels
+    at zero and the extra features at their mean. Returns (spend grid (P, C), draws (S, P, C)).
+    """
+    mmm, media = fit["model"], fit["media"]
+    grid = np.linspace(0, media.max(axis=0) * (1 + CURVE_HEADROOM), CURVE_POINTS)
+    extra = np.repeat(fit["extra_features"].mean(axis=0, keepdims=True), CURVE_POINTS, axis=0)
+    zeros = np.zeros_like(grid)
+    offset = np.asarray(mmm.predict(media=zeros, extra_features=extra, seed=SEED))
+    curves = []
+    for channel in range(media.shape[1]):
+        spend = zeros.copy()
+        spend[:, channel] = grid[:, channel]
+        curves.append(np.asarray(mmm.predict(media=spend, extra_features=extra, seed=SEED)) - offset)
+    return grid, np.stack(curves, axis=-1)
+
+
+def _summarize(fit: dict) -> dict:
+    mmm = fit["model"]
+    fitted = np.asarray(mmm.trace["mu"])                                            # (S, T)
+    contribution = np.asarray(mmm.trace["media_transformed"]) * np.asarray(mmm.trace["coef_media"])[:, None, :]  # (S, T, C)
+    _, roi = mmm.get_posterior_metrics()
+    roi = np.asarray(roi)                                                           # (S, C)
+    curve_spend, curves = _response_curve_draws(fit)                                # (P, C), (S, P, C)
+    levels = np.asarray(QUANTILE_LEVELS)
+
+    arrays = {
+        "actual": fit["target"],
+        "spend": fit["media"],
+        "fit_mean": fitted.mean(axis=0),
+        "fit_hdi": _hdi(fitted),
+        "baseline_mean": (fitted - contribution.sum(axis=2)).mean(axis=0),
+        "contribution_mean": contribution.mean(axis=0),
+        "contribution_hdi": _hdi(contribution),
+        "roi_mean": roi.mean(axis=0),
+        "roi_hdi": _hdi(roi),
+        "roi_draws": _thin(roi),
+        "roi_quantiles": np.quantile(roi, levels, axis=0),
+        "curve_spend": curve_spend,
+        "curve_mean": curves.mean(axis=0),
+        "curve_hdi": _hdi(curves),
+        "curve_quantiles": np.quantile(curves, levels, axis=0),
+        "hdi_prob": np.asarray(HDI_PROB),
+        "quantile_levels": levels,
+    }
+    summary = {name: np.asarray(values, dtype=np.float32) for name, values in arrays.items()}
+    summary["channels"] = np.asarray(fit["channels"], dtype=str)
+    summary["dates"] = np.asarray(fit["dates"], dtype=str)
+    summary["specification"] = np.asarray(fit["specification"], dtype=str)
+    return summary
+
+
+def _encode(summary: dict, mode: str) -> bytes:
+    skipped = ("roi_quantiles", "curve_quantiles") if mode == "full" else ("roi_draws",)
+    output = io.BytesIO()
+    np.savez_compressed(output, **{name: values for name, values in summary.items() if name not in skipped})
+    return output.getvalue()
+
+
+def _exports() -> cache.CacheBackend:
+    return cache.get_cache("posterior_exports", max_entries=MAX_CACHED_FITS * len(EXPORT_MODES), ttl=EXPORT_TTL)
+
+
+def register_fit(fit_id: str, mmm, media: np.ndarray, extra_features: np.ndarray, target: np.ndarray,
+                 channel_names: list, dates: list, specification: str) -> bool:
+    """
+    Summarizes a fitted LightweightMMM and caches its export in every mode under `fit_id`.
+    Returns False (and logs) if the posterior couldn't be summarized. Blocking.
+    """
+    fit = {
+        "model": mmm, "media": media, "extra_features": extra_features, "target": target,
+        "channels": list(channel_names), "dates": list(dates), "specification": specification,
+    }
+    try:
+        summary = _summarize(fit)
+    except Exception as e:
+        print(f"Could not summarize the posterior of fit {fit_id}: {e}")
+        return False
+    for mode in EXPORT_MODES:
+        _exports().set(f"{fit_id}:{mode}", _encode(summary, mode))
+    return True
+
+
+def export_posterior(fit_id: str, mode: str = "full") -> bytes | None:
+    """Returns the cached .npz export of a fit, or None if the fit is unknown or was evicted."""
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(EXPORT_MODES)}.")
+    return _exports().get(f"{fit_id}:{mode}")
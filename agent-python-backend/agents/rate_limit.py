@@ -0,0 +1,298 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from . import metrics
+
+# --- Quota-Aware Rate Limiting ---
+# Every Gemini, Imagen and OpenAI call goes through call_sync()/call_async() with the model
+# name as the limiter key. Each model gets a QuotaLimiter that:
+#
+# - meters calls against token buckets for requests/minute and (optionally) tokens/minute,
+#   so bursts queue briefly instead of running into the provider's quota;
+# - caps in-flight calls with an AIMD limit: +1/limit per success, halved on a 429 (at most
+#   once per DECREASE_COOLDOWN, so one burst of 429s counts as a single signal);
+# - retries 429s and transient 5xx/connection errors with full-jitter exponential backoff,
+#   waiting at least as long as any Retry-After header asks for (and pausing the model's
+#   queue for that long, not just the caller that got the 429);
+# - gives each call a deadline covering both queueing and retries. A call that can't start
+#   (or retry) in time raises RateLimitExceeded, which the API turns into a 429.
+#
+# Quotas default to DEFAULT_QUOTAS and can be overridden per model with the MODEL_QUOTAS
+# environment variable, e.g. MODEL_QUOTAS='{"gemini-2.5-pro": {"requests_per_minute": 300}}'.
+# Limits are per process; size them as (project quota / number of replicas).
+#
+# call_sync() waits for quota and backs off with time.sleep() in its own thread, so blocking
+# work that makes model calls must run via run_blocking(), on a separate pool of
+# MODEL_CALL_WORKERS threads, not via asyncio.to_thread(). Otherwise a queue of throttled calls
+# would occupy the default executor that file reads, previews and agent imports also need.
+
+DEFAULT_QUOTAS = {
+    "gemini-2.5-pro": {"requests_per_minute": 60, "tokens_per_minute": 1_000_000, "max_concurrency": 16},
+    "gemini-2.5-flash": {"requests_per_minute": 200, "tokens_per_minute": 2_000_000, "max_concurrency": 32},
+    "imagen-4.0-ultra-generate-preview-06-06": {"requests_per_minute": 20, "max_concurrency": 4},
+    "gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30_000, "max_concurrency": 16},
+}
+FALLBACK_QUOTA = {"requests_per_minute": 60, "tokens_per_minute": None, "max_concurrency": 8}
+
+DEFAULT_DEADLINE = 120.0       # seconds a call may spend queueing and retrying in total
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+DECREASE_COOLDOWN = 1.0
+POLL_INTERVAL = 0.05           # re-check interval while every concurrency slot is taken
+OUTPUT_TOKEN_ESTIMATE = 1024   # reserved per call for the response, which quotas also count
+IMAGE_TOKEN_ESTIMATE = 258     # Gemini's flat token cost for an image part
+
+MODEL_CALL_WORKERS = int(os.environ.get("MODEL_CALL_WORKERS", 32))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+TRANSIENT_ERRORS = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "APIConnectionError", "APITimeoutError"}
+
+
+class RateLimitExceeded(Exception):
+    """A model call could not be completed within its deadline because of quota limits."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` units per second, holding at most a quarter-minute burst."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 4.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Requests larger than the burst size go through once the bucket is full and run it
+        # into debt, which later calls then wait out.
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class QuotaLimiter:
+    """Admission control for one model. Safe to use from the event loop and from worker threads."""
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float | None = None,
+                 max_concurrency: int = 8, min_concurrency: int = 1):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._publish_limit()
+
+    def _publish_limit(self):
+        metrics.set_gauge("braidai_rate_limit_concurrency", (("model", self.name),), int(self.limit))
+
+    def try_acquire(self, tokens: int) -> float:
+        """Takes a slot and returns 0.0, or returns how many seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.paused_until - now,
+                POLL_INTERVAL if self.in_flight >= int(self.limit) else 0.0,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+            self.in_flight += 1
+            return 0.0
+
+    def release(self, throttled: bool = False, retry_after: float | None = None):
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= DECREASE_COOLDOWN:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._publish_limit()
+
+
+def _load_quotas() -> dict:
+    quotas = {name: dict(quota) for name, quota in DEFAULT_QUOTAS.items()}
+    overrides = os.environ.get("MODEL_QUOTAS")
+    if overrides:
+        try:
+            for name, quota in json.loads(overrides).items():
+                quotas.setdefault(name, dict(FALLBACK_QUOTA)).update(quota)
+        except (ValueError, AttributeError) as e:
+            print(f"Ignoring invalid MODEL_QUOTAS: {e}")
+    return quotas
+
+
+_quotas = _load_quotas()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> QuotaLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = QuotaLimiter(name, **_quotas.get(name, FALLBACK_QUOTA))
+        return limiter
+
+
+def estimate_tokens(contents) -> int:
+    """Rough quota cost of a prompt: ~4 characters per token, plus room for the response."""
+    total = OUTPUT_TOKEN_ESTIMATE
+    for part in contents if isinstance(contents, (list, tuple)) else [contents]:
+        total += len(part) // 4 if isinstance(part, str) else IMAGE_TOKEN_ESTIMATE
+    return total
+
+
+# --- Error Classification ---
+def _retry_after(exc: Exception) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify_error(exc: Exception) -> tuple[bool, bool, float | None]:
+    """Returns (retryable, throttled, retry_after seconds) for an exception raised by a model SDK."""
+    name = type(exc).__name__
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(exc, "code", None)  # google.api_core exceptions carry the HTTP status here
+    throttled = status == 429 or name in THROTTLE_ERRORS
+    retryable = (
+        throttled
+        or status in RETRYABLE_STATUS
+        or name in TRANSIENT_ERRORS
+        or isinstance(exc, (ConnectionError, TimeoutError))
+    )
+    return retryable, throttled, _retry_after(exc)
+
+
+def _backoff_delay(attempt: int, retry_after: float | None) -> float:
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, BACKOFF_BASE)
+    return delay
+
+
+def _reject(name: str, reason: str, retry_after: float | None = None, cause: Exception | None = None):
+    metrics.increment("braidai_rate_limit_rejections_total", (("model", name),))
+    error = RateLimitExceeded(f"{name}: {reason}", retry_after)
+    if cause is not None:
+        raise error from cause
+    raise error
+
+
+def _after_failure(limiter: QuotaLimiter, exc: Exception, attempt: int, deadline_at: float) -> float:
+    """Releases the slot for a failed attempt and returns the backoff delay, or raises if done."""
+    retryable, throttled, retry_after = classify_error(exc)
+    limiter.release(throttled=throttled, retry_after=retry_after)
+    if not retryable:
+        raise exc
+    delay = _backoff_delay(attempt, retry_after)
+    if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay > deadline_at:
+        if throttled:
+            _reject(limiter.name, "quota still exhausted after retrying", retry_after, exc)
+        raise exc
+    metrics.increment("braidai_rate_limit_retries_total", (("model", limiter.name),))
+    print(f"Rate limit: {limiter.name} call failed ({type(exc).__name__}), retrying in {delay:.1f}s")
+    return delay
+
+
+# --- Entry Points ---
+_model_executor = ThreadPoolExecutor(max_workers=MODEL_CALL_WORKERS, thread_name_prefix="model-call")
+
+
+async def run_blocking(fn, /, *args, **kwargs):
+    """
+    asyncio.to_thread() for blocking work that makes rate-limited model calls: runs it on the
+    bounded model-call pool (with the caller's context, so metrics stages still apply).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_model_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+def call_sync(name: str, fn, tokens: int = 1, timeout: float = DEFAULT_DEADLINE):
+    """Runs the blocking `fn()` under the limiter for `name`, with retries. For run_blocking() threads."""
+    limiter = get_limiter(name)
+    deadline_at = time.monotonic() + timeout
+    for attempt in range(MAX_ATTEMPTS):
+        queued_at = time.monotonic()
+        while (wait := limiter.try_acquire(tokens)) > 0:
+            if time.monotonic() + wait > deadline_at:
+                _reject(name, "deadline passed while queued for quota", wait)
+            time.sleep(wait)
+        metrics.observe("braidai_rate_limit_wait_seconds", (("model", name),), time.monotonic() - queued_at)
+        try:
+            result = fn()
+        except Exception as e:
+            time.sleep(_after_failure(limiter, e, attempt, deadline_at))
+            continue
+        limiter.release()
+        return result
+
+
+async def call_async(name: str, fn, tokens: int = 1, timeout: float = DEFAULT_DEADLINE):
+    """Awaits `fn()` under the limiter for `name`, with retries. `fn` must return a new awaitable each call."""
+    limiter = get_limiter(name)
+    deadline_at = time.monotonic() + timeout
+    for attempt in range(MAX_ATTEMPTS):
+        queued_at = time.monotonic()
+        while (wait := limiter.try_acquire(tokens)) > 0:
+            if time.monotonic() + wait > deadline_at:
+                _reject(name, "deadline passed while queued for quota", wait)
+            await asyncio.sleep(wait)
+        metrics.observe("braidai_rate_limit_wait_seconds", (("model", name),), time.monotonic() - queued_at)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            limiter.release()
+            raise
+        except Exception as e:
+            await asyncio.sleep(_after_failure(limiter, e, attempt, deadline_at))
+            continue
+        limiter.release()
+        return result
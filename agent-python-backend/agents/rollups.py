@@ -0,0 +1,372 @@
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+from . import cache
+
+# --- Rollup Cube ---
+# Many analysis questions are plain aggregates ("spend and conversions by CampaignID",
+# "profit by Category", "churn rate by tenure bucket"). When a dataset is first analyzed,
+# RollupCube precomputes vectorized group-by aggregates (row count, and sum/count/min/max of
+# every measure) over its key dimensions:
+#
+# - Dimensions are text and ID columns with at most MAX_GROUPS values, low-cardinality
+#   integer columns, numeric columns cut into ~BUCKET_TARGET equal-width buckets, and the
+#   month and year of date columns.
+# - The low-cardinality dimensions are grouped together into one base cube of at most
+#   MAX_CUBE_CELLS cells; any one of them, or any combination, is answered by re-aggregating
+#   that small cube. The remaining dimensions each get their own one-dimensional rollup.
+#
+# parse_question() recognizes questions that only name measures, aggregations and
+# dimensions, and RollupCube.query() answers them without touching the raw rows. Anything
+# else (filters, correlations, derived metrics, predictions) returns None and goes to the LLM.
+# Cubes are cached per dataset version in the shared "rollups" cache, so the group-bys run once
+# per file (once per host or deployment with a shared CACHE_BACKEND).
+
+MAX_GROUPS = 1000
+LOW_CARDINALITY = 50
+MAX_CUBE_CELLS = 100_000
+BUCKET_TARGET = 8
+MAX_CACHED_CUBES = 16
+CUBE_TTL = 6 * 3600  # a file version's cube (and its answers) on the shared cache backends
+
+STATS = ("sum", "count", "min", "max")
+MISSING_LABEL = "(missing)"
+
+_cube_locks = {}  # dataset key -> lock held while its cube is being built
+_cube_locks_guard = threading.Lock()
+
+
+def _nice_width(span: float, target: int) -> float:
+    raw = span / target
+    magnitude = 10 ** np.floor(np.log10(raw))
+    return next(step * magnitude for step in (1, 2, 2.5, 5, 10) if step * magnitude >= raw)
+
+
+def _bucket_labels(values: pd.Series) -> pd.Series:
+    """Cuts a numeric column into ~BUCKET_TARGET equal-width buckets labelled "lo-hi"."""
+    low, high = values.min(), values.max()
+    width = _nice_width(high - low, BUCKET_TARGET)
+    start = np.floor(low / width) * width
+    edges = start + width * np.arange(int(np.ceil((high - start) / width)) + 2)
+    as_text = (lambda x: f"{x:g}")
+    labels = [f"{as_text(lo)}-{as_text(hi)}" for lo, hi in zip(edges[:-1], edges[1:])]
+    return pd.cut(values, edges, right=False, labels=labels)
+
+
+def _as_dates(column: pd.Series) -> pd.Series | None:
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if column.dtype == object and "date" in str(column.name).lower():
+        for date_format in ("ISO8601", "mixed"):
+            parsed = pd.to_datetime(column, errors="coerce", format=date_format)
+            if parsed.notna().mean() >= 0.95:
+                return parsed
+    return None
+
+
+def _with_missing(values: pd.Series) -> pd.Series:
+    """
+    Labels missing values "(missing)" so they form a group instead of being dropped. Non-text
+    categories (periods, years, numbers) are relabelled as text first, in their original order.
+    """
+    if not values.hasnans:
+        return values
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    if not pd.api.types.is_object_dtype(values.cat.categories.dtype):
+        values = values.cat.rename_categories([str(category) for category in values.cat.categories])
+    return values.cat.add_categories(MISSING_LABEL).fillna(MISSING_LABEL)
+
+
+def _is_binary(values: pd.Series) -> bool:
+    if not (values.min() == 0 and values.max() == 1):  # cheap reductions rule most columns out
+        return False
+    return bool(((values == 0) | (values == 1) | values.isna()).all())
+
+
+def _cardinality(values: pd.Series) -> int:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=1)))
+    return values.nunique()
+
+
+def _is_id(name: str) -> bool:
+    return bool(re.search(r"(ID|Id|_id)$", name))
+
+
+class RollupCube:
+    """Precomputed group-by aggregates of one DataFrame. Built once, then read-only."""
+
+    def __init__(self, dataframe: pd.DataFrame):
+        started = time.perf_counter()
+        self.key = None  # the dataset version it was cached under, set by get_cube()
+        self.rows = len(dataframe)
+        self.measures = [
+            column for column in dataframe.columns
+            if pd.api.types.is_numeric_dtype(dataframe[column]) and not pd.api.types.is_bool_dtype(dataframe[column])
+            and not _is_id(str(column))
+        ]
+        self.binary = {column for column in self.measures if _is_binary(dataframe[column])}
+
+        # dimension name -> (source column, label Series)
+        dimensions, self.cardinality, self.buckets, self.date_parts, self.id_columns = {}, {}, {}, {}, []
+        for column in dataframe.columns:
+            values = dataframe[column]
+            dates = _as_dates(values)
+            if dates is not None:
+                for part, labels in (("month", dates.dt.to_period("M")), ("year", dates.dt.year.astype("Int64"))):
+                    labels = _with_missing(labels.astype("category"))  # NaT dates become "(missing)"
+                    dimensions[f"{column} {part}"] = (column, labels)
+                    self.cardinality[f"{column} {part}"] = _cardinality(labels)
+                    self.date_parts.setdefault(part, f"{column} {part}")
+                continue
+            if column not in self.measures:
+                # Factorize text once; every later nunique and group-by then works on the codes.
+                values = _with_missing(values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category"))
+            unique = _cardinality(values)
+            if unique < 2:
+                continue
+            if column in self.measures and unique > LOW_CARDINALITY:
+                labels = _with_missing(_bucket_labels(values))
+                dimensions[f"{column} bucket"] = (column, labels)
+                self.cardinality[f"{column} bucket"] = _cardinality(labels)
+                self.buckets[column] = f"{column} bucket"
+            elif unique <= MAX_GROUPS and unique < self.rows:
+                dimensions[column] = (column, _with_missing(values))
+                self.cardinality[column] = unique
+            elif _is_id(str(column)):
+                self.id_columns.append(column)  # one row per ID: "number of customers" counts rows
+
+        # Low-cardinality dimensions share one base cube; the rest get their own rollup.
+        self.cube_dimensions, cells = [], 1
+        for name in sorted(dimensions, key=self.cardinality.get):
+            if self.cardinality[name] <= LOW_CARDINALITY and cells * self.cardinality[name] <= MAX_CUBE_CELLS:
+                self.cube_dimensions.append(name)
+                cells *= self.cardinality[name]
+        self.dimensions = {name: source for name, (source, _) in dimensions.items()}
+        self.phrases = _column_phrases(list(dict.fromkeys([*self.dimensions.values(), *self.measures, *self.id_columns])))
+
+        measures = dataframe[self.measures]
+        self.total = self._aggregate(measures, None)
+        self.cube = self._aggregate(measures, [dimensions[name][1].rename(name) for name in self.cube_dimensions])
+        self.tables = {
+            name: self._aggregate(measures, [labels.rename(name)])
+            for name, (_, labels) in dimensions.items() if name not in self.cube_dimensions
+        }
+        for name in self.cube_dimensions:  # single-dimension answers then need no re-aggregation
+            self.tables[name] = self._reaggregate([name])
+        # Every row must land in exactly one group, or answers rolled up from a table are short.
+        for name, table in [("the base cube", self.cube), *self.tables.items()]:
+            if int(table["rows"].to_numpy().sum()) != self.rows:
+                raise ValueError(f"Rollup {name} covers {int(table['rows'].to_numpy().sum())} of {self.rows} rows.")
+        self.build_seconds = time.perf_counter() - started
+        print(f"Built rollup cube: {len(self.cube)} cells over {self.cube_dimensions}, "
+              f"{len(self.tables)} more rollups, in {self.build_seconds:.2f}s")
+
+    @staticmethod
+    def _aggregate(measures: pd.DataFrame, keys: list | None) -> pd.DataFrame:
+        if keys is None:
+            table = measures.agg(list(STATS)).unstack().to_frame().T
+            table["rows"] = len(measures)
+            return table
+        grouped = measures.groupby(keys, observed=True, sort=True, dropna=False)
+        table = grouped.agg(list(STATS))
+        table["rows"] = grouped.size()
+        return table
+
+    def _reaggregate(self, dimensions: list) -> pd.DataFrame:
+        """Rolls the base cube up to `dimensions`: sums and counts add up, mins and maxes nest."""
+        how = {column: column[1] if column[1] in ("min", "max") else "sum" for column in self.cube.columns}
+        return self.cube.groupby(level=dimensions, observed=True, sort=True, dropna=False).agg(how)
+
+    def supports(self, dimensions: list) -> bool:
+        return set(dimensions) <= set(self.cube_dimensions) or (len(dimensions) == 1 and dimensions[0] in self.tables)
+
+    def query(self, dimensions: list, measures: list, aggregation: str) -> pd.DataFrame:
+        """
+        Returns one row per group of `dimensions` with one column per measure, aggregated with
+        "sum", "mean", "min", "max", "count" or "rate" (the share of rows where a 0/1 measure is 1).
+        With no measures, returns the row count per group.
+        """
+        if not dimensions:
+            table = self.total
+        elif len(dimensions) == 1:
+            table = self.tables[dimensions[0]]
+        else:
+            table = self._reaggregate(dimensions)
+
+        if not measures:
+            return table[["rows"]].droplevel(1, axis=1).rename(columns={"rows": "Rows"})
+        result = {}
+        for measure in measures:
+            if aggregation in ("sum", "min", "max", "count"):
+                result[measure] = table[(measure, aggregation)]
+            else:  # mean, and rate for 0/1 measures, are sum / non-null count
+                result[measure] = table[(measure, "sum")] / table[(measure, "count")].replace(0, np.nan)
+        return pd.DataFrame(result)
+
+    def describe(self, max_groups: int = 12, max_chars: int = 6000) -> str:
+        """The small one-dimensional rollups as text, to ground an LLM's narration in exact numbers."""
+        parts, used = [], 0
+        for name in self.cube_dimensions:
+            if self.cardinality[name] > max_groups:
+                continue
+            table = self.query([name], self.measures, "mean").round(3)
+            table.insert(0, "Rows", self.query([name], [], "count")["Rows"])
+            text = f"Mean of each measure by {name}:\n{table.to_string()}"
+            if used + len(text) > max_chars:
+                break
+            parts.append(text)
+            used += len(text)
+        return "\n\n".join(parts)
+
+
+# --- Question Parsing ---
+AGGREGATION_WORDS = {
+    "total": "sum", "sum": "sum", "overall": "sum",
+    "average": "mean", "avg": "mean", "mean": "mean", "typical": "mean",
+    "count": "count", "number": "count", "many": "count",
+    "maximum": "max", "max": "max",
+    "minimum": "min", "min": "min",
+    "rate": "rate", "share": "rate", "percentage": "rate", "percent": "rate", "proportion": "rate",
+}
+RANKING_WORDS = {
+    "highest": False, "top": False, "most": False, "best": False, "largest": False, "biggest": False,
+    "lowest": True, "least": True, "worst": True, "smallest": True, "bottom": True,
+}
+DIMENSION_MARKERS = {"by", "per", "each", "every", "across", "which", "between"}
+BUCKET_WORDS = {"bucket", "band", "range", "group", "bin", "tier", "bracket"}
+FILLER_WORDS = {
+    "what", "whats", "is", "are", "was", "were", "the", "a", "an", "of", "for", "in", "and", "or",
+    "show", "me", "give", "list", "get", "tell", "how", "do", "does", "compare", "comparison",
+    "breakdown", "broken", "down", "grouped", "split", "has", "have", "had", "with", "our", "my",
+    "all", "value", "values", "it", "to", "please", "table", "chart", "plot", "bar", "s", "there",
+    "calculate", "compute", "summarize", "summary", "summarise", "aggregate", "aggregated",
+    "row", "record", "entry",
+}
+
+
+def _tokens(text: str) -> list:
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    text = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1 \2", text)
+    return [_singular(token) for token in re.findall(r"[a-z0-9]+", text.lower())]
+
+
+def _singular(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def _column_phrases(columns: list) -> dict:
+    """Maps token tuples to column names: the full name, and its first word when that's unambiguous."""
+    phrases = {tuple(_tokens(str(column))): column for column in columns}
+    first_words = {}
+    for column in columns:
+        tokens = _tokens(str(column))
+        if len(tokens) > 1 and len(tokens[0]) >= 4:
+            first_words.setdefault(tokens[0], []).append(column)
+    for word, matches in first_words.items():
+        if len(matches) == 1 and (word,) not in phrases:
+            phrases[(word,)] = matches[0]
+    return phrases
+
+
+def parse_question(cube: RollupCube, question: str) -> dict | None:
+    """
+    Reads a plain aggregate question into {"dimensions", "measures", "aggregation",
+    "ascending", "limit"} (ascending is None unless the question ranks, as in "top 5"), or
+    returns None when any part of it isn't a known measure, dimension, aggregation or filler word.
+    """
+    phrases = cube.phrases
+    date_parts = {(part,): name for part, name in cube.date_parts.items()}
+    tokens = _tokens(question)
+    longest = max((len(phrase) for phrase in phrases), default=1)
+
+    dimensions, measures, aggregation, ascending, limit = [], [], None, None, None
+    mode, count_rows, position = "measure", False, 0
+    while position < len(tokens):
+        token = tokens[position]
+        column = None
+        for size in range(min(longest, len(tokens) - position), 0, -1):
+            column = phrases.get(tuple(tokens[position:position + size]))
+            if column is not None:
+                position += size
+                break
+        if column is None and (token,) in date_parts:
+            dimensions.append(date_parts[(token,)])
+            position += 1
+            continue
+        if column is not None:
+            bucketed = position < len(tokens) and tokens[position] in BUCKET_WORDS
+            position += bucketed
+            if mode == "dimension" and ascending is not None and dimensions and not measures and column in cube.measures and not bucketed:
+                measures.append(column)  # "top 5 campaigns by conversions" ranks by a measure
+            elif mode == "dimension" or bucketed:
+                name = cube.buckets.get(column) if column in cube.buckets else column
+                if name not in cube.dimensions:
+                    # A date column named as a dimension means its month.
+                    name = next((dim for dim, source in cube.dimensions.items() if source == column and dim.endswith(" month")), None)
+                if name is None:
+                    return None
+                dimensions.append(name)
+            elif column in cube.measures:
+                measures.append(column)
+            elif column in cube.id_columns or aggregation == "count":
+                count_rows = True  # "number of sessions" counts rows
+            elif column in cube.dimensions.values():
+                dimensions.append(column)  # "which campaign has the highest spend"
+            else:
+                return None
+            continue
+        position += 1
+        if token in DIMENSION_MARKERS:
+            mode = "dimension"
+        elif token in RANKING_WORDS:
+            ascending, mode = RANKING_WORDS[token], "measure"
+            if position < len(tokens) and tokens[position].isdigit():
+                limit, position = int(tokens[position]), position + 1
+        elif token in AGGREGATION_WORDS and mode == "measure":
+            aggregation = AGGREGATION_WORDS[token]
+        elif token not in FILLER_WORDS and token not in BUCKET_WORDS:
+            return None
+
+    if not dimensions and not (measures and aggregation):
+        return None
+    if len(set(dimensions)) != len(dimensions) or not cube.supports(dimensions):
+        return None
+    if aggregation == "count" or (count_rows and not measures):
+        return {"dimensions": dimensions, "measures": [], "aggregation": "count", "ascending": ascending, "limit": limit}
+    if not measures:
+        return None
+    if aggregation == "rate" and not all(measure in cube.binary for measure in measures):
+        return None  # "conversion rate" of a count column is a derived metric; leave it to the LLM
+    if aggregation is None:
+        aggregation = "rate" if all(measure in cube.binary for measure in measures) else "sum"
+    return {"dimensions": dimensions, "measures": measures, "aggregation": aggregation, "ascending": ascending, "limit": limit}
+
+
+# --- Cache ---
+def cached_cube(key) -> RollupCube | None:
+    """Returns the cube for a dataset version if one was already built, without loading the dataset. Blocking."""
+    return cache.get_cache("rollups", max_entries=MAX_CACHED_CUBES, ttl=CUBE_TTL).get(key)
+
+
+def get_cube(key, dataframe: pd.DataFrame) -> RollupCube:
+    """Returns the cube for a dataset version (e.g. path, mtime, size), building it on first use. Blocking."""
+    cube = cached_cube(key)
+    if cube is not None:
+        return cube
+    cubes = cache.get_cache("rollups", max_entries=MAX_CACHED_CUBES, ttl=CUBE_TTL)
+    with _cube_locks_guard:
+        lock = _cube_locks.setdefault(key, threading.Lock())
+    with lock:  # concurrent first requests in this process build a dataset's cube once
+        cube = cubes.get(key)
+        if cube is None:
+            cube = RollupCube(dataframe)
+            cube.key = key
+            cubes.set(key, cube)
+    with _cube_locks_guard:
+        _cube_locks.pop(key, None)
+    return cube
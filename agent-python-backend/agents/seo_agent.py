@@ -1,20 +1,36 @@
 import asyncio
+import gzip
 import json
+import os
 import re
+from collections import Counter
 from urllib.parse import urljoin
 import httpx
 import vertexai
 from bs4 import BeautifulSoup
-from google.cloud import secretmanager
-from openai import AsyncOpenAI
+from lxml import etree, html as lxml_html
 from vertexai.generative_models import GenerativeModel
-from playwright.async_api import async_playwright
+from .metrics import stage
+from . import rate_limit
+from .singleflight import SingleFlight
 
 print("--- Loading SEO Agent (Playwright Version) ---")
 
 # --- Configuration ---
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'}
-SCHEMA_SCRAPE_LIMIT = 5
+# Pages sampled per audit by default, and the most a client may ask for with "schemaPageLimit".
+SCHEMA_SCRAPE_LIMIT = int(os.environ.get("SCHEMA_SCRAPE_LIMIT", 200))
+SCHEMA_SCRAPE_MAX = int(os.environ.get("SCHEMA_SCRAPE_MAX", 5000))
+SCHEMA_FETCH_CONCURRENCY = 32
+SITEMAP_MAX_CHILDREN = 50
+OPENAI_SECRET_ID = "openai-api-key"
+OPENAI_MODEL = "gpt-4o"
+GEMINI_CONCURRENCY = 8
+OPENAI_CONCURRENCY = 8
+AUTHORITY_QUERY_CATEGORIES = ("base_queries", "comparison_queries", "expertise_queries")
+
+# Concurrent analyses asking a provider the exact same query share one call.
+_authority_flights = SingleFlight("authority_query")
 
 # --- Helper Functions ---
 def _remove_trailing_commas(json_string: str) -> str:
@@ -23,6 +39,7 @@ def _remove_trailing_commas(json_string: str) -> str:
 
 def get_openai_api_key(project_id: str, secret_id: str, version_id: str = "latest") -> str:
     try:
+        from google.cloud import secretmanager  # deferred: only needed when OpenAI is used
         client = secretmanager.SecretManagerServiceClient()
         name = f"projects/{project_id}/secrets/{secret_id}/versions/{version_id}"
         response = client.access_secret_version(request={"name": name})
@@ -58,7 +75,7 @@ def generate_prompts_for_url(url: str, competitors_str: str, project_id: str, lo
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        with httpx.Client(headers=HEADERS, timeout=15, follow_redirects=True) as client:
+        with stage("seo.page_fetch"), httpx.Client(headers=HEADERS, timeout=15, follow_redirects=True) as client:
             response = client.get(url)
             response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -84,44 +101,513 @@ def generate_prompts_for_url(url: str, competitors_str: str, project_id: str, lo
         The entire output must be ONLY the valid JSON object.
         """
         
-        response = model.generate_content(prompt)
-        
-        raw_text = response.text
-        json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        if not json_match:
-            raise ValueError("The model did not return a valid JSON object.")
+        with stage("seo.llm_call"):
+            response = rate_limit.call_sync("gemini-2.5-flash", lambda: model.generate_content(prompt), rate_limit.estimate_tokens(prompt))
+            raw_text = response.text
         
-        cleaned_json_str = _remove_trailing_commas(json_match.group(0))
-        return json.loads(cleaned_json_str)
+        with stage("seo.json_parse"):
+            json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+            if not json_match:
+                raise ValueError("The model did not return a valid JSON object.")
+            
+            cleaned_json_str = _remove_trailing_commas(json_match.group(0))
+            return json.loads(cleaned_json_str)
 
+    except rate_limit.RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"Error in generate_prompts_for_url: {e}")
         return {"error": str(e)}
 
-async def run_full_seo_analysis(websocket, project_id: str, location: str, your_site: dict, competitors: list[dict], prompts: dict) -> dict:
+# --- Schema Audit ---
+def _parse_sitemap(content: bytes) -> tuple[bool, list[str]]:
+    """Returns (is_sitemap_index, locations) for a sitemap or sitemap index document."""
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    root = etree.fromstring(content, parser=etree.XMLParser(recover=True, resolve_entities=False))
+    if root is None:
+        return False, []
+    is_index = etree.QName(root).localname == "sitemapindex"
+    locations = [loc.text.strip() for loc in root.iter("{*}loc") if loc.text]
+    return is_index, locations
+
+
+async def fetch_sitemap_urls(sitemap_url: str, client: httpx.AsyncClient) -> list[str]:
+    """Reads page URLs from a sitemap, following one level of sitemap index concurrently."""
+    res = await client.get(sitemap_url, headers=HEADERS, timeout=15)
+    res.raise_for_status()
+    is_index, locations = _parse_sitemap(res.content)
+    if not is_index:
+        return locations
+
+    async def fetch_child(child_url: str) -> list[str]:
+        try:
+            child_res = await client.get(child_url, headers=HEADERS, timeout=15)
+            child_res.raise_for_status()
+            return _parse_sitemap(child_res.content)[1]
+        except Exception as e:
+            print(f"Failed to read child sitemap {child_url}: {e}")
+            return []
+
+    children = await asyncio.gather(*(fetch_child(url) for url in locations[:SITEMAP_MAX_CHILDREN]))
+    return [url for child_urls in children for url in child_urls]
+
+
+def sample_pages(urls: list[str], limit: int) -> list[str]:
+    """Evenly spaced sample so every section of the sitemap is represented."""
+    urls = list(dict.fromkeys(urls))
+    if len(urls) <= limit:
+        return urls
+    step = len(urls) / limit
+    return [urls[int(i * step)] for i in range(limit)]
+
+
+def _flatten_jsonld_types(node, types: list[str]):
+    if isinstance(node, list):
+        for item in node:
+            _flatten_jsonld_types(item, types)
+    elif isinstance(node, dict):
+        node_type = node.get("@type")
+        if isinstance(node_type, list):
+            types.extend(str(t) for t in node_type)
+        elif node_type:
+            types.append(str(node_type))
+        for key in ("@graph", "mainEntity", "itemListElement"):
+            if key in node:
+                _flatten_jsonld_types(node[key], types)
+
+
+def _short_type(type_value: str) -> str:
+    return type_value.rstrip("/").rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+
+
+def extract_structured_data(html_bytes: bytes) -> dict:
+    """Extracts JSON-LD, microdata and RDFa types from a page using lxml."""
+    findings = {"jsonld": [], "microdata": [], "rdfa": [], "errors": []}
+    if not html_bytes:
+        return findings
+    doc = lxml_html.fromstring(html_bytes)
+
+    for script in doc.xpath('//script[@type="application/ld+json"]'):
+        raw = (script.text or "").strip()
+        if not raw:
+            continue
+        try:
+            _flatten_jsonld_types(json.loads(raw), findings["jsonld"])
+        except json.JSONDecodeError as e:
+            try:
+                _flatten_jsonld_types(json.loads(_remove_trailing_commas(raw)), findings["jsonld"])
+                findings["errors"].append(f"JSON-LD has trailing commas: {e.msg}")
+            except json.JSONDecodeError:
+                findings["errors"].append(f"Invalid JSON-LD: {e.msg}")
+
+    for element in doc.xpath("//*[@itemscope]"):
+        item_type = element.get("itemtype")
+        if item_type:
+            findings["microdata"].extend(_short_type(t) for t in item_type.split())
+        else:
+            findings["errors"].append("Microdata itemscope without itemtype")
+
+    for element in doc.xpath("//*[@typeof]"):
+        findings["rdfa"].extend(_short_type(t) for t in element.get("typeof").split())
+
+    findings["jsonld"] = [_short_type(t) for t in findings["jsonld"]]
+    return findings
+
+
+class SchemaAuditAggregate:
+    """Accumulates per-page findings into type coverage and error counts."""
+
+    def __init__(self):
+        self.pages = 0
+        self.pages_with_schema = 0
+        self.fetch_errors = 0
+        self.type_pages = Counter()
+        self.format_pages = Counter()
+        self.errors = Counter()
+
+    def add(self, page: dict):
+        self.pages += 1
+        if page.get("fetchError"):
+            self.fetch_errors += 1
+            return
+        page_types = set()
+        for fmt in ("jsonld", "microdata", "rdfa"):
+            if page[fmt]:
+                self.format_pages[fmt] += 1
+                page_types.update(page[fmt])
+        if page_types:
+            self.pages_with_schema += 1
+        self.type_pages.update(page_types)
+        self.errors.update(page["errors"])
+
+    def summary(self) -> dict:
+        fetched = self.pages - self.fetch_errors
+        coverage = self.pages_with_schema / fetched if fetched else 0.0
+        top_types = ", ".join(f"{t} ({n})" for t, n in self.type_pages.most_common(5)) or "none"
+        return {
+            "score": round(coverage * 10),
+            "summary": (
+                f"Audited {fetched} of {self.pages} sampled pages; {round(coverage * 100)}% carry structured data. "
+                f"Most common types: {top_types}."
+            ),
+            "pagesAudited": fetched,
+            "pagesWithSchema": self.pages_with_schema,
+            "fetchErrors": self.fetch_errors,
+            "typeCoverage": dict(self.type_pages.most_common()),
+            "formatCoverage": dict(self.format_pages),
+            "errors": dict(self.errors.most_common(20)),
+        }
+
+
+def schema_page_limit(requested=None) -> int:
+    """The number of sitemap pages to audit: the client's request, capped at SCHEMA_SCRAPE_MAX."""
+    if requested is None:
+        return min(SCHEMA_SCRAPE_LIMIT, SCHEMA_SCRAPE_MAX)
+    if isinstance(requested, bool) or not isinstance(requested, int) or requested < 1:
+        raise ValueError("schemaPageLimit must be a positive integer.")
+    return min(requested, SCHEMA_SCRAPE_MAX)
+
+
+async def run_schema_audit(site_url: str, sitemap_url: str | None, on_page=None, limit: int = SCHEMA_SCRAPE_LIMIT) -> dict:
+    """
+    Samples up to `limit` pages from the site's sitemap and audits their structured data.
+    Pages are fetched concurrently through one pooled client; parsing runs off the event
+    loop. on_page is awaited with each page's findings as soon as it is parsed.
+    """
+    if not site_url.startswith(('http://', 'https://')):
+        site_url = 'https://' + site_url
+    limits = httpx.Limits(max_connections=SCHEMA_FETCH_CONCURRENCY, max_keepalive_connections=SCHEMA_FETCH_CONCURRENCY)
+    aggregate = SchemaAuditAggregate()
+    semaphore = asyncio.Semaphore(SCHEMA_FETCH_CONCURRENCY)
+
+    async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True, limits=limits, timeout=15) as client:
+        sitemap_url = sitemap_url or await find_sitemap(site_url, client)
+        page_urls = []
+        if sitemap_url:
+            try:
+                with stage("seo.sitemap_fetch"):
+                    page_urls = await fetch_sitemap_urls(sitemap_url, client)
+            except Exception as e:
+                print(f"Failed to read sitemap {sitemap_url}: {e}")
+        page_urls = sample_pages(page_urls, limit) or [site_url]
+
+        async def audit_page(page_url: str) -> dict:
+            async with semaphore:
+                try:
+                    with stage("seo.schema_page_fetch"):
+                        res = await client.get(page_url)
+                        res.raise_for_status()
+                except Exception as e:
+                    return {"url": page_url, "fetchError": str(e)}
+            try:
+                with stage("seo.schema_extract"):
+                    findings = await asyncio.to_thread(extract_structured_data, res.content)
+            except Exception as e:
+                findings = {"jsonld": [], "microdata": [], "rdfa": [], "errors": [f"Unparseable HTML: {e}"]}
+            return {"url": page_url, **findings}
+
+        pending = [asyncio.create_task(audit_page(url)) for url in page_urls]
+        try:
+            for next_page in asyncio.as_completed(pending):
+                page = await next_page
+                aggregate.add(page)
+                if on_page:
+                    await on_page(page, aggregate.pages, len(page_urls))
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return aggregate.summary()
+
+
+# --- Authority Engine ---
+class AnalysisCancelled(Exception):
+    """Raised when the websocket client goes away while the analysis is still running."""
+
+
+class GeminiProvider:
+    """Answers authority queries with Gemini. Expects vertexai.init() to have been called."""
+    name = "gemini"
+
+    def __init__(self, model_name: str = "gemini-2.5-pro", max_concurrency: int = GEMINI_CONCURRENCY):
+        self.model = GenerativeModel(model_name)
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+
+    async def ask(self, query: str) -> str:
+        response = await rate_limit.call_async(
+            self.model_name, lambda: self.model.generate_content_async(query), rate_limit.estimate_tokens(query)
+        )
+        return response.text
+
+
+class OpenAIProvider:
+    """Answers authority queries with the OpenAI chat completions API."""
+    name = "openai"
+
+    def __init__(self, api_key: str, model_name: str = OPENAI_MODEL, max_concurrency: int = OPENAI_CONCURRENCY):
+        from openai import AsyncOpenAI  # deferred: keeps the openai SDK out of cold starts
+        # Retries are handled by rate_limit so they share the quota-aware backoff.
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+
+    async def ask(self, query: str) -> str:
+        response = await rate_limit.call_async(self.model_name, lambda: self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": query}],
+        ), rate_limit.estimate_tokens(query))
+        return response.choices[0].message.content or ""
+
+
+def build_default_providers(project_id: str, location: str) -> list:
+    """Gemini is always available; OpenAI is added only when its API key can be read."""
+    vertexai.init(project=project_id, location=location)
+    providers = [GeminiProvider()]
+    openai_api_key = get_openai_api_key(project_id, OPENAI_SECRET_ID)
+    if openai_api_key:
+        providers.append(OpenAIProvider(openai_api_key))
+    else:
+        print("OpenAI API key unavailable; running authority analysis with Gemini only.")
+    return providers
+
+
+def _brand_from_url(url: str) -> str:
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return httpx.URL(url).host.replace('www.', '').split('.')[0].capitalize()
+
+
+def build_authority_tasks(your_site_url: str, competitor_urls: list[str], prompts: dict) -> list[dict]:
+    """
+    Expands the generated queries for every site: each query is rewritten so that it is
+    about that site's brand, and [COMPETITORS] lists the other brands. Identical query
+    strings are only asked once, since every answer is scored for every brand anyway.
+    """
+    your_brand = _brand_from_url(your_site_url)
+    sites = [(your_site_url, your_brand)] + [(url, _brand_from_url(url)) for url in competitor_urls]
+    all_brands = [brand for _, brand in sites]
+    your_brand_pattern = re.compile(re.escape(your_brand), re.IGNORECASE)
+
+    tasks = []
+    seen_queries = set()
+    for site_url, brand in sites:
+        other_brands = ", ".join(b for b in all_brands if b != brand) or "its main competitors"
+        for category in AUTHORITY_QUERY_CATEGORIES:
+            for raw_query in prompts.get(category) or []:
+                query = your_brand_pattern.sub(brand, str(raw_query)) if brand != your_brand else str(raw_query)
+                query = query.replace("[COMPETITORS]", other_brands)
+                if query in seen_queries:
+                    continue
+                seen_queries.add(query)
+                tasks.append({"site": site_url, "brand": brand, "category": category, "query": query})
+    return tasks
+
+
+def count_brand_mentions(text: str, brands: list[str]) -> dict:
+    """Counts whole-word, case-insensitive mentions of each brand in an answer."""
+    return {
+        brand: len(re.findall(rf"\b{re.escape(brand)}\b", text, re.IGNORECASE))
+        for brand in brands
+    }
+
+
+class AuthorityScoreboard:
+    """Aggregates visibility and mention share per provider and brand as results arrive."""
+
+    def __init__(self, brands: list[str]):
+        self.brands = brands
+        self.stats = {}
+
+    def add(self, result: dict):
+        provider_stats = self.stats.setdefault(
+            result["provider"],
+            {"answers": 0, "brands": {b: {"visible": 0, "mentions": 0} for b in self.brands}},
+        )
+        if result.get("error"):
+            return
+        provider_stats["answers"] += 1
+        for brand, mentions in result["mentions"].items():
+            provider_stats["brands"][brand]["mentions"] += mentions
+            if mentions:
+                provider_stats["brands"][brand]["visible"] += 1
+
+    def snapshot(self) -> dict:
+        scores = {}
+        for provider, provider_stats in self.stats.items():
+            answers = provider_stats["answers"]
+            total_mentions = sum(b["mentions"] for b in provider_stats["brands"].values())
+            scores[provider] = {
+                brand: {
+                    "visibility": round(100 * b["visible"] / answers, 1) if answers else 0.0,
+                    "mentionShare": round(100 * b["mentions"] / total_mentions, 1) if total_mentions else 0.0,
+                    "mentions": b["mentions"],
+                }
+                for brand, b in provider_stats["brands"].items()
+            }
+        return scores
+
+
+async def run_authority_engine(providers: list, tasks: list[dict], brands: list[str], on_result) -> list[dict]:
+    """
+    Asks every task's query to every provider concurrently, bounded per provider by its
+    max_concurrency. on_result is awaited with each scored result as soon as it lands.
+    If this coroutine is cancelled, all outstanding provider calls are cancelled too.
+    """
+    semaphores = {provider.name: asyncio.Semaphore(provider.max_concurrency) for provider in providers}
+
+    async def ask_one(provider, task: dict) -> dict:
+        async with semaphores[provider.name]:
+            try:
+                with stage(f"seo.authority_{provider.name}"):
+                    answer = await _authority_flights.do(
+                        (provider.name, task["query"]), lambda: provider.ask(task["query"])
+                    )
+                error = None
+            except Exception as e:
+                answer, error = "", str(e)
+        return {
+            **task,
+            "provider": provider.name,
+            "answer": answer,
+            "error": error,
+            "mentions": count_brand_mentions(answer, brands),
+        }
+
+    pending = [asyncio.create_task(ask_one(provider, task)) for task in tasks for provider in providers]
+    results = []
+    try:
+        for next_result in asyncio.as_completed(pending):
+            result = await next_result
+            results.append(result)
+            await on_result(result)
+    finally:
+        for task in pending:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return results
+
+
+async def _gather_or_cancel(*coroutines) -> list:
+    """Like asyncio.gather(), but the first failure cancels the others instead of leaving them spending quota."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _wait_for_disconnect(websocket):
+    while True:
+        message = await websocket.receive()
+        if message.get("type") == "websocket.disconnect":
+            return
+
+
+def _summarize_authority(results: list[dict], scores: dict, your_brand: str) -> tuple[dict, dict]:
+    analysis = {}
+    for result in results:
+        if result["error"]:
+            point = f"[{result['brand']}] {result['query']} — failed: {result['error']}"
+        else:
+            point = f"[{result['brand']}] {result['query']} — {your_brand} mentioned {result['mentions'].get(your_brand, 0)}x"
+        analysis.setdefault(result["provider"], {}).setdefault(result["category"], []).append({
+            "point": point,
+            "site": result["site"],
+            "query": result["query"],
+            "answer": result["answer"],
+            "mentions": result["mentions"],
+        })
+
+    insights = []
+    visibilities = []
+    for provider, brand_scores in scores.items():
+        for brand, brand_score in brand_scores.items():
+            insights.append(
+                f"{provider.capitalize()}: {brand} visible in {brand_score['visibility']}% of answers, "
+                f"{brand_score['mentionShare']}% share of mentions."
+            )
+        visibilities.append(brand_scores.get(your_brand, {}).get("visibility", 0.0))
+    score = round(sum(visibilities) / len(visibilities) / 10) if visibilities else 0
+    return {"score": score, "insights": insights}, analysis
+
+
+async def run_full_seo_analysis(websocket, project_id: str, location: str, your_site: dict, competitors: list[dict], prompts: dict, providers: list | None = None,
+                                schema_limit: int | None = None) -> dict:
+    """
+    Runs the authority engine and the schema audit side by side, streaming each result
+    over the websocket as it lands. The audit samples `schema_limit` sitemap pages
+    (see schema_page_limit()).
+    Pass `providers` (objects with name, max_concurrency and async ask()) to run against
+    local stubs instead of Gemini/OpenAI.
+    """
     await websocket.send_json({"log": "Initializing analysis..."})
     
     your_site_url = your_site.get("url")
     if not your_site_url:
         raise ValueError("your_site URL is missing from the payload.")
+    page_limit = schema_page_limit(schema_limit)
     
     competitor_urls = [c.get("url") for c in competitors if c.get("url")]
-    
-    vertexai.init(project=project_id, location=location)
-    # Using the user-specified model for the main analysis
-    gemini_model = GenerativeModel("gemini-2.5-pro")
-    
-    # ... rest of the function remains the same ...
-    
-    # Returning placeholder data for now as the inner analysis functions are complex
-    # and not the source of the current issues.
+    if providers is None:
+        # Reads the OpenAI key from Secret Manager and builds SDK clients: blocking network I/O.
+        providers = await asyncio.to_thread(build_default_providers, project_id, location)
+
+    tasks = build_authority_tasks(your_site_url, competitor_urls, prompts)
+    your_brand = _brand_from_url(your_site_url)
+    brands = [your_brand] + [_brand_from_url(url) for url in competitor_urls]
+    scoreboard = AuthorityScoreboard(brands)
+    total = len(tasks) * len(providers)
+    await websocket.send_json({"log": f"Running {total} authority queries across {', '.join(p.name for p in providers)}..."})
+
+    completed = 0
+
+    async def on_result(result: dict):
+        nonlocal completed
+        completed += 1
+        scoreboard.add(result)
+        status = "failed" if result["error"] else f"{result['mentions'].get(your_brand, 0)} mention(s) of {your_brand}"
+        await websocket.send_json({
+            "log": f"[{completed}/{total}] {result['provider'].capitalize()} · {result['brand']}: {status}",
+            "result": {k: result[k] for k in ("provider", "site", "brand", "category", "query", "answer", "mentions", "error")},
+            "scores": scoreboard.snapshot(),
+        })
+
+    async def on_schema_page(page: dict, audited: int, sampled: int):
+        if page.get("fetchError"):
+            status = f"fetch failed ({page['fetchError']})"
+        else:
+            types = sorted(set(page["jsonld"] + page["microdata"] + page["rdfa"]))
+            status = ", ".join(types) if types else "no structured data"
+        await websocket.send_json({"log": f"Schema [{audited}/{sampled}] {page['url']}: {status}", "schemaPage": page})
+
+    analysis = asyncio.create_task(_gather_or_cancel(
+        run_authority_engine(providers, tasks, brands, on_result),
+        run_schema_audit(your_site_url, your_site.get("sitemap"), on_schema_page, page_limit),
+    ))
+    watcher = asyncio.create_task(_wait_for_disconnect(websocket))
+    done, _ = await asyncio.wait({analysis, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    if watcher in done:
+        analysis.cancel()
+        await asyncio.gather(analysis, return_exceptions=True)
+        raise AnalysisCancelled("Client disconnected; outstanding analysis calls were cancelled.")
+    watcher.cancel()
+    await asyncio.gather(watcher, return_exceptions=True)
+    results, schema_audit = analysis.result()
+
+    scores = scoreboard.snapshot()
+    authority_audit, authority_analysis = _summarize_authority(results, scores, your_brand)
     final_report = {
         "reportTitle": f"LLM Optimization Analysis for {your_site_url.split('//')[-1]}",
-        "schemaAudit": {"score": 9, "summary": "Schema analysis complete."},
-        "authorityAudit": {"score": 8, "insights": ["Authority analysis complete."]},
-        "authorityAnalysis": {
-            "gemini": prompts, # Pass the generated prompts through for display
-            "openai": {"base_queries": ["OpenAI comparison would go here."]}
-        }
+        "schemaAudit": schema_audit,
+        "authorityAudit": authority_audit,
+        "authorityScores": scores,
+        "authorityAnalysis": authority_analysis,
     }
-    return final_report
\ No newline at end of file
+    return final_report
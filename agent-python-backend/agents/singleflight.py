@@ -0,0 +1,55 @@
+import asyncio
+from urllib.parse import urlsplit, urlunsplit
+
+# --- Single-Flight Request Coalescing ---
+# When several requests ask for the same thing at the same time (the same page, the same
+# prompt, the same MMM fit), only the first one does the work; everyone else awaits its
+# result. Results are not cached: once the shared call finishes, the next caller starts fresh.
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one underlying task.
+
+    - Every waiter receives the same result, or the same exception.
+    - A cancelled waiter only cancels its own wait; the shared task keeps running for the others.
+    - When the last waiter goes away, the shared task is cancelled and the key is released,
+      so a caller arriving afterwards starts a new computation instead of inheriting the cancellation.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._calls = {}  # key -> {"task": asyncio.Task, "waiters": int}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key, fn):
+        """Runs `await fn()` once per key among concurrent callers and returns its result."""
+        call = self._calls.get(key)
+        if call is None:
+            call = {"task": asyncio.ensure_future(fn()), "waiters": 0}
+            self._calls[key] = call
+            call["task"].add_done_callback(lambda _, key=key, call=call: self._release(key, call))
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        finally:
+            call["waiters"] -= 1
+            if call["waiters"] == 0 and not call["task"].done():
+                self._release(key, call)
+                call["task"].cancel()
+
+    def _release(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for use in coalescing keys (scheme, case, trailing slash, fragment)."""
+    url = (url or "").strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
@@ -0,0 +1,351 @@
+"""
+Deterministic local stand-ins for every external service the agents talk to.
+
+Each fake sleeps for a configurable latency and then returns a canned but well-formed
+response, so endpoint timings reflect our own code plus a controllable backend delay.
+install_fakes() patches the agent modules in place and returns an undo function.
+"""
+import asyncio
+import base64
+import json
+import os
+import re
+import socketserver
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 1x1 transparent PNG, used for fake screenshots and fake Imagen output.
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+@dataclass
+class FakeLatency:
+    """Injected latencies in seconds for each kind of backend call."""
+    llm: float = 0.2
+    image: float = 0.3
+    page: float = 0.15
+    http: float = 0.05
+
+
+LATENCY = FakeLatency()
+
+
+def _load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fixture_for_url(url: str) -> str:
+    """Maps a URL to a saved HTML fixture; ad library URLs get the ad library page."""
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    if "ads" in parsed.netloc or "ads" in parsed.path:
+        return _load_fixture("ad_library.html")
+    if parsed.path.strip("/"):
+        return _load_fixture("product_page.html")
+    return _load_fixture("brand_home.html")
+
+
+# --- Fake Vertex AI GenerativeModel ---
+def _prompt_text(contents) -> str:
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(part for part in contents if isinstance(part, str))
+    return str(contents)
+
+
+def _fake_posts() -> list:
+    return [
+        {"Hook": f"Hook {i}", "Body": f"Body copy {i}.", "CTA": "Shop now", "Hashtags": ["#brand", "#launch", "#new"]}
+        for i in range(1, 4)
+    ]
+
+
+def fake_llm_response(prompt: str) -> str:
+    """Picks a canned JSON answer based on the shape of output the prompt asks for."""
+    if '"results"' in prompt and '"posts"' in prompt:
+        strategies = len(re.findall(r"### Strategy \d+", prompt))
+        body = {"results": [
+            {"strategy": index, "posts": _fake_posts()} for index in range(strategies)
+        ]}
+    elif '"approaches"' in prompt:
+        body = {"approaches": [
+            {"Title": f"Approach {i}", "Core Idea": f"Core idea {i}", "Description": f"Description of approach {i}."}
+            for i in range(1, 4)
+        ]}
+    elif '"posts"' in prompt:
+        body = {"posts": _fake_posts()}
+    elif '"prompts"' in prompt:
+        body = {"prompts": [f"A detailed product scene number {i}, soft studio light." for i in range(1, 5)]}
+    elif '"base_queries"' in prompt:
+        body = {
+            "base_queries": ["What is Acme known for?", "Is Acme a good brand?"],
+            "comparison_queries": ["How does Acme compare to [COMPETITORS]?"],
+            "expertise_queries": ["Does Acme have real expertise in outdoor gear?"],
+        }
+    elif '"visualizationCode"' in prompt:
+        body = {"visualizationCode": "", "summary": "Sales grew steadily across the period."}
+    elif '"reportTitle"' in prompt:
+        body = {
+            "reportTitle": "Bayesian MMM & Budget Optimization Dashboard",
+            "keyInsights": [{"insight": "Search has the highest ROI.", "metric": "ROI 2.1"}],
+            "summary": "Search and Social drive most incremental sales.",
+            "recommendations": ["Shift 10% of Print budget to Search."],
+        }
+    else:
+        return "Acme is a well-known outdoor brand, often compared with Globex and Initech."
+    return json.dumps(body)
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+STREAM_CHUNKS = 8
+
+
+class FakeGenerativeModel:
+    """Stands in for vertexai.generative_models.GenerativeModel."""
+
+    def __init__(self, model_name: str = "fake", *args, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, *args, **kwargs) -> FakeResponse:
+        time.sleep(LATENCY.llm)
+        return FakeResponse(fake_llm_response(_prompt_text(contents)))
+
+    async def generate_content_async(self, contents, *args, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream(fake_llm_response(_prompt_text(contents)))
+        await asyncio.sleep(LATENCY.llm)
+        return FakeResponse(fake_llm_response(_prompt_text(contents)))
+
+    async def _stream(self, text: str):
+        """Spreads the response (and the latency) over STREAM_CHUNKS pieces, like a streamed reply."""
+        size = -(-len(text) // STREAM_CHUNKS)
+        for start in range(0, len(text), size):
+            await asyncio.sleep(LATENCY.llm / STREAM_CHUNKS)
+            yield FakeResponse(text[start:start + size])
+
+
+# --- Fake Imagen ---
+class FakeGeneratedImage:
+    def __init__(self):
+        self._image_bytes = TINY_PNG
+
+
+class FakeImageResponse:
+    def __init__(self, count: int):
+        self.images = [FakeGeneratedImage() for _ in range(count)]
+
+
+class FakeImageGenerationModel:
+    """Stands in for vertexai.preview.vision_models.ImageGenerationModel."""
+
+    @classmethod
+    def from_pretrained(cls, model_name: str):
+        return cls()
+
+    def generate_images(self, prompt: str, number_of_images: int = 1, **kwargs) -> FakeImageResponse:
+        time.sleep(LATENCY.image)
+        return FakeImageResponse(number_of_images)
+
+    def edit_image(self, prompt: str, number_of_images: int = 1, **kwargs) -> FakeImageResponse:
+        time.sleep(LATENCY.image)
+        return FakeImageResponse(number_of_images)
+
+
+# --- Fake Playwright ---
+class FakePage:
+    def __init__(self):
+        self._html = ""
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def goto(self, url: str, **kwargs):
+        await asyncio.sleep(LATENCY.page)
+        self._html = fixture_for_url(url)
+
+    async def screenshot(self, **kwargs) -> bytes:
+        return TINY_PNG
+
+    async def content(self) -> str:
+        return self._html
+
+
+class FakeBrowser:
+    async def new_page(self) -> FakePage:
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakeChromium:
+    async def launch(self, **kwargs) -> FakeBrowser:
+        return FakeBrowser()
+
+
+class FakePlaywright:
+    chromium = FakeChromium()
+
+
+@asynccontextmanager
+async def fake_async_playwright():
+    yield FakePlaywright()
+
+
+# --- Fake HTTP targets ---
+def _http_response(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/robots.txt":
+        return httpx.Response(200, text=f"User-agent: *\nSitemap: https://{request.url.host}/sitemap.xml\n")
+    if path == "/sitemap.xml":
+        urls = "".join(f"<url><loc>https://{request.url.host}/products/{i}</loc></url>" for i in range(50))
+        return httpx.Response(200, text=f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    return httpx.Response(200, text=fixture_for_url(str(request.url)))
+
+
+def _sync_handler(request: httpx.Request) -> httpx.Response:
+    time.sleep(LATENCY.http)
+    return _http_response(request)
+
+
+async def _async_handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(LATENCY.http)
+    return _http_response(request)
+
+
+_RealClient = httpx.Client
+_RealAsyncClient = httpx.AsyncClient
+
+
+class OfflineClient(_RealClient):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("transport", httpx.MockTransport(_sync_handler))
+        super().__init__(*args, **kwargs)
+
+
+class OfflineAsyncClient(_RealAsyncClient):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("transport", httpx.MockTransport(_async_handler))
+        super().__init__(*args, **kwargs)
+
+
+# --- Fake Redis ---
+class _RedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self) -> list | None:
+        line = self.rfile.readline()
+        if not line.startswith(b"*"):
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        while (args := self._read_command()) is not None:
+            command = args[0].upper()
+            with server.lock:
+                now = time.monotonic()
+                for key in [key for key, (_, expires) in server.data.items() if expires and expires <= now]:
+                    del server.data[key]
+                if command in (b"PING", b"AUTH", b"SELECT"):
+                    reply = b"+OK\r\n" if command != b"PING" else b"+PONG\r\n"
+                elif command == b"GET":
+                    value = server.data.get(args[1], (None, None))[0]
+                    reply = b"$-1\r\n" if value is None else b"$%d\r\n%b\r\n" % (len(value), value)
+                elif command == b"SET":
+                    options = [arg.upper() for arg in args[3:]]
+                    ttl = float(args[4 + options.index(b"PX")]) / 1000 if b"PX" in options else None
+                    server.data[args[1]] = (args[2], now + ttl if ttl else None)
+                    reply = b"+OK\r\n"
+                elif command == b"DEL":
+                    reply = b":%d\r\n" % sum(server.data.pop(key, None) is not None for key in args[1:])
+                elif command == b"FLUSHDB":
+                    server.data.clear()
+                    reply = b"+OK\r\n"
+                else:
+                    reply = b"-ERR unknown command '%b'\r\n" % command
+            self.wfile.write(reply)
+            self.wfile.flush()
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """
+    In-process Redis stand-in on 127.0.0.1 (PING, AUTH, SELECT, GET, SET [PX], DEL, FLUSHDB),
+    for running the "redis" cache backend without a server: `with FakeRedisServer() as redis:`
+    then point REDIS_URL at `redis.url`.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RedisHandler)
+        self.data, self.lock = {}, threading.Lock()
+        self.url = f"redis://127.0.0.1:{self.server_address[1]}/0"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        super().__exit__(*exc)
+
+
+# --- Installation ---
+UNLIMITED_QUOTA = {"requests_per_minute": 1e9, "max_concurrency": 100_000}
+
+
+def install_fakes(latency: FakeLatency | None = None, enforce_quotas: bool = False):
+    """
+    Patches every agent module to use the fakes above. Clients that are given an explicit
+    transport (like the benchmark driver's ASGI transport) are left untouched.
+    Model quotas are lifted unless enforce_quotas is set, so timings measure our code
+    rather than the production requests-per-minute limits.
+    Returns a function that restores the originals.
+    """
+    import vertexai
+    from agents import (
+        brand_strategist_agent, copywriter_agent, creative_agent,
+        creative_director_agent, data_science_agent, fetch_profiles, llm, rate_limit, seo_agent,
+    )
+
+    if latency is not None:
+        LATENCY.__dict__.update(latency.__dict__)
+
+    patches = [
+        (vertexai, "init", lambda *args, **kwargs: None),
+        (httpx, "Client", OfflineClient),
+        (httpx, "AsyncClient", OfflineAsyncClient),
+        (fetch_profiles, "async_playwright", fake_async_playwright),
+        (creative_agent, "ImageGenerationModel", FakeImageGenerationModel),
+        (seo_agent, "get_openai_api_key", lambda *args, **kwargs: None),
+    ]
+    for module in (data_science_agent, llm, seo_agent):
+        patches.append((module, "GenerativeModel", FakeGenerativeModel))
+    if not enforce_quotas:
+        patches += [
+            (rate_limit, "_quotas", {}),
+            (rate_limit, "FALLBACK_QUOTA", UNLIMITED_QUOTA),
+            (rate_limit, "_limiters", {}),
+        ]
+
+    originals = [(target, name, getattr(target, name)) for target, name, _ in patches]
+    for target, name, replacement in patches:
+        setattr(target, name, replacement)
+
+    def uninstall():
+        for target, name, original in originals:
+            setattr(target, name, original)
+
+    return uninstall
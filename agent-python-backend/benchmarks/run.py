@@ -0,0 +1,322 @@
+"""
+Offline end-to-end latency benchmarks for every FastAPI endpoint.
+
+The app runs in-process behind httpx's ASGI transport, with Vertex, Imagen, Playwright
+and outbound HTTP replaced by the deterministic fakes in benchmarks/fakes.py. Datasets
+come from create_dummy_data.py, written to a temporary directory.
+
+Run from agent-python-backend/:
+
+    python -m benchmarks.run                                   # all scenarios, concurrency 1,4,16
+    python -m benchmarks.run --scenarios generate-social-copy,analyze-brand --requests 100
+    python -m benchmarks.run --llm-latency 0.5 --save before.json
+    python -m benchmarks.run --save after.json --compare before.json
+    python -m benchmarks.run --scenarios analyze-rollup --cache-backend redis   # against FakeRedisServer
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from .fakes import FakeLatency, FakeRedisServer, install_fakes
+
+BRIEF = {
+    "brandName": "Acme Outdoor",
+    "websiteUrl": "https://acme.example",
+    "adLibraryUrl": "https://www.facebook.com/ads/library/?q=acme",
+    "userBrief": "Launch the Ridgeline Shell to weekend hikers.",
+}
+STRATEGY = {"Title": "Rain Is a Forecast", "Core Idea": "Weather never cancels plans.", "Description": "Own bad-weather hiking."}
+SEO_PROMPTS = {
+    "base_queries": ["What is Acme known for?", "Is Acme a good brand?"],
+    "comparison_queries": ["How does Acme compare to [COMPETITORS]?"],
+    "expertise_queries": ["Does Acme have real expertise in outdoor gear?"],
+}
+CREATIVE_FORM = {
+    "platform": "meta",
+    "customSubject": "A waterproof hiking shell",
+    "sceneDescription": "A misty ridge at dawn",
+    "imageType": "Product Photo",
+    "style": "Photorealistic",
+    "camera": "85mm",
+    "lighting": "Golden hour",
+    "composition": "Rule of thirds",
+    "modifiers": "Ultra detailed",
+    "negativePrompt": "Low quality, blurry, watermark",
+}
+
+
+def _phone_photo() -> bytes:
+    """A 12 MP JPEG with a noisy gradient (so it compresses like a photo) and EXIF rotation."""
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, 4032, dtype=np.float32)[None, :, None].repeat(3024, axis=0).repeat(3, axis=2)
+    pixels = np.clip(gradient + rng.normal(0, 12, gradient.shape), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    exif = image.getexif()
+    exif[0x0112] = 6  # Orientation: rotate 90° clockwise
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92, exif=exif)
+    return output.getvalue()
+
+
+# --- Scenarios ---
+# Each scenario sends one request and returns True on success.
+async def _ok(response_coro) -> bool:
+    response = await response_coro
+    return response.status_code < 400
+
+
+async def _sse_ok(response_coro) -> bool:
+    """An SSE stream only counts as a success if it reaches its final "done" event."""
+    response = await response_coro
+    return response.status_code < 400 and "event: done" in response.text
+
+
+async def _batch_social_copy(client, brands: int = 5, strategies: int = 4) -> bool:
+    """Submits brands x strategies copy requests as one batch and polls until it finishes."""
+    items = [
+        {**BRIEF, "brandName": f"Brand {b}", "selectedStrategy": {**STRATEGY, "Title": f"Strategy {s}"}}
+        for b in range(brands) for s in range(strategies)
+    ]
+    response = await client.post("/batches/social-copy", json={"items": items})
+    if response.status_code != 202:
+        return False
+    batch_url = f"/batches/{response.json()['batchId']}"
+    while True:
+        await asyncio.sleep(0.02)
+        batch = (await client.get(batch_url, params={"include_results": "false"})).json()
+        if batch["status"] != "running":
+            return batch["status"] == "completed"
+
+
+async def websocket_request(app, path: str, payload: dict) -> dict:
+    """Drives a websocket route over raw ASGI and returns the final report or error message."""
+    inbox = asyncio.Queue()
+    await inbox.put({"type": "websocket.connect"})
+    final = {}
+
+    async def receive():
+        return await inbox.get()
+
+    async def send(message):
+        if message["type"] == "websocket.accept":
+            await inbox.put({"type": "websocket.receive", "text": json.dumps(payload)})
+        elif message["type"] == "websocket.send":
+            data = json.loads(message["text"])
+            if "report" in data or data.get("status") == "error":
+                final.update(data)
+        elif message["type"] == "websocket.close":
+            await inbox.put({"type": "websocket.disconnect", "code": 1000})
+
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": path,
+        "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "server": ("benchmark", 80), "client": ("benchmark", 1), "subprotocols": [],
+    }
+    await app(scope, receive, send)
+    return final
+
+
+def build_scenarios(app) -> dict:
+    photo = _phone_photo()
+    uploads = itertools.count()
+
+    def upload_creative(client):
+        # Trailing bytes after the JPEG end marker give every request a new content hash,
+        # so each one pays for normalization instead of hitting the image cache.
+        files = {"subjectImage": ("product.jpg", photo + str(next(uploads)).encode(), "image/jpeg")}
+        return _ok(client.post("/generate-creative", data=CREATIVE_FORM, files=files))
+
+    return {
+        "validate-sitemaps": lambda c: _ok(c.post("/validate-sitemaps", data={"urls": ["acme.example", "globex.example"]})),
+        "generate-prompts": lambda c: _ok(c.post("/generate-prompts", data={"url": "acme.example", "competitors": "globex.example"})),
+        "seo-analysis": lambda c: _seo_analysis(app),
+        "generate-creative": lambda c: _ok(c.post("/generate-creative", data=CREATIVE_FORM)),
+        "generate-creative-upload": upload_creative,
+        "preview": lambda c: _ok(c.get("/preview/retail_sales.csv")),
+        "analyze": lambda c: _ok(c.post("/analyze", data={
+            "dataset_filename": "campaign_performance.csv", "prompt": "Which campaign has the best CPA?", "model_type": "standard",
+        })),
+        "analyze-rollup": lambda c: _ok(c.post("/analyze", data={
+            "dataset_filename": "campaign_performance.csv", "prompt": "Spend and conversions by CampaignID", "model_type": "standard",
+        })),
+        "follow-up": lambda c: _ok(c.post("/follow-up", data={
+            "dataset_filename": "customer_churn.csv", "original_prompt": "What drives churn?",
+            "follow_up_history": json.dumps([{"sender": "user", "text": "What drives churn?"}, {"sender": "agent", "summary": "Tenure."}]),
+            "follow_up_prompt": "Break it down by support tickets.",
+        })),
+        "analyze-brand": lambda c: _ok(c.post("/analyze-brand", data=BRIEF)),
+        "generate-assets-from-brief": lambda c: _ok(c.post("/generate-assets-from-brief", json={**BRIEF, "selectedStrategy": STRATEGY})),
+        "generate-social-copy": lambda c: _ok(c.post("/generate-social-copy", json={**BRIEF, "selectedStrategy": STRATEGY})),
+        "analyze-brand-stream": lambda c: _sse_ok(c.post("/analyze-brand/stream", data=BRIEF)),
+        "generate-social-copy-stream": lambda c: _sse_ok(c.post("/generate-social-copy/stream", json={**BRIEF, "selectedStrategy": STRATEGY})),
+        "batch-social-copy": _batch_social_copy,
+    }
+
+
+async def _seo_analysis(app) -> bool:
+    result = await websocket_request(app, "/ws/seo-analysis", {
+        "yourSite": {"url": "https://acme.example", "sitemap": None},
+        "competitors": [{"url": "https://globex.example"}],
+        "prompts": SEO_PROMPTS,
+    })
+    return "report" in result
+
+
+# --- Measurement ---
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def measure(scenario, client, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                ok = await scenario(client)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "throughput_rps": requests / wall if wall else 0.0,
+    }
+
+
+async def run_benchmarks(scenario_names: list[str], concurrency_levels: list[int], requests: int) -> dict:
+    import main
+
+    scenarios = build_scenarios(main.app)
+    unknown = [name for name in scenario_names if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(scenarios)}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name in scenario_names:
+            scenario = scenarios[name]
+            # One unmeasured request pays for lazy agent imports and dataset caches.
+            await scenario(client)
+            results[name] = {}
+            for concurrency in concurrency_levels:
+                results[name][str(concurrency)] = await measure(scenario, client, requests, concurrency)
+    return results
+
+
+def prepare_datasets() -> str:
+    """Writes the create_dummy_data.py datasets into a temp dir and points main.py at it."""
+    import create_dummy_data
+    import main
+
+    data_dir = tempfile.mkdtemp(prefix="braidai-bench-")
+    create_dummy_data.create_all_datasets(output_dir=data_dir)
+    main.DATA_DIR = data_dir + os.sep
+    return data_dir
+
+
+# --- Reporting ---
+def print_results(results: dict):
+    print(f"{'scenario':<28} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'errors':>7}")
+    for name, by_concurrency in results.items():
+        for concurrency, stats in by_concurrency.items():
+            print(
+                f"{name:<28} {concurrency:>5} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {stats['throughput_rps']:>8.1f} {stats['errors']:>7}"
+            )
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "    n/a"
+    return f"{(after - before) / before * 100:>+6.1f}%"
+
+
+def print_comparison(baseline: dict, results: dict):
+    print(f"\n{'scenario':<28} {'conc':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}   (change vs baseline)")
+    for name, by_concurrency in results.items():
+        for concurrency, stats in by_concurrency.items():
+            before = baseline.get(name, {}).get(concurrency)
+            if not before:
+                continue
+            print(
+                f"{name:<28} {concurrency:>5} {_change(before['p50_ms'], stats['p50_ms']):>8} "
+                f"{_change(before['p95_ms'], stats['p95_ms']):>8} {_change(before['p99_ms'], stats['p99_ms']):>8} "
+                f"{_change(before['throughput_rps'], stats['throughput_rps']):>8}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline latency benchmarks against fake Google/Playwright backends.")
+    parser.add_argument("--scenarios", default="all", help="Comma-separated scenario names, or 'all'")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per scenario per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=FakeLatency.llm, help="Seconds per fake Gemini call")
+    parser.add_argument("--image-latency", type=float, default=FakeLatency.image, help="Seconds per fake Imagen call")
+    parser.add_argument("--page-latency", type=float, default=FakeLatency.page, help="Seconds per fake page load")
+    parser.add_argument("--http-latency", type=float, default=FakeLatency.http, help="Seconds per fake HTTP request")
+    parser.add_argument("--enforce-quotas", action="store_true", help="Keep the production model quotas instead of lifting them")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier --save to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show agent output instead of silencing it")
+    parser.add_argument("--cache-backend", choices=("memory", "sqlite", "redis"), default="memory",
+                        help="Shared cache backend; 'redis' uses REDIS_URL if set, else an in-process FakeRedisServer")
+    args = parser.parse_args()
+
+    os.environ["CACHE_BACKEND"] = args.cache_backend
+    if args.cache_backend == "sqlite":
+        os.environ["CACHE_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="braidai-cache-"), "cache.sqlite3")
+    if args.cache_backend == "redis" and not os.environ.get("REDIS_URL"):
+        os.environ["REDIS_URL"] = FakeRedisServer().url
+
+    latency = FakeLatency(args.llm_latency, args.image_latency, args.page_latency, args.http_latency)
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with output:
+        install_fakes(latency, enforce_quotas=args.enforce_quotas)
+        prepare_datasets()
+        import main
+        scenario_names = list(build_scenarios(main.app)) if args.scenarios == "all" else args.scenarios.split(",")
+        results = asyncio.run(run_benchmarks(scenario_names, concurrency_levels, args.requests))
+
+    print_results(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"latency": latency.__dict__, "requests": args.requests, "results": results}, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f)["results"], results)
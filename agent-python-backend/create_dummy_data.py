@@ -1,128 +1,364 @@
-import pandas as pd
-import numpy as np
+"""
+Generates the demo datasets used by the frontend, and much larger ones for load testing.
+
+    python create_dummy_data.py                       # the default demo datasets in ./data
+    python create_dummy_data.py --rows 5000000 --channels 200 --weeks 520 \
+        --format both --workers 4 --output-dir /tmp/loadtest
+
+Every column is generated with vectorized numpy operations, datasets are written in chunks
+of --chunk-rows (so memory stays flat however many rows are requested), and independent
+datasets are written in parallel processes with --workers. Each dataset gets its own child
+seed, so the same --seed and --chunk-rows produce identical files regardless of --workers.
+
+The MMM dataset carries real signal: each channel's spend goes through geometric adstock
+and Hill saturation before contributing to Sales, and the true parameters are written next
+to it (mmm_advanced_data_truth.json) so fitted models can be checked against them.
+"""
+import argparse
+import json
 import os
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-output_dir = './data'
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+import numpy as np
+import pandas as pd
 
-def create_all_datasets():
-    """Generates all dummy CSV files required by the frontend."""
-    # By setting a seed, we ensure the "random" data is the same every time.
-    np.random.seed(42)
-
-    num_records = 1000
-    start_date = datetime(2022, 1, 1)
-
-    # 1. Marketing Mix Model (Advanced) - More Detailed
-    dates = [start_date + timedelta(weeks=i) for i in range(156)] # 3 years of weekly data
-    num_weeks = len(dates)
-    mmm_data = {
-        'Date': dates,
-        'Sales': np.random.uniform(150000, 500000, num_weeks).round(2),
-        'TV_Spend': np.random.uniform(20000, 70000, num_weeks).round(2),
-        'Radio_Spend': np.random.uniform(10000, 30000, num_weeks).round(2),
-        'Social_Media_Spend': np.random.uniform(15000, 50000, num_weeks).round(2),
-        'Search_Spend': np.random.uniform(25000, 60000, num_weeks).round(2),
-        'OOH_Spend': np.random.uniform(5000, 25000, num_weeks).round(2),
-        'Print_Spend': np.random.uniform(2000, 15000, num_weeks).round(2),
-        'Affiliate_Spend': np.random.uniform(8000, 20000, num_weeks).round(2),
-        'Direct_Mail_Spend': np.random.uniform(3000, 18000, num_weeks).round(2),
-        'Podcast_Spend': np.random.uniform(4000, 22000, num_weeks).round(2),
-        'Influencer_Spend': np.random.uniform(6000, 35000, num_weeks).round(2),
-        'Competitor_Spend': np.random.uniform(50000, 150000, num_weeks).round(2),
-        'Inflation_Index': np.linspace(1.0, 1.08, num_weeks).round(3)
-    }
-    pd.DataFrame(mmm_data).to_csv(os.path.join(output_dir, 'mmm_advanced_data.csv'), index=False)
-    print("Created detailed mmm_advanced_data.csv")
-    
-    # Other datasets... (no changes needed for the rest of the file)
-    # ...
-
-    # 2. Customer Churn
-    churn_data = {
-        'CustomerID': range(1, num_records + 1),
-        'TenureMonths': np.random.randint(1, 72, num_records),
-        'MonthlyCharge': np.random.uniform(20, 120, num_records).round(2),
-        'FeaturesUsed': np.random.randint(1, 8, num_records),
-        'SupportTickets': np.random.randint(0, 10, num_records),
-        'Churn': np.random.choice([0, 1], num_records, p=[0.7, 0.3])
-    }
-    pd.DataFrame(churn_data).to_csv(os.path.join(output_dir, 'customer_churn.csv'), index=False)
-    print("Created customer_churn.csv")
-
-    # 3. Campaign Performance
-    campaign_dates = [start_date + timedelta(days=i) for i in range(365)]
-    campaign_ids = ['A', 'B', 'C']
-    campaign_data = {
-        'Date': np.random.choice(campaign_dates, num_records),
-        'CampaignID': np.random.choice(campaign_ids, num_records),
-        'Impressions': np.random.randint(10000, 100000, num_records),
-        'Clicks': np.random.randint(100, 5000, num_records),
-        'Spend': np.random.uniform(500, 5000, num_records).round(2),
-        'Conversions': np.random.randint(10, 200, num_records)
-    }
-    pd.DataFrame(campaign_data).sort_values('Date').to_csv(os.path.join(output_dir, 'campaign_performance.csv'), index=False)
-    print("Created campaign_performance.csv")
-
-    # 4. Retail Sales
-    products = {
-        'SKU-101': {'Name': 'Pro Carbon Stick', 'Category': 'Sticks', 'Cost': 150.0},
-        'SKU-201': {'Name': 'Vapor Flex Skates', 'Category': 'Skates', 'Cost': 300.0},
-        'SKU-301': {'Name': 'AeroLite Helmet', 'Category': 'Helmets', 'Cost': 80.0},
-        'SKU-401': {'Name': 'Stealth Pro Gloves', 'Category': 'Gloves', 'Cost': 90.0}
-    }
-    skus = list(products.keys())
-    transaction_skus = np.random.choice(skus, num_records)
-    retail_data = {
-        'Date': [start_date + timedelta(days=np.random.randint(0, 730)) for _ in range(num_records)],
-        'SKU': transaction_skus,
-        'ProductName': [products[sku]['Name'] for sku in transaction_skus],
-        'Category': [products[sku]['Category'] for sku in transaction_skus],
-        'Cost': [products[sku]['Cost'] for sku in transaction_skus],
-        'Sales': [products[sku]['Cost'] * np.random.uniform(1.5, 2.5) for sku in transaction_skus],
-        'Promotion': np.random.choice(['None', '10% Off'], num_records, p=[0.8, 0.2]),
-        'Weather': np.random.choice(['Sunny', 'Rain', 'Snow'], num_records),
-        'Holiday': np.random.choice([0, 1], num_records, p=[0.95, 0.05])
-    }
-    df_retail = pd.DataFrame(retail_data)
-    df_retail['Profit'] = df_retail['Sales'] - df_retail['Cost']
-    df_retail[['Sales', 'Profit']] = df_retail[['Sales', 'Profit']].round(2)
-    df_retail.sort_values('Date').to_csv(os.path.join(output_dir, 'retail_sales.csv'), index=False)
-    print("Created retail_sales.csv")
-
-    # 5. Predictive CLTV
-    cltv_data = {
-        'CustomerID': np.random.randint(1, 200, num_records),
-        'TransactionDate': [start_date + timedelta(days=np.random.randint(0, 730)) for _ in range(num_records)],
-        'TransactionValue': np.random.uniform(25, 500, num_records).round(2)
-    }
-    pd.DataFrame(cltv_data).sort_values('TransactionDate').to_csv(os.path.join(output_dir, 'cltv_data.csv'), index=False)
-    print("Created cltv_data.csv")
-
-    # 6. Product Recommendations
-    reco_data = {
-        'UserID': np.random.randint(1, 100, num_records),
-        'ProductID': np.random.randint(1, 50, num_records),
-        'Category': np.random.choice(['Electronics', 'Apparel', 'Gear', 'Accessories'], num_records),
-        'Rating': np.random.randint(1, 6, num_records)
-    }
-    pd.DataFrame(reco_data).to_csv(os.path.join(output_dir, 'product_recommendations.csv'), index=False)
-    print("Created product_recommendations.csv")
-
-    # 7. Customer Behavior
-    behavior_data = {
-        'SessionID': range(1, num_records + 1),
-        'PagesViewed': np.random.randint(1, 25, num_records),
-        'TimeOnSiteMinutes': np.random.uniform(0.5, 45, num_records).round(1),
-        'Device': np.random.choice(['Mobile', 'Desktop'], num_records, p=[0.6, 0.4]),
-        'Converted': np.random.choice([0, 1], num_records, p=[0.9, 0.1])
+DEFAULT_OUTPUT_DIR = './data'
+START_DATE = np.datetime64('2022-01-01')
+DEFAULT_ROWS = 1000
+DEFAULT_WEEKS = 156    # 3 years of weekly data
+DEFAULT_CHUNK_ROWS = 250_000
+MEDIA_SHARE = 0.4
+
+MMM_CHANNELS = [
+    ('TV', 20000, 70000), ('Radio', 10000, 30000), ('Social_Media', 15000, 50000),
+    ('Search', 25000, 60000), ('OOH', 5000, 25000), ('Print', 2000, 15000),
+    ('Affiliate', 8000, 20000), ('Direct_Mail', 3000, 18000), ('Podcast', 4000, 22000),
+    ('Influencer', 6000, 35000),
+]
+
+PRODUCTS = {
+    'SKU-101': {'Name': 'Pro Carbon Stick', 'Category': 'Sticks', 'Cost': 150.0},
+    'SKU-201': {'Name': 'Vapor Flex Skates', 'Category': 'Skates', 'Cost': 300.0},
+    'SKU-301': {'Name': 'AeroLite Helmet', 'Category': 'Helmets', 'Cost': 80.0},
+    'SKU-401': {'Name': 'Stealth Pro Gloves', 'Category': 'Gloves', 'Cost': 90.0}
+}
+
+
+# --- Vectorized Helpers ---
+def _sorted_days(rng: np.random.Generator, start: int, n: int, total: int, span_days: int) -> np.ndarray:
+    """
+    Uniformly distributed day offsets in [0, span_days) that are sorted across the whole
+    dataset, even though it is generated chunk by chunk: row i is drawn from the i-th of
+    `total` equal slices of the range (stratified sampling).
+    """
+    rows = np.arange(start, start + n)
+    return ((rows + rng.random(n)) / total * span_days).astype('int64')
+
+
+def _dates(days: np.ndarray) -> np.ndarray:
+    return START_DATE + days.astype('timedelta64[D]')
+
+
+def _choice(rng: np.random.Generator, values, n: int, p=None) -> np.ndarray:
+    return np.asarray(values)[rng.choice(len(values), n, p=p)]
+
+
+# --- Row-Level Datasets ---
+# Each generator returns rows [start, start + n) of a dataset with `total` rows.
+def customer_churn(rng, start, n, total, **_):
+    return pd.DataFrame({
+        'CustomerID': np.arange(start + 1, start + n + 1),
+        'TenureMonths': rng.integers(1, 72, n),
+        'MonthlyCharge': rng.uniform(20, 120, n).round(2),
+        'FeaturesUsed': rng.integers(1, 8, n),
+        'SupportTickets': rng.integers(0, 10, n),
+        'Churn': rng.choice([0, 1], n, p=[0.7, 0.3])
+    })
+
+
+def campaign_performance(rng, start, n, total, campaigns=3, **_):
+    campaign_ids = [chr(ord('A') + i) if i < 26 else f'C{i + 1}' for i in range(campaigns)]
+    return pd.DataFrame({
+        'Date': _dates(_sorted_days(rng, start, n, total, 365)),
+        'CampaignID': _choice(rng, campaign_ids, n),
+        'Impressions': rng.integers(10000, 100000, n),
+        'Clicks': rng.integers(100, 5000, n),
+        'Spend': rng.uniform(500, 5000, n).round(2),
+        'Conversions': rng.integers(10, 200, n)
+    })
+
+
+def retail_sales(rng, start, n, total, **_):
+    skus = np.array(list(PRODUCTS))
+    names = np.array([product['Name'] for product in PRODUCTS.values()])
+    categories = np.array([product['Category'] for product in PRODUCTS.values()])
+    costs = np.array([product['Cost'] for product in PRODUCTS.values()])
+
+    product = rng.integers(0, len(skus), n)
+    cost = costs[product]
+    sales = cost * rng.uniform(1.5, 2.5, n)
+    return pd.DataFrame({
+        'Date': _dates(_sorted_days(rng, start, n, total, 730)),
+        'SKU': skus[product],
+        'ProductName': names[product],
+        'Category': categories[product],
+        'Cost': cost,
+        'Sales': sales.round(2),
+        'Promotion': _choice(rng, ['None', '10% Off'], n, p=[0.8, 0.2]),
+        'Weather': _choice(rng, ['Sunny', 'Rain', 'Snow'], n),
+        'Holiday': rng.choice([0, 1], n, p=[0.95, 0.05]),
+        'Profit': (sales - cost).round(2)
+    })
+
+
+def cltv_data(rng, start, n, total, **_):
+    customers = max(200, total // 5)
+    return pd.DataFrame({
+        'CustomerID': rng.integers(1, customers, n),
+        'TransactionDate': _dates(_sorted_days(rng, start, n, total, 730)),
+        'TransactionValue': rng.uniform(25, 500, n).round(2)
+    })
+
+
+def product_recommendations(rng, start, n, total, **_):
+    return pd.DataFrame({
+        'UserID': rng.integers(1, max(100, total // 10), n),
+        'ProductID': rng.integers(1, 50, n),
+        'Category': _choice(rng, ['Electronics', 'Apparel', 'Gear', 'Accessories'], n),
+        'Rating': rng.integers(1, 6, n)
+    })
+
+
+def customer_behavior(rng, start, n, total, **_):
+    return pd.DataFrame({
+        'SessionID': np.arange(start + 1, start + n + 1),
+        'PagesViewed': rng.integers(1, 25, n),
+        'TimeOnSiteMinutes': rng.uniform(0.5, 45, n).round(1),
+        'Device': _choice(rng, ['Mobile', 'Desktop'], n, p=[0.6, 0.4]),
+        'Converted': rng.choice([0, 1], n, p=[0.9, 0.1])
+    })
+
+
+# --- Marketing Mix Model ---
+def mmm_channels(num_channels: int) -> list:
+    """The ten named demo channels, then generic ones for larger load tests."""
+    channels = MMM_CHANNELS[:num_channels]
+    for i in range(len(channels), num_channels):
+        channels.append((f'Channel_{i + 1}', 2000 + 500 * (i % 20), 15000 + 2500 * (i % 20)))
+    return channels
+
+
+def marketing_mix(rng: np.random.Generator, num_weeks: int, num_channels: int) -> tuple[pd.DataFrame, dict]:
+    """
+    Weekly sales driven by media through geometric adstock and Hill saturation:
+
+        adstock[t] = spend[t] + decay * adstock[t-1]
+        response   = adstock^shape / (adstock^shape + half_saturation^shape)
+        Sales      = baseline * trend * seasonality * inflation
+                     + sum(beta * response) - competitor effect + noise
+
+    Returns the dataset and the true per-channel parameters.
+    """
+    channels = mmm_channels(num_channels)
+    names = [name for name, _, _ in channels]
+    low = np.array([lo for _, lo, _ in channels], dtype=float)
+    high = np.array([hi for _, _, hi in channels], dtype=float)
+    weeks = np.arange(num_weeks)
+
+    # Spend: per-channel level with yearly seasonality, noise and on/off flighting.
+    level = rng.uniform(low, high)
+    phase = rng.uniform(0, 2 * np.pi, num_channels)
+    seasonal = 1 + 0.3 * np.sin(2 * np.pi * weeks[:, None] / 52 + phase)
+    noise = rng.lognormal(0, 0.25, (num_weeks, num_channels))
+    flighting = rng.random((num_weeks, num_channels)) > rng.uniform(0, 0.3, num_channels)
+    spend = np.clip(level * seasonal * noise * flighting, 0, high * 1.5).round(2)
+
+    # Media effects. The recursion runs over weeks but is vectorized across channels.
+    decay = rng.uniform(0.1, 0.8, num_channels)
+    adstock = np.empty_like(spend)
+    carry = np.zeros(num_channels)
+    for week in weeks:
+        carry = spend[week] + decay * carry
+        adstock[week] = carry
+    half_saturation = np.median(adstock, axis=0) * rng.uniform(0.5, 1.5, num_channels)
+    shape = rng.uniform(1.0, 3.0, num_channels)
+    response = adstock ** shape / (adstock ** shape + half_saturation ** shape)
+    # Media drives MEDIA_SHARE of average sales, split unevenly across channels.
+    baseline = 200000.0
+    weights = rng.dirichlet(np.full(num_channels, 2.0))
+    beta = weights * (MEDIA_SHARE / (1 - MEDIA_SHARE) * baseline) / response.mean(axis=0)
+    media_sales = response @ beta
+
+    competitor_spend = rng.uniform(50000, 150000, num_weeks).round(2)
+    inflation = np.linspace(1.0, 1.08, num_weeks).round(3)
+    trend = 1 + 0.1 * weeks / max(1, num_weeks - 1)
+    seasonality = 1 + 0.15 * np.sin(2 * np.pi * weeks / 52)
+    sales = (
+        baseline * trend * seasonality * inflation
+        + media_sales
+        - 0.15 * (competitor_spend - 100000)
+        + rng.normal(0, 0.03 * baseline, num_weeks)
+    ).round(2)
+
+    data = {'Date': START_DATE + (weeks * 7).astype('timedelta64[D]'), 'Sales': sales}
+    data.update({f'{name}_Spend': spend[:, i] for i, name in enumerate(names)})
+    data['Competitor_Spend'] = competitor_spend
+    data['Inflation_Index'] = inflation
+
+    truth = {
+        'model': 'geometric adstock + hill saturation',
+        'baseline': baseline,
+        'channels': {
+            f'{name}_Spend': {
+                'decay': round(float(decay[i]), 4),
+                'half_saturation': round(float(half_saturation[i]), 2),
+                'shape': round(float(shape[i]), 4),
+                'beta': round(float(beta[i]), 2),
+                'contribution_share': round(float((response[:, i] * beta[i]).sum() / sales.sum()), 4),
+            }
+            for i, name in enumerate(names)
+        },
     }
-    pd.DataFrame(behavior_data).to_csv(os.path.join(output_dir, 'customer_behavior.csv'), index=False)
-    print("Created customer_behavior.csv")
+    return pd.DataFrame(data), truth
+
+
+# --- Writing ---
+ROW_DATASETS = {
+    'customer_churn': customer_churn,
+    'campaign_performance': campaign_performance,
+    'retail_sales': retail_sales,
+    'cltv_data': cltv_data,
+    'product_recommendations': product_recommendations,
+    'customer_behavior': customer_behavior,
+}
+ALL_DATASETS = ('mmm_advanced_data',) + tuple(ROW_DATASETS)
+
+
+class _ChunkWriter:
+    """
+    Appends DataFrame chunks to a CSV and/or a Parquet file (one row group per chunk).
+    Both are written with pyarrow, whose CSV writer is an order of magnitude faster than
+    DataFrame.to_csv; date columns are written to CSV as plain YYYY-MM-DD dates.
+    """
+
+    def __init__(self, directory: str, name: str, formats: tuple):
+        self.csv_path = os.path.join(directory, f'{name}.csv') if 'csv' in formats else None
+        self.parquet_path = os.path.join(directory, f'{name}.parquet') if 'parquet' in formats else None
+        self._csv_writer = None
+        self._parquet_writer = None
+
+    def write(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.csv_path:
+            csv_table = table.cast(pa.schema([
+                pa.field(field.name, pa.date32()) if pa.types.is_timestamp(field.type) else field
+                for field in table.schema
+            ]))
+            if self._csv_writer is None:
+                self._csv_writer = pa_csv.CSVWriter(self.csv_path, csv_table.schema)
+            self._csv_writer.write_table(csv_table)
+        if self.parquet_path:
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.parquet_path, table.schema, compression='snappy')
+            self._parquet_writer.write_table(table)
+
+    def close(self):
+        for writer in (self._csv_writer, self._parquet_writer):
+            if writer is not None:
+                writer.close()
+
+
+def write_dataset(name: str, seed: np.random.SeedSequence, directory: str, rows: int, weeks: int,
+                  channels: int, campaigns: int, formats: tuple, chunk_rows: int) -> str:
+    """Generates one dataset in chunks and writes it. Runs in a worker process when --workers > 1."""
+    started = time.perf_counter()
+    writer = _ChunkWriter(directory, name, formats)
+    try:
+        if name == 'mmm_advanced_data':
+            dataframe, truth = marketing_mix(np.random.default_rng(seed), weeks, channels)
+            writer.write(dataframe)
+            with open(os.path.join(directory, 'mmm_advanced_data_truth.json'), 'w') as f:
+                json.dump(truth, f, indent=2)
+            rows = len(dataframe)
+        else:
+            generator = ROW_DATASETS[name]
+            chunk_seeds = seed.spawn(-(-rows // chunk_rows))
+            for chunk_index, start in enumerate(range(0, rows, chunk_rows)):
+                rng = np.random.default_rng(chunk_seeds[chunk_index])
+                writer.write(generator(rng, start, min(chunk_rows, rows - start), rows, campaigns=campaigns))
+    finally:
+        writer.close()
+    return f"Created {name} ({rows:,} rows, {', '.join(formats)}) in {time.perf_counter() - started:.1f}s"
+
+
+def create_all_datasets(
+    output_dir: str | None = None,
+    rows: int = DEFAULT_ROWS,
+    weeks: int = DEFAULT_WEEKS,
+    channels: int = len(MMM_CHANNELS),
+    campaigns: int = 3,
+    seed: int = 42,
+    formats: tuple = ('csv',),
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+    datasets: tuple = ALL_DATASETS,
+):
+    """Generates the requested datasets (by default, all demo CSV files required by the frontend)."""
+    # By setting a seed, we ensure the "random" data is the same every time.
+    directory = output_dir or DEFAULT_OUTPUT_DIR
+    os.makedirs(directory, exist_ok=True)
+    seeds = dict(zip(ALL_DATASETS, np.random.SeedSequence(seed).spawn(len(ALL_DATASETS))))
+    jobs = [
+        (name, seeds[name], directory, rows, weeks, channels, campaigns, tuple(formats), chunk_rows)
+        for name in datasets
+    ]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for message in pool.map(write_dataset, *zip(*jobs)):
+                print(message)
+    else:
+        for job in jobs:
+            print(write_dataset(*job))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Generate demo or load-test datasets.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory to write the datasets to")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per row-level dataset")
+    parser.add_argument("--weeks", type=int, default=DEFAULT_WEEKS, help="Weeks of MMM data")
+    parser.add_argument("--channels", type=int, default=len(MMM_CHANNELS), help="Media channels in the MMM data")
+    parser.add_argument("--campaigns", type=int, default=3, help="Distinct campaign IDs in campaign_performance")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for reproducible output")
+    parser.add_argument("--format", choices=("csv", "parquet", "both"), default="csv", help="Output file format")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows generated and written per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Datasets written in parallel processes")
+    parser.add_argument("--datasets", default="all", help=f"Comma-separated subset of: {', '.join(ALL_DATASETS)}")
+    return parser.parse_args()
+
 
 # --- Run the function ---
 if __name__ == "__main__":
-    create_all_datasets()
-    print("\nData creation script finished successfully.")
\ No newline at end of file
+    args = _parse_args()
+    datasets = ALL_DATASETS if args.datasets == "all" else tuple(args.datasets.split(","))
+    unknown = set(datasets) - set(ALL_DATASETS)
+    if unknown:
+        raise SystemExit(f"Unknown datasets: {', '.join(sorted(unknown))}")
+    create_all_datasets(
+        output_dir=args.output_dir,
+        rows=args.rows,
+        weeks=args.weeks,
+        channels=args.channels,
+        campaigns=args.campaigns,
+        seed=args.seed,
+        formats=('csv', 'parquet') if args.format == "both" else (args.format,),
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        datasets=datasets,
+    )
+    print("\nData creation script finished successfully.")
@@ -1,22 +1,21 @@
 print("🔥 Starting main.py")
 
-import pandas as pd
+import hashlib
 import json
 import os
 import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager
 import httpx
-from fastapi import FastAPI, Form, HTTPException, WebSocket, Request # Make sure Request is imported
+from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile, WebSocket, Request # Make sure Request is imported
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
-from fastapi.responses import JSONResponse
-
-# Import agent functions
-from agents.data_science_agent import run_standard_agent, run_bayesian_mmm_agent, run_follow_up_agent
-from agents.seo_agent import find_sitemap, generate_prompts_for_url, run_full_seo_analysis
-from agents.creative_agent import generate_ad_creative
-from agents import brand_strategist_agent
-from agents import creative_director_agent
-from agents import copywriter_agent
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.websockets import WebSocketState
+from agents import metrics, rate_limit
+from agents.rate_limit import RateLimitExceeded
+from agents.singleflight import SingleFlight
 
 # --- Configuration & Initialization ---
 PROJECT_ID = "braidai"
@@ -24,7 +23,56 @@ LOCATION = "us-central1"
 MODEL_NAME = "gemini-2.5-pro"
 DATA_DIR = "./data/"
 
-app = FastAPI()
+# Identical concurrent MMM runs (same file contents on disk, same target) share one fit.
+MMM_FLIGHTS = SingleFlight("mmm_fit")
+
+# --- Lazy Agent Loading ---
+# Agents pull in JAX, lightweight_mmm, matplotlib, Playwright, the Vertex SDK and friends,
+# so they are imported on first use instead of at startup. Set PREWARM_AGENTS to a
+# comma-separated list of agent modules (or "all") to import them in the background
+# once the server is already accepting requests.
+AGENT_MODULES = (
+    "batch_jobs",
+    "brand_strategist_agent",
+    "copywriter_agent",
+    "creative_agent",
+    "creative_director_agent",
+    "data_science_agent",
+    "datasets",
+    "fetch_profiles",
+    "image_inputs",
+    "mmm_fitting",
+    "posterior_export",
+    "seo_agent",
+)
+
+async def load_agent(name: str):
+    """
+    Imports an agent module on first use. The import runs in a worker thread so a cold
+    import doesn't stall the event loop; later calls just hit the sys.modules cache.
+    """
+    return await asyncio.to_thread(importlib.import_module, f"agents.{name}")
+
+def _prewarm_agents(names: list[str]):
+    for name in names:
+        try:
+            module = importlib.import_module(f"agents.{name}")
+            if hasattr(module, "prewarm"):  # modules that defer their own heavy imports
+                module.prewarm()
+            print(f"Pre-warmed agents.{name}")
+        except Exception as e:
+            print(f"Failed to pre-warm agents.{name}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    requested = os.environ.get("PREWARM_AGENTS", "").strip()
+    names = list(AGENT_MODULES) if requested == "all" else [n.strip() for n in requested.split(",") if n.strip()]
+    prewarm_task = asyncio.create_task(asyncio.to_thread(_prewarm_agents, names)) if names else None
+    yield
+    if prewarm_task:
+        await asyncio.gather(prewarm_task, return_exceptions=True)
+
+app = FastAPI(lifespan=lifespan)
 
 # This allows your frontend to communicate with your backend
 origins = ["*"]
@@ -35,14 +83,66 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# --- Timing & Metrics ---
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Adds Server-Timing headers and request metrics."""
+    stages = metrics.start_request_timing()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        total = time.perf_counter() - start
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.observe("braidai_http_request_duration_seconds", (("method", request.method), ("path", path)), total)
+        metrics.increment("braidai_http_requests_total", (("method", request.method), ("path", path), ("status", str(status_code))))
+    response.headers["Server-Timing"] = metrics.server_timing_header(stages, total)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """Quota exhaustion that outlasted the retry deadline is a 429, not a generic 500."""
+    headers = {"Retry-After": str(max(1, round(exc.retry_after)))} if exc.retry_after else None
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers=headers)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# --- Server-Sent Events ---
+# The /stream variants send each strategy/post as soon as the model finishes it,
+# followed by a final "done" event carrying the same payload as the non-streaming endpoint.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _sse_stream(events, endpoint: str):
+    """Formats agent events as SSE; failures after the stream has started become an "error" event."""
+    try:
+        async for item in events:
+            yield _sse(item["event"], item["data"])
+    except Exception as e:
+        print(f"Error in {endpoint} stream: {e}")
+        yield _sse("error", {"detail": str(e)})
+
+def _sse_response(events, endpoint: str) -> StreamingResponse:
+    return StreamingResponse(_sse_stream(events, endpoint), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # --- SEO Agent Endpoints ---
 @app.post("/validate-sitemaps")
 async def validate_sitemaps_endpoint(urls: list = Form(...)):
+    seo_agent = await load_agent("seo_agent")
     results = []
     async with httpx.AsyncClient(follow_redirects=True) as client:
-        tasks = [find_sitemap(url, client) for url in urls]
+        tasks = [seo_agent.find_sitemap(url, client) for url in urls]
         sitemap_locations = await asyncio.gather(*tasks)
         for url, sitemap_loc in zip(urls, sitemap_locations):
             if sitemap_loc:
@@ -53,13 +153,15 @@ async def validate_sitemaps_endpoint(urls: list = Form(...)):
 
 @app.post("/generate-prompts")
 async def get_generated_prompts(url: str = Form(...), competitors: str = Form("")):
-    categorized_prompts = generate_prompts_for_url(url, competitors, PROJECT_ID, LOCATION)
+    seo_agent = await load_agent("seo_agent")
+    categorized_prompts = await rate_limit.run_blocking(seo_agent.generate_prompts_for_url, url, competitors, PROJECT_ID, LOCATION)
     if 'error' in categorized_prompts:
         raise HTTPException(status_code=500, detail=categorized_prompts['error'])
     return {"prompts": categorized_prompts}
 
 @app.websocket("/ws/seo-analysis")
 async def websocket_endpoint(websocket: WebSocket):
+    seo_agent = await load_agent("seo_agent")
     await websocket.accept()
     try:
         data = await websocket.receive_json()
@@ -67,14 +169,19 @@ async def websocket_endpoint(websocket: WebSocket):
         if not your_site or not prompts:
             await websocket.send_json({"status": "error", "message": "Missing site URL or prompts."})
             return
-        final_report = await run_full_seo_analysis(websocket, PROJECT_ID, LOCATION, your_site, competitors, prompts)
+        final_report = await seo_agent.run_full_seo_analysis(websocket, PROJECT_ID, LOCATION, your_site, competitors, prompts,
+                                                             schema_limit=data.get("schemaPageLimit"))
         await websocket.send_json({"status": "complete", "report": final_report})
+    except seo_agent.AnalysisCancelled as e:
+        # The client is already gone, so there is nobody left to send an error to.
+        print(str(e))
     except Exception as e:
         error_message = f"An unexpected error occurred: {str(e)}"
         print(error_message)
         await websocket.send_json({"status": "error", "message": error_message})
     finally:
-        await websocket.close()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
 
 # --- Creative Agent Endpoint ---
 @app.post("/generate-creative")
@@ -89,9 +196,15 @@ async def generate_creative_endpoint(
     composition: str = Form(...),
     modifiers: str = Form(...),
     negativePrompt: str = Form(...),
-    subjectImage: Optional[str] = Form(None),
-    sceneImage: Optional[str] = Form(None)
+    subjectImage: Optional[UploadFile] = File(None),
+    sceneImage: Optional[UploadFile] = File(None),
+    subjectImageId: Optional[str] = Form(None),
+    sceneImageId: Optional[str] = Form(None)
 ):
+    """
+    Images arrive as binary multipart parts, or as the ids an earlier response returned for
+    the same images. They are normalized (and cached) before the Imagen calls.
+    """
     prompt_components = {
         "customSubject": customSubject,
         "sceneDescription": sceneDescription,
@@ -103,44 +216,123 @@ async def generate_creative_endpoint(
         "modifiers": modifiers,
         "negativePrompt": negativePrompt
     }
-    asset_data = generate_ad_creative(
+    image_inputs = await load_agent("image_inputs")
+
+    async def resolve(upload: Optional[UploadFile], image_id: Optional[str]):
+        if upload is not None and upload.filename:
+            return await asyncio.to_thread(image_inputs.normalize_upload, upload.file)
+        if image_id:
+            return image_id, await asyncio.to_thread(image_inputs.cached_image, image_id)
+        return None, None
+
+    try:
+        with metrics.stage("creative.image_normalize"):
+            subject_id, subject_image = await resolve(subjectImage, subjectImageId)
+            # Only used as a backdrop when there is no subject image.
+            scene_id, scene_image = (None, None) if subject_image else await resolve(sceneImage, sceneImageId)
+    except image_inputs.ImageInputError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    creative_agent = await load_agent("creative_agent")
+    asset_data = await rate_limit.run_blocking(
+        creative_agent.generate_ad_creative,
         project_id=PROJECT_ID,
         location=LOCATION,
         platform=platform,
         prompt_components=prompt_components,
-        subject_image_b64=subjectImage,
-        scene_image_b64=sceneImage
+        subject_image=subject_image,
+        scene_image=scene_image
     )
     if asset_data:
-        return asset_data
+        return {**asset_data, "subjectImageId": subject_id, "sceneImageId": scene_id}
     raise HTTPException(status_code=500, detail="Failed to generate creative.")
 
 # --- Data Science Agent Endpoints ---
 @app.get("/preview/{dataset_filename}")
-async def get_data_preview(dataset_filename: str):
-    filepath = os.path.join(DATA_DIR, dataset_filename)
-    df = pd.read_csv(filepath)
-    return json.loads(df.head(3).to_json(orient='split'))
+async def get_data_preview(
+    dataset_filename: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=1000),
+    columns: Optional[str] = None,
+):
+    """
+    Returns rows [offset, offset + limit) of a dataset in pandas' "split" layout, plus
+    totalRows and allColumns. `columns` is a comma-separated list of columns to return.
+    """
+    datasets = await load_agent("datasets")
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    try:
+        with metrics.stage("data.preview"):
+            return await asyncio.to_thread(datasets.read_preview, DATA_DIR, dataset_filename, offset, limit, selected)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_filename}' not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/analyze")
 async def analyze_data(
     dataset_filename: str = Form(...), 
     prompt: str = Form(...),
     model_type: str = Form("standard"),
-    revenue_target: Optional[float] = Form(0)
+    revenue_target: Optional[float] = Form(0),
+    mmm_specification: str = Form("carryover")
 ):
+    data_science_agent = await load_agent("data_science_agent")
+    datasets = await load_agent("datasets")
     filepath = os.path.join(DATA_DIR, dataset_filename)
-    dataframe = pd.read_csv(filepath)
+
+    # Uploaded datasets were checked for the MMM columns at ingest; built-in ones go by name.
+    registered = datasets.find_dataset(DATA_DIR, dataset_filename)
+    if model_type == 'bayesian' and registered and not registered["mmm"]["valid"]:
+        raise HTTPException(status_code=400, detail=" ".join(registered["mmm"]["errors"]))
     
-    if model_type == 'bayesian' and 'mmm' in dataset_filename:
-        # Route to the Bayesian MMM agent
-        result = run_bayesian_mmm_agent(dataframe, PROJECT_ID, LOCATION, MODEL_NAME, revenue_target)
+    if model_type == 'bayesian' and (registered or 'mmm' in dataset_filename):
+        # Route to the Bayesian MMM agent. The fit runs in a worker thread ("compare" fans out
+        # to worker processes), and identical concurrent requests (same file path, mtime and
+        # size, same target and specification) share it.
+        mmm_fitting = await load_agent("mmm_fitting")
+        if mmm_specification not in mmm_fitting.MMM_SPECIFICATIONS + ("compare",):
+            raise HTTPException(status_code=400, detail=f"mmm_specification must be one of: {', '.join(mmm_fitting.MMM_SPECIFICATIONS)}, compare.")
+        stat = os.stat(filepath)
+        key = (os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size, revenue_target, mmm_specification)
+        # Fits are seeded, so the same file version and specification always give the same fit.
+        fit_id = hashlib.sha256(repr(key[:3] + key[4:]).encode()).hexdigest()[:16]
+
+        def read_and_fit():
+            with metrics.stage("data.load"):
+                dataframe = datasets.load_dataset(DATA_DIR, dataset_filename)
+            return data_science_agent.run_bayesian_mmm_agent(dataframe, PROJECT_ID, LOCATION, MODEL_NAME, revenue_target, mmm_specification, fit_id)
+
+        result = await MMM_FLIGHTS.do(key, lambda: rate_limit.run_blocking(read_and_fit))
     else:
-        # Route to the standard agent for all other cases
-        result = run_standard_agent(dataframe, prompt, PROJECT_ID, LOCATION, MODEL_NAME)
+        # Route to the standard agent for all other cases. Its rollups are built once per
+        # version of the file (path, mtime, size) and reused for later questions, so a plain
+        # aggregate over a cached cube is answered without reading the file at all.
+        stat = os.stat(filepath)
+        key = (os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size)
+        result = await asyncio.to_thread(data_science_agent.answer_from_cached_cube, key, prompt)
+        if result is None:
+            with metrics.stage("data.load"):
+                dataframe = await asyncio.to_thread(datasets.load_dataset, DATA_DIR, dataset_filename)
+            result = await rate_limit.run_blocking(data_science_agent.run_standard_agent, dataframe, prompt, PROJECT_ID, LOCATION, MODEL_NAME, key)
         
     return result
 
+@app.get("/mmm/{fit_id}/posterior")
+async def export_mmm_posterior(fit_id: str, mode: str = Query("full", pattern="^(full|quantiles)$")):
+    """
+    Compact float32 .npz export of a fitted MMM's posterior (means, HDI bands, ROI draws or
+    quantiles, response curves) for client-side charts. `fit_id` comes from the /analyze report.
+    """
+    posterior_export = await load_agent("posterior_export")
+    payload = await asyncio.to_thread(posterior_export.export_posterior, fit_id, mode)
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"No fitted model '{fit_id}'; run the analysis again.")
+    return Response(content=payload, media_type="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="mmm-{fit_id}-{mode}.npz"',
+        "Cache-Control": "private, max-age=3600",
+    })
+
 @app.post("/follow-up")
 async def follow_up_analysis(
     dataset_filename: str = Form(...),
@@ -148,14 +340,46 @@ async def follow_up_analysis(
     follow_up_history: str = Form(...),
     follow_up_prompt: str = Form(...)
 ):
-    filepath = os.path.join(DATA_DIR, dataset_filename)
-    dataframe = pd.read_csv(filepath)
+    data_science_agent = await load_agent("data_science_agent")
+    datasets = await load_agent("datasets")
+    with metrics.stage("data.load"):
+        dataframe = await asyncio.to_thread(datasets.load_dataset, DATA_DIR, dataset_filename)
     history_list = json.loads(follow_up_history)
     history_str = "".join([f"User: {turn['text']}\n" if turn['sender'] == 'user' else f"Agent: {turn['summary']}\n" for turn in history_list])
-    result = run_follow_up_agent(dataframe, original_prompt, history_str, follow_up_prompt, PROJECT_ID, LOCATION, MODEL_NAME)
+    result = await rate_limit.run_blocking(data_science_agent.run_follow_up_agent, dataframe, original_prompt, history_str, follow_up_prompt, PROJECT_ID, LOCATION, MODEL_NAME)
     return result
 
+@app.post("/datasets", status_code=201)
+async def upload_dataset(request: Request):
+    """
+    Streams an uploaded CSV (multipart field "file") to disk, infers compact dtypes, checks the
+    MMM columns and registers it by content hash. Re-uploading identical bytes returns 200 with
+    the existing entry. The returned "filename" works with /preview, /analyze and /follow-up.
+    """
+    datasets = await load_agent("datasets")
+    try:
+        upload = await datasets.stream_upload(request.headers.get("content-type"), request.stream(), DATA_DIR)
+        with metrics.stage("data.ingest"):
+            entry, created = await asyncio.to_thread(datasets.ingest_csv, upload, DATA_DIR)
+    except datasets.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return JSONResponse(status_code=201 if created else 200, content=entry)
+
+@app.get("/datasets")
+async def list_datasets():
+    datasets = await load_agent("datasets")
+    return {"datasets": sorted(datasets.read_registry(DATA_DIR).values(), key=lambda entry: entry["uploadedAt"], reverse=True)}
+
 # --- Brand Strategist Endpoint ---
+async def _check_fetch_profiles(*profiles: str):
+    """Rejects unknown fetch profiles with a 400 before any page is fetched."""
+    fetch_profiles = await load_agent("fetch_profiles")
+    for profile in profiles:
+        try:
+            fetch_profiles.get_fetch_profile(profile)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/analyze-brand")
 async def analyze_brand_endpoint(request: Request):
     """
@@ -167,19 +391,26 @@ async def analyze_brand_endpoint(request: Request):
         website_url = form_data.get("websiteUrl")
         ad_library_url = form_data.get("adLibraryUrl")
         user_brief = form_data.get("userBrief")
+        # Optional fetch profiles ("text-only", "screenshot", "full") for each scraped page
+        website_profile = form_data.get("websiteProfile") or "screenshot"
+        ad_library_profile = form_data.get("adLibraryProfile") or "text-only"
 
         if not brand_name or not website_url or not user_brief:
             raise HTTPException(status_code=400, detail="Brand name, Website URL, and a brief are required.")
+        await _check_fetch_profiles(website_profile, ad_library_profile)
 
         # --- THIS IS THE IMPORTANT CHANGE ---
         # Add 'await' because the agent function is now async
+        brand_strategist_agent = await load_agent("brand_strategist_agent")
         analysis_data = await brand_strategist_agent.analyze_brand_with_llm(
             project_id=PROJECT_ID,
             location=LOCATION,
             brand_name=brand_name,
             website_url=website_url,
             ad_library_url=ad_library_url,
-            user_brief=user_brief
+            user_brief=user_brief,
+            website_profile=website_profile,
+            ad_library_profile=ad_library_profile
         )
         
         if analysis_data.get("error"):
@@ -187,10 +418,41 @@ async def analyze_brand_endpoint(request: Request):
 
         return JSONResponse(content=analysis_data)
 
+    except (HTTPException, RateLimitExceeded):
+        raise
     except Exception as e:
         print(f"Error in /analyze-brand endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze-brand/stream")
+async def analyze_brand_stream_endpoint(request: Request):
+    """
+    Streaming version of /analyze-brand: emits an "approach" event per strategy, then "done".
+    """
+    form_data = await request.form()
+    brand_name = form_data.get("brandName")
+    website_url = form_data.get("websiteUrl")
+    user_brief = form_data.get("userBrief")
+    website_profile = form_data.get("websiteProfile") or "screenshot"
+    ad_library_profile = form_data.get("adLibraryProfile") or "text-only"
+
+    if not brand_name or not website_url or not user_brief:
+        raise HTTPException(status_code=400, detail="Brand name, Website URL, and a brief are required.")
+    await _check_fetch_profiles(website_profile, ad_library_profile)
+
+    brand_strategist_agent = await load_agent("brand_strategist_agent")
+    events = brand_strategist_agent.stream_brand_strategies(
+        project_id=PROJECT_ID,
+        location=LOCATION,
+        brand_name=brand_name,
+        website_url=website_url,
+        ad_library_url=form_data.get("adLibraryUrl"),
+        user_brief=user_brief,
+        website_profile=website_profile,
+        ad_library_profile=ad_library_profile
+    )
+    return _sse_response(events, "/analyze-brand/stream")
+
 
 @app.post("/generate-assets-from-brief")
 async def generate_assets_endpoint(request: Request):
@@ -208,6 +470,7 @@ async def generate_assets_endpoint(request: Request):
             raise HTTPException(status_code=400, detail="Missing required data for asset generation.")
 
         # Call the new Creative Director agent
+        creative_director_agent = await load_agent("creative_director_agent")
         asset_results = await creative_director_agent.brief_to_prompts_and_assets(
             project_id=PROJECT_ID,
             location=LOCATION,
@@ -220,6 +483,8 @@ async def generate_assets_endpoint(request: Request):
 
         return JSONResponse(content=asset_results)
 
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"Error in /generate-assets-from-brief endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -237,7 +502,8 @@ async def generate_social_copy_endpoint(request: Request):
             raise HTTPException(status_code=400, detail="Missing required data for copy generation.")
 
         # Call the Copywriter agent
-        copy_results = copywriter_agent.generate_social_posts(
+        copywriter_agent = await load_agent("copywriter_agent")
+        copy_results = await copywriter_agent.generate_social_posts(
             project_id=PROJECT_ID,
             location=LOCATION,
             brand_name=brand_name,
@@ -247,6 +513,63 @@ async def generate_social_copy_endpoint(request: Request):
 
         return JSONResponse(content=copy_results)
 
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"Error in /generate-social-copy endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/generate-social-copy/stream")
+async def generate_social_copy_stream_endpoint(request: Request):
+    """
+    Streaming version of /generate-social-copy: emits a "post" event per post, then "done".
+    """
+    data = await request.json()
+    brand_name = data.get("brandName")
+    user_brief = data.get("userBrief")
+    selected_strategy = data.get("selectedStrategy")
+
+    if not all([brand_name, user_brief, selected_strategy]):
+        raise HTTPException(status_code=400, detail="Missing required data for copy generation.")
+
+    copywriter_agent = await load_agent("copywriter_agent")
+    events = copywriter_agent.stream_social_posts(
+        project_id=PROJECT_ID,
+        location=LOCATION,
+        brand_name=brand_name,
+        user_brief=user_brief,
+        selected_strategy=selected_strategy
+    )
+    return _sse_response(events, "/generate-social-copy/stream")
+
+# --- Batch Endpoints ---
+@app.post("/batches/{kind}", status_code=202)
+async def create_batch_endpoint(kind: str, request: Request):
+    """
+    Submits many copy ("social-copy") or strategy ("brand-analysis") requests at once.
+    The body is {"items": [...]}, where each item has the same fields as the single-item
+    endpoint. Returns a batch ID right away; poll GET /batches/{batch_id} for results.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="The body must be valid JSON.")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="The body must be a JSON object with an 'items' list.")
+    items = data.get("items")
+
+    batch_jobs = await load_agent("batch_jobs")
+    error = batch_jobs.validate_items(kind, items)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    batch = await batch_jobs.submit_batch(kind, items, PROJECT_ID, LOCATION)
+    return batch.to_dict(include_results=False)
+
+@app.get("/batches/{batch_id}")
+async def get_batch_endpoint(batch_id: str, include_results: bool = True):
+    batch_jobs = await load_agent("batch_jobs")
+    batch = await asyncio.to_thread(batch_jobs.get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found.")
+    return batch.to_dict(include_results=include_results)
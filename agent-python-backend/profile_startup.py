@@ -0,0 +1,98 @@
+"""
+Startup import profiler for the FastAPI app.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and reports the
+slowest imports by cumulative time. With --budget it doubles as a regression check:
+it exits non-zero when importing main takes longer than the budget, which is how the
+Docker build keeps heavy agent dependencies from creeping back into cold starts.
+
+    python profile_startup.py                 # top 25 imports
+    python profile_startup.py --budget 1.5    # fail if `import main` takes > 1.5 s
+    python profile_startup.py --module agents.seo_agent --top 40
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Packages that main.py must never import eagerly; they belong behind load_agent().
+FORBIDDEN_AT_STARTUP = (
+    "jax",
+    "lightweight_mmm",
+    "numpyro",
+    "matplotlib",
+    "playwright",
+    "vertexai",
+    "google.cloud.secretmanager",
+    "openai",
+    "pandas",
+)
+
+
+def profile_imports(module: str = "main") -> list[dict]:
+    """Imports `module` in a clean interpreter and returns one entry per imported package."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return entries
+
+
+def print_report(entries: list[dict], module: str, top: int):
+    total_ms = next((e["cumulative_ms"] for e in reversed(entries) if e["name"] == module), 0.0)
+    print(f"import {module}: {total_ms:.1f} ms across {len(entries)} modules\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for entry in sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:top]:
+        print(f"{entry['cumulative_ms']:>14.1f} {entry['self_ms']:>9.1f}  {'  ' * entry['depth']}{entry['name']}")
+
+
+def check_budget(entries: list[dict], module: str, budget_s: float) -> list[str]:
+    problems = []
+    total_ms = next((e["cumulative_ms"] for e in reversed(entries) if e["name"] == module), 0.0)
+    if total_ms > budget_s * 1000:
+        problems.append(f"import {module} took {total_ms:.0f} ms, over the {budget_s * 1000:.0f} ms budget")
+    if module != "main":
+        return problems
+    imported = {e["name"] for e in entries}
+    for package in FORBIDDEN_AT_STARTUP:
+        if package in imported:
+            problems.append(f"{package} is imported at startup; load it lazily instead")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile (and optionally budget) startup import time.")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="Number of slowest imports to list")
+    parser.add_argument("--budget", type=float, default=None, help="Fail if the import takes longer than this many seconds")
+    args = parser.parse_args()
+
+    entries = profile_imports(args.module)
+    print_report(entries, args.module, args.top)
+
+    if args.budget is not None:
+        problems = check_budget(entries, args.module, args.budget)
+        if problems:
+            print("\nImport-time budget exceeded:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print(f"\nImport-time budget of {args.budget:.2f} s met.")
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pytest
+
+from agents import cache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(namespace="test", **settings):
+        if request.param == "memory":
+            return cache.MemoryCache(namespace, **settings)
+        return cache.SQLiteCache(namespace, str(tmp_path / "cache.sqlite3"), **settings)
+    return make
+
+
+def test_round_trip_keeps_arrays_and_tuple_keys(make_cache):
+    store = make_cache()
+    value = {"weights": np.arange(1000, dtype=np.float32), "name": "cube"}
+    store.set(("dataset.csv", 123, 456), value)
+    loaded = store.get(("dataset.csv", 123, 456))
+    assert loaded["name"] == "cube"
+    np.testing.assert_array_equal(loaded["weights"], value["weights"])
+    assert store.get(("dataset.csv", 123, 457)) is None
+    assert store.get("missing", "default") == "default"
+
+
+def test_entries_expire_after_their_ttl(make_cache):
+    store = make_cache(ttl=0.05)
+    store.set("default", 1)
+    store.set("longer", 2, ttl=60)
+    time.sleep(0.1)
+    assert store.get("default") is None
+    assert store.get("longer") == 2
+
+
+def test_max_entries_evicts_least_recently_used(make_cache):
+    store = make_cache(max_entries=2)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")  # "b" is now the least recently used
+    time.sleep(0.01)
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert (store.get("a"), store.get("c")) == (1, 3)
+
+
+def test_max_bytes_keeps_the_newest_entries_that_fit(make_cache):
+    store = make_cache(max_bytes=25_000)
+    for key in range(5):
+        store.set(key, np.zeros(1000, dtype=np.float64))  # ~8 KB each
+        time.sleep(0.01)
+    assert [store.get(key) is not None for key in range(5)] == [False, False, True, True, True]
+
+
+def test_sqlite_bounds_are_per_namespace(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    small = cache.SQLiteCache("small", path, max_entries=1)
+    other = cache.SQLiteCache("other", path)
+    other.set("kept", "value")
+    small.set("a", 1)
+    small.set("b", 2)
+    assert small.get("a") is None and small.get("b") == 2
+    assert other.get("kept") == "value"
+
+
+def test_encode_decode_round_trip():
+    value = {"array": np.arange(10, dtype=np.int64), "nested": [1, "two", None]}
+    data = b"".join(bytes(part) for part in cache.encode(value))
+    decoded = cache.decode(data)
+    np.testing.assert_array_equal(decoded["array"], value["array"])
+    assert decoded["nested"] == value["nested"]
+    with pytest.raises(ValueError):
+        cache.decode(b"not a cache entry")
+
+
+def test_redis_round_trip_against_a_resp_server():
+    from benchmarks.fakes import FakeRedisServer
+
+    with FakeRedisServer() as server:
+        store = cache.RedisCache("test", server.url, ttl=60)
+        store.set("array", np.arange(5, dtype=np.int32))
+        loaded = store.get("array")
+        np.testing.assert_array_equal(loaded, np.arange(5))
+        assert not loaded.flags.writeable  # a view into the reply, so it must not be mutated
+        store.set("short", "value", ttl=0.05)
+        time.sleep(0.1)
+        assert store.get("short") is None
+        store.delete("array")
+        assert store.get("array") is None
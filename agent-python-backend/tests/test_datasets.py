@@ -0,0 +1,95 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from agents import datasets
+
+# Blank and whitespace-only lines (which read_csv skips) around, between and after the rows.
+CSV_WITH_BLANK_LINES = "a,b\n\n1,x\n   \n2,y\n\r\n\n3,z\n4,w\n \t\n5,v\n\n\n"
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(datasets, "_row_indexes", {})
+
+
+@pytest.mark.parametrize("stride", [1, 2, 1000])
+def test_row_index_skips_blank_lines(tmp_path, monkeypatch, stride):
+    monkeypatch.setattr(datasets, "INDEX_STRIDE", stride)
+    path = tmp_path / "blank.csv"
+    path.write_bytes(CSV_WITH_BLANK_LINES.encode())
+    index = datasets.get_row_index(str(path))
+    assert index.rows == len(pd.read_csv(path)) == 5
+    assert index.header == ["a", "b"]
+
+
+@pytest.mark.parametrize("stride", [1, 2, 1000])
+def test_preview_pages_match_read_csv(tmp_path, monkeypatch, stride):
+    monkeypatch.setattr(datasets, "INDEX_STRIDE", stride)
+    (tmp_path / "blank.csv").write_bytes(CSV_WITH_BLANK_LINES.encode())
+    expected = pd.read_csv(tmp_path / "blank.csv")
+    for offset in range(6):
+        preview = datasets.read_preview(str(tmp_path), "blank.csv", offset=offset, limit=2)
+        assert preview["totalRows"] == 5
+        assert preview["data"] == expected.iloc[offset:offset + 2].values.tolist()
+        assert preview["index"] == list(range(offset, min(offset + 2, 5)))
+
+
+def test_saved_index_is_reused_until_the_file_changes(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a\n1\n2\n")
+    assert datasets.get_row_index(str(path)).rows == 2
+    datasets._row_indexes.clear()
+    assert datasets.get_row_index(str(path)).rows == 2  # loaded from the saved .rowidx.npz
+    path.write_text("a\n1\n2\n3\n")
+    assert datasets.get_row_index(str(path)).rows == 3
+
+
+def test_preview_rejects_unknown_files_and_columns(tmp_path):
+    (tmp_path / "data.csv").write_text("a,b\n1,2\n")
+    with pytest.raises(FileNotFoundError):
+        datasets.read_preview(str(tmp_path), "../data.csv")
+    with pytest.raises(ValueError):
+        datasets.read_preview(str(tmp_path), "data.csv", columns=["c"])
+
+
+def _multipart(boundary: str, filename: str, content: bytes) -> list:
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return [body[i:i + 7] for i in range(0, len(body), 7)]
+
+
+async def _chunks(pieces):
+    for piece in pieces:
+        yield piece
+
+
+def test_upload_and_ingest(tmp_path):
+    content = b"Date,Sales\n2024-01-01,10\n2024-01-08,12.5\n"
+    upload = asyncio.run(datasets.stream_upload(
+        "multipart/form-data; boundary=XyZ", _chunks(_multipart("XyZ", "sales.csv", content)), str(tmp_path)))
+    assert upload["bytes"] == len(content)
+    entry, created = datasets.ingest_csv(upload, str(tmp_path))
+    assert created and entry["rows"] == 2
+    assert entry["columns"]["Date"] == "datetime64[ns]"
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith("datasets.json")) == [entry["filename"], entry["parquet"]]
+    assert datasets.load_dataset(str(tmp_path), entry["filename"])["Sales"].tolist() == [10, 12.5]
+
+
+def test_malformed_uploads_are_rejected_with_400(tmp_path):
+    with pytest.raises(datasets.UploadError) as error:
+        asyncio.run(datasets.stream_upload("multipart/form-data; boundary=XyZ", _chunks([b"not multipart at all"]), str(tmp_path)))
+    assert error.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unparseable_csv_leaves_nothing_behind(tmp_path):
+    upload_path = tmp_path / ".upload-1.part"
+    upload_path.write_text('a,b\n1,2\n"unterminated\n')
+    upload = {"path": str(upload_path), "filename": "bad.csv", "sha256": "0" * 64, "bytes": 0}
+    with pytest.raises(datasets.UploadError):
+        datasets.ingest_csv(upload, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from agents.json_stream import IncrementalArrayParser, extract_json_object
+
+RESPONSE = (
+    '```json\n{"summary": "Three \\"bold\\" ideas, [not] {an} array",\n'
+    ' "approaches": [{"title": "One", "tags": ["a", "b"]}, {"title": "Tw}o, \\u00e9"},\n'
+    '   {"title": "Three", "nested": {"deep": [1, 2, {"x": "]"}]}}],\n'
+    ' "approaches_extra": [{"title": "ignored"}]}\n```'
+)
+EXPECTED = json.loads(RESPONSE[RESPONSE.index("{"):RESPONSE.rindex("}") + 1])["approaches"]
+
+
+def _feed_in_pieces(text: str, size: int) -> list:
+    parser = IncrementalArrayParser("approaches")
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start:start + size]))
+    assert parser.done
+    return elements
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, len(RESPONSE)])
+def test_elements_are_identical_however_the_text_is_split(size):
+    assert _feed_in_pieces(RESPONSE, size) == EXPECTED
+
+
+def test_each_element_is_emitted_as_soon_as_it_closes():
+    parser = IncrementalArrayParser("approaches")
+    first_end = RESPONSE.index('"b"]}') + len('"b"]}')
+    assert parser.feed(RESPONSE[:first_end - 1]) == []
+    assert parser.feed(RESPONSE[first_end - 1:first_end]) == [EXPECTED[0]]
+
+
+def test_scalar_elements_and_an_empty_array():
+    assert _feed_in_pieces('{"approaches": ["a,b", 2, true, null]}', 1) == ["a,b", 2, True, None]
+    assert _feed_in_pieces('{"approaches": []}', 1) == []
+
+
+def test_extract_json_object():
+    assert extract_json_object('Sure! {"a": {"b": 1}} Hope that helps.') == '{"a": {"b": 1}}'
+    with pytest.raises(ValueError):
+        extract_json_object("no json here")
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from agents import mmm_fitting
+
+
+def test_holdout_errors_survive_zero_sales_weeks():
+    errors = mmm_fitting._holdout_errors(np.array([0.0, 100.0, 0.0]), np.array([0.0, 90.0, 10.0]))
+    assert errors["holdoutSmape"] == pytest.approx((0 + 10 / 95 + 2) / 3)
+    assert errors["holdoutMape"] == pytest.approx(0.1)  # over the non-zero weeks only
+    assert errors["holdoutRmse"] == pytest.approx(np.sqrt(200 / 3))
+    assert mmm_fitting._holdout_errors(np.zeros(3), np.ones(3))["holdoutMape"] is None
+
+
+def _candidate(model, smape, elpd, rmse):
+    return {"model": model, "holdoutSmape": smape, "elpdLoo": elpd, "holdoutRmse": rmse}
+
+
+def test_pick_winner_ranks_by_smape_first():
+    candidates = [_candidate("carryover", 0.20, 10.0, 1.0), _candidate("adstock", 0.10, -10.0, 5.0)]
+    assert mmm_fitting._pick_winner(candidates) == "adstock"
+
+
+def test_pick_winner_breaks_near_ties_by_elpd_then_rmse():
+    tolerance = mmm_fitting.SMAPE_TOLERANCE
+    candidates = [
+        _candidate("carryover", 0.100, -5.0, 1.0),
+        _candidate("adstock", 0.100 + tolerance / 2, 3.0, 2.0),
+        _candidate("hill_adstock", 0.100 + tolerance * 2, 9.0, 0.5),  # outside the tolerance
+    ]
+    assert mmm_fitting._pick_winner(candidates) == "adstock"
+    no_criteria = [_candidate("carryover", 0.1, None, 2.0), _candidate("adstock", 0.1, None, 1.0)]
+    assert mmm_fitting._pick_winner(no_criteria) == "adstock"
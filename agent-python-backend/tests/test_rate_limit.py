@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from agents import rate_limit
+
+
+class TooManyRequests(Exception):
+    status_code = 429
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setitem(rate_limit._quotas, "test-model", {"requests_per_minute": 6000, "max_concurrency": 4})
+    return rate_limit.get_limiter("test-model")
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = rate_limit.TokenBucket(per_minute=60)  # 1 per second, burst of 15
+    for _ in range(15):
+        assert bucket.wait_time(1, now=bucket.updated) == 0.0
+        bucket.take(1)
+    assert bucket.wait_time(1, now=bucket.updated) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=bucket.updated + 1.0) == 0.0
+
+
+def test_concurrency_limit_halves_on_throttling_and_recovers(limiter):
+    assert [limiter.try_acquire(1) for _ in range(4)] == [0.0] * 4
+    assert limiter.try_acquire(1) == rate_limit.POLL_INTERVAL  # every slot is taken
+    limiter.release(throttled=True, retry_after=0.5)
+    assert limiter.limit == 2
+    assert limiter.try_acquire(1) >= 0.4  # paused for the server's Retry-After
+    limiter.paused_until = 0
+    for _ in range(3):
+        limiter.release()
+    assert 2 < limiter.limit <= 4
+
+
+def test_classify_error():
+    assert rate_limit.classify_error(TooManyRequests()) == (True, True, None)
+    assert rate_limit.classify_error(BadRequest()) == (False, False, None)
+    assert rate_limit.classify_error(ConnectionError()) == (True, False, None)
+
+
+def test_call_sync_retries_throttled_calls(limiter):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise TooManyRequests()
+        return "ok"
+
+    assert rate_limit.call_sync("test-model", flaky) == "ok"
+    assert len(attempts) == 3
+    assert limiter.in_flight == 0
+
+
+def test_call_sync_does_not_retry_client_errors(limiter):
+    attempts = []
+
+    def bad():
+        attempts.append(1)
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        rate_limit.call_sync("test-model", bad)
+    assert len(attempts) == 1
+    assert limiter.in_flight == 0
+
+
+def test_persistent_throttling_raises_rate_limit_exceeded(limiter):
+    def throttled():
+        raise TooManyRequests()
+
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        rate_limit.call_sync("test-model", throttled)
+    assert limiter.in_flight == 0
+
+
+def test_call_async_gives_up_at_the_deadline(limiter):
+    async def scenario():
+        for _ in range(4):
+            limiter.try_acquire(1)  # every slot busy, so the call can only queue
+        with pytest.raises(rate_limit.RateLimitExceeded):
+            await rate_limit.call_async("test-model", lambda: asyncio.sleep(0), timeout=0.2)
+    asyncio.run(scenario())
+
+
+def test_estimate_tokens():
+    assert rate_limit.estimate_tokens("x" * 400) == rate_limit.OUTPUT_TOKEN_ESTIMATE + 100
+    assert rate_limit.estimate_tokens(["x" * 40, b"image"]) == rate_limit.OUTPUT_TOKEN_ESTIMATE + 10 + rate_limit.IMAGE_TOKEN_ESTIMATE
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import rollups
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Category": rng.choice(["Books", "Games", "Toys"], 300),
+        "Region": rng.choice(["North", "South"], 300),
+        "Profit": rng.normal(10, 2, 300),
+        "Sales": rng.normal(100, 5, 300),
+    })
+
+
+@pytest.fixture(scope="module")
+def cube(frame):
+    return rollups.RollupCube(frame)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("profit by category", {"dimensions": ["Category"], "measures": ["Profit"], "aggregation": "sum"}),
+    ("average profit by category", {"dimensions": ["Category"], "measures": ["Profit"], "aggregation": "mean"}),
+    ("total sales by region and category", {"dimensions": ["Region", "Category"], "measures": ["Sales"], "aggregation": "sum"}),
+    ("number of rows by region", {"dimensions": ["Region"], "measures": [], "aggregation": "count"}),
+    ("top 2 category by profit", {"dimensions": ["Category"], "measures": ["Profit"], "aggregation": "sum", "ascending": False, "limit": 2}),
+])
+def test_parse_question(cube, question, expected):
+    query = rollups.parse_question(cube, question)
+    assert query == {"ascending": None, "limit": None, **expected}
+
+
+@pytest.mark.parametrize("question", [
+    "what is the meaning of life",
+    "why did profit drop in the north",
+    "profit by customer name",
+    "",
+])
+def test_questions_that_are_not_plain_aggregates(cube, question):
+    assert rollups.parse_question(cube, question) is None
+
+
+def test_answers_match_pandas(cube, frame):
+    expected = frame.groupby(["Region", "Category"]).agg(Sales=("Sales", "mean"))
+    actual = cube.query(["Region", "Category"], ["Sales"], "mean")
+    np.testing.assert_allclose(actual["Sales"].to_numpy(), expected["Sales"].to_numpy())
+    assert cube.query([], ["Profit"], "max")["Profit"].iloc[0] == pytest.approx(frame["Profit"].max())
+    assert cube.query(["Region"], [], "count").to_numpy().ravel().tolist() == frame.groupby("Region").size().tolist()
+
+
+@pytest.mark.parametrize("dataframe", [
+    pd.DataFrame({"region": ["north", "south"]}),
+    pd.DataFrame({"revenue": [1.0, 2.0, 3.0]}),
+], ids=["categorical-only", "numeric-only"])
+def test_frames_with_nothing_to_roll_up_raise(dataframe):
+    with pytest.raises(ValueError):
+        rollups.RollupCube(dataframe)
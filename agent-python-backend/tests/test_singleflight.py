@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from agents.singleflight import SingleFlight, normalize_url
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "page"
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)), flight.do("other", fetch))
+        assert results == ["page"] * 6
+        assert len(calls) == 2
+        assert flight.in_flight() == 0
+        assert await flight.do("key", fetch) == "page"  # results aren't cached
+        assert len(calls) == 3
+    asyncio.run(scenario())
+
+
+def test_every_waiter_gets_the_exception():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        assert [str(result) for result in results] == ["boom", "boom"]
+        assert flight.in_flight() == 0
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_leaves_the_call_running_for_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "page"
+
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "page"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+    asyncio.run(scenario())
+
+
+def test_the_last_waiter_leaving_cancels_the_call_and_releases_the_key():
+    async def scenario():
+        flight, started, cancelled = SingleFlight(), [], []
+
+        async def fetch():
+            started.append(1)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "stale"
+
+        waiter = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert cancelled == [1]
+        assert flight.in_flight() == 0
+
+        async def fresh():
+            return "fresh"
+        assert await flight.do("key", fresh) == "fresh"
+    asyncio.run(scenario())
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com/Path#section") == normalize_url("https://example.com/Path")
@@ -0,0 +1,38 @@
+import json
+
+import pandas as pd
+import pytest
+
+from agents import data_science_agent
+
+
+class _FakeModel:
+    prompts = []
+
+    def __init__(self, model_name):
+        pass
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        report = {"reportTitle": "t", "keyInsights": [], "summary": "s", "visualizationCode": "", "recommendations": []}
+        return type("Response", (), {"text": json.dumps(report)})()
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    _FakeModel.prompts = []
+    monkeypatch.setattr(data_science_agent.vertexai, "init", lambda **kwargs: None)
+    monkeypatch.setattr(data_science_agent, "GenerativeModel", _FakeModel)
+    return _FakeModel.prompts
+
+
+@pytest.mark.parametrize("dataframe", [
+    pd.DataFrame({"region": ["north", "south"]}),
+    pd.DataFrame({"revenue": [1.0, 2.0, 3.0], "cost": [0.5, 1.0, 1.5]}),
+], ids=["categorical-only", "numeric-only"])
+def test_datasets_without_a_cube_go_to_gemini(fake_gemini, dataframe):
+    report = data_science_agent.run_standard_agent(dataframe, "total revenue", "project", "us-central1", "gemini-test")
+    assert "error" not in report
+    assert report["summary"] == "s"
+    assert len(fake_gemini) == 1
+    assert "pre-computed aggregates" not in fake_gemini[0]
@@ -0,0 +1,20 @@
+import os
+
+import main
+import profile_startup
+
+# Same budget the Docker build enforces; see the Dockerfile.
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+def test_main_imports_within_budget():
+    entries = profile_startup.profile_imports("main")
+    assert profile_startup.check_budget(entries, "main", STARTUP_BUDGET_SECONDS) == []
+
+
+def test_prewarm_list_covers_every_agent_module():
+    agents_dir = os.path.join(os.path.dirname(os.path.abspath(main.__file__)), "agents")
+    # Shared helpers imported by the agents themselves; prewarming an agent pulls them in.
+    helpers = {"__init__", "cache", "json_stream", "llm", "metrics", "rate_limit", "rollups", "singleflight"}
+    modules = {name[:-3] for name in os.listdir(agents_dir) if name.endswith(".py")} - helpers
+    assert modules <= set(main.AGENT_MODULES)